@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 08:55
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_auto_20181011_1913'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bounty_state_id', models.IntegerField(default=0)),
+                ('fulfillment_modified', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bountiestimeline',
+            name='completed_states',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='bountiestimeline',
+            name='completed_usd_total',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='bountiestimeline',
+            name='fulfilled_bounties',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='bountiestimeline',
+            name='fulfiller_acceptance_rate_total',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='bountiestimeline',
+            name='fulfillments_accepted_submitted',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='bountiestimeline',
+            name='noise_bounties',
+            field=models.PositiveIntegerField(null=True),
+        ),
+    ]
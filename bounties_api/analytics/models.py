@@ -27,6 +27,21 @@ class BountiesTimeline(models.Model):
     bounty_dead = models.PositiveIntegerField(default=0)
     platform = models.CharField(max_length=64, blank=True)
 
+    # running totals behind the rates, that the next incremental update continues from. Rows
+    # without them are rebuilt. They aren't served by the API.
+    completed_states = models.PositiveIntegerField(null=True)
+    completed_usd_total = models.FloatField(null=True)
+    noise_bounties = models.PositiveIntegerField(null=True)
+    fulfilled_bounties = models.PositiveIntegerField(null=True)
+    fulfillments_accepted_submitted = models.PositiveIntegerField(null=True)
+    fulfiller_acceptance_rate_total = models.FloatField(null=True)
+
+
+class TimelineWatermark(models.Model):
+    # the last bounty state and fulfillment change timeline_generator has counted
+    bounty_state_id = models.IntegerField(default=0)
+    fulfillment_modified = models.DateTimeField(null=True)
+
 
 class Tokens(models.Model):
     token_symbol = models.CharField(max_length=128)
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from .models import BountiesTimeline, Tokens
+from .timeline import RUNNING_TOTAL_FIELDS
 from drf_queryfields import QueryFieldsMixin
 from std_bounties.models import Category
 
@@ -10,7 +11,7 @@ class BountiesTimelineSerializer(
         serializers.ModelSerializer):
     class Meta:
         model = BountiesTimeline
-        fields = "__all__"
+        exclude = RUNNING_TOTAL_FIELDS
         read_only_fields = (
             "bounties_issued",
             "fulfillments_submitted",
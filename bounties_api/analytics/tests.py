@@ -1,15 +1,260 @@
 import random
 from datetime import datetime, timedelta
+from decimal import Decimal
+from functools import reduce
 import unittest
 import arrow
+from django.db.models import Avg, Case, Count, ExpressionWrapper, FloatField, IntegerField, Q, Sum, When
+from django.db.models.functions import Cast
 
 # Create your tests here.
 from std_bounties.constants import EXPIRED_STAGE, DEAD_STAGE, COMPLETED_STAGE, ACTIVE_STAGE, DRAFT_STAGE
 from analytics.management.commands.timeline_generator import diff_time, diff_days, day_bounds, range_days, \
-    get_bounty_draft, get_bounty_completed, get_bounty_active, get_bounty_expired, get_bounty_dead, \
-    get_fulfillment_acceptance_rate, get_bounty_fulfilled_rate, get_avg_fulfiller_acceptance_rate, \
-    get_avg_fulfillment_amount, get_total_fulfillment_amount, generate_timeline, week_bounds, range_weeks
+    week_bounds, range_weeks
+from analytics.models import BountiesTimeline
+from analytics.timeline import ALL_PLATFORM, DEFAULT_PLATFORM, RUNNING_TOTAL_FIELDS, TimelineData, build_timelines, \
+    continue_timelines
 from std_bounties.models import BountyState, Fulfillment, Bounty
+from user.models import Settings, User
+
+
+# The timelines frame by frame with queries, as the timeline_generator command computed them before
+# analytics.timeline. Kept as the reference the engine's timelines are checked against.
+
+DEFAULT_PLATFORM_QUERY = Q(bounty__platform=DEFAULT_PLATFORM) | Q(bounty__platform=None) | Q(bounty__platform='')
+
+
+def get_date(time_frame):
+    return time_frame.last().change_date
+
+
+def add_on(stage):
+    return lambda current, next_value: current + \
+        1 if next_value.bounty_stage == stage else current
+
+
+def get_bounties_issued(time_frame):
+    return time_frame.distinct('bounty').count()
+
+
+def get_fulfillments_submitted(time_frame):
+    return time_frame.count()
+
+
+def get_fulfillments_accepted(time_frame):
+    return time_frame.count()
+
+
+def get_fulfillment_acceptance_rate(time_frame, accepted_date=datetime.now()):
+    counter = time_frame.count()
+    return time_frame.filter(
+        accepted_date__lte=accepted_date).count() / counter if counter else 0
+
+
+def get_bounty_fulfilled_rate(time_frame, bounties):
+    counter = bounties.count()
+    return time_frame.distinct('bounty').count() / \
+        bounties.count() if counter else 0
+
+
+def get_avg_fulfiller_acceptance_rate(
+        time_frame, accepted_date=datetime.now()):
+    # each fulfiller's share of accepted fulfillments, averaged in one grouped query
+    accepted = Case(
+        When(accepted=True, accepted_date__lte=accepted_date, then=1),
+        default=0,
+        output_field=IntegerField())
+    rates = time_frame.order_by().values('fulfiller').annotate(
+        rate=ExpressionWrapper(Cast(Sum(accepted), FloatField()) / Count('id'), output_field=FloatField()))
+    average = rates.aggregate(Avg('rate')).get('rate__avg')
+    return average if average is not None else 0
+
+
+def get_total_amount_paid(time_frame, accepted_date=datetime.now()):
+    total = time_frame.filter(
+        accepted=True, accepted_date__lte=accepted_date).aggregate(Sum('usd_price')).get('usd_price__sum')
+    return total if total is not None else 0
+
+
+def get_avg_fulfillment_amount(time_frame):
+    amounts = time_frame.filter(bounty_stage=COMPLETED_STAGE).aggregate(
+        total=Sum('bounty__usd_price'), count=Count('id'))
+    return amounts['total'] / amounts['count'] if amounts['count'] > 0 else 0
+
+
+def get_total_fulfillment_amount(time_frame):
+    total = time_frame.filter(bounty_stage=COMPLETED_STAGE).aggregate(
+        Sum('bounty__fulfillment_amount')).get('bounty__fulfillment_amount__sum')
+    return total if total is not None else 0
+
+
+def get_total_unique_issuers(time_frame):
+    return time_frame.distinct('bounty').values('bounty__issuer').distinct().count()
+
+
+def get_total_unique_fulfillers(time_frame):
+    return time_frame.values('fulfiller').distinct().count()
+
+
+def get_bounty_draft(time_frame):
+    return reduce(add_on(DRAFT_STAGE), time_frame, 0)
+
+
+def get_bounty_active(time_frame):
+    return reduce(add_on(ACTIVE_STAGE), time_frame, 0)
+
+
+def get_bounty_completed(time_frame):
+    return reduce(add_on(COMPLETED_STAGE), time_frame, 0)
+
+
+def get_bounty_expired(time_frame):
+    return reduce(add_on(EXPIRED_STAGE), time_frame, 0)
+
+
+def get_bounty_dead(time_frame):
+    return reduce(add_on(DEAD_STAGE), time_frame, 0)
+
+
+def build_stages(time_frame):
+    """ Build the total for each bounty stage in a given time frame
+    1. In a given time frame, are retrieved all distinct bounties
+    2. Get the last stage for the bounty
+    3. Increment the counter for the given stage
+    Each position correspond in the stage array correspond to the stage in `constants.py`:
+        DRAFT_STAGE = 0
+        ACTIVE_STAGE = 1
+        DEAD_STAGE = 2
+        COMPLETED_STAGE = 3
+        EXPIRED_STAGE = 4
+    returns [total_drafts, total_active, total_dead, total_completed, total_expired], {bounty: [STAGES...]}
+    **Each total correspond to the last stages of the bounties in the given time frame**
+    """
+    unique_bounties = [b['bounty']
+                       for b in time_frame.values('bounty').distinct()]
+
+    stages = [0, 0, 0, 0, 0]
+    bounty_stages = {}
+    for bounty_id in unique_bounties:
+        bounty_states = time_frame.filter(
+            bounty=bounty_id).order_by(
+            '-change_date',
+            '-bounty_stage')
+        bounty_stages[bounty_id] = map(lambda b: b.bounty_stage, bounty_states)
+        current_stage = bounty_states.first().bounty_stage
+        stages[current_stage] = stages[current_stage] + 1
+
+    return stages, bounty_stages
+
+
+def get_noise_bounties(bounties):
+    noise_bounty_dead = sorted([DRAFT_STAGE, DEAD_STAGE])
+    noise_bounty_draft = [DRAFT_STAGE]
+    noise = []
+    for (bounty, stages) in bounties.items():
+        sorted_stages = sorted(stages)
+        if sorted_stages == noise_bounty_dead or sorted_stages == noise_bounty_draft:
+            noise = [bounty] + noise
+
+    return noise
+
+
+def generate_timeline(time_frame, platform=DEFAULT_PLATFORM):
+    date = time_frame[1]
+    bounty_state_platform = BountyState.objects
+    fulfillment_platform = Fulfillment.objects
+
+    if platform == DEFAULT_PLATFORM:
+        bounty_state_platform = bounty_state_platform.select_related('bounty').filter(DEFAULT_PLATFORM_QUERY)
+        fulfillment_platform = fulfillment_platform.select_related('bounty').filter(DEFAULT_PLATFORM_QUERY)
+    elif platform and platform != ALL_PLATFORM:
+        bounty_state_platform = bounty_state_platform.select_related('bounty').filter(
+            bounty__platform=platform)
+        fulfillment_platform = fulfillment_platform.select_related('bounty').filter(
+            bounty__platform=platform)
+
+    bounties_state_frame_day = bounty_state_platform.filter(
+        change_date__range=time_frame, bounty_stage=DRAFT_STAGE)
+    bounties_state_frame = bounty_state_platform.filter(
+        change_date__lte=time_frame[1])
+    fulfillment_accepted_frame = fulfillment_platform.filter(
+        accepted_date__lte=time_frame[1])
+    fulfillment_accepted_frame_day = fulfillment_platform.filter(
+        accepted_date__range=time_frame)
+    fulfillment_submitted_frame = fulfillment_platform.filter(
+        fulfillment_created__lte=time_frame[1])
+    fulfillment_submitted_frame_day = fulfillment_platform.filter(
+        fulfillment_created__range=time_frame)
+
+    stages, bounties = build_stages(bounties_state_frame)
+
+    noise_bounties = get_noise_bounties(bounties)
+
+    bounties_issued = get_bounties_issued(bounties_state_frame_day)
+    bounties_issued_cum = get_bounties_issued(bounties_state_frame)
+
+    fulfillments_submitted = get_fulfillments_submitted(
+        fulfillment_submitted_frame_day)
+    fulfillments_submitted_cum = get_fulfillments_submitted(
+        fulfillment_submitted_frame)
+
+    fulfillments_accepted = get_fulfillments_accepted(
+        fulfillment_accepted_frame_day)
+    fulfillments_accepted_cum = get_fulfillments_accepted(
+        fulfillment_accepted_frame)
+
+    # Also - a bounty can be active and still have an accepted fulfillment.
+    # For example, a bounty may have a high balance to output multiple fulfillments.
+    # So there is a slight error here.
+    # Also, we probably want to not include bounties from the count that never were in an active state.
+    # ie. a bounty that was in draft forever, or was killed after being in
+    # draft.
+
+    fulfillment_acceptance_rate = get_fulfillment_acceptance_rate(
+        fulfillment_submitted_frame, date)
+
+    bounty_fulfilled_rate = get_bounty_fulfilled_rate(
+        fulfillment_submitted_frame,
+        bounties_state_frame .distinct('bounty') .exclude(
+            bounty__in=noise_bounties))
+
+    avg_fulfiller_acceptance_rate = get_avg_fulfiller_acceptance_rate(
+        fulfillment_submitted_frame, date)
+
+    avg_fulfillment_amount = get_avg_fulfillment_amount(bounties_state_frame)
+    total_fulfillment_amount = get_total_amount_paid(fulfillment_accepted_frame, date)
+
+    total_unique_issuers = get_total_unique_issuers(bounties_state_frame_day)
+    total_unique_issuers_cum = get_total_unique_issuers(bounties_state_frame)
+    total_unique_fulfillers = get_total_unique_fulfillers(fulfillment_submitted_frame_day)
+    total_unique_fulfillers_cum = get_total_unique_fulfillers(fulfillment_submitted_frame)
+
+    bounty_frame = BountiesTimeline(
+        date=time_frame[0],
+        bounties_issued=bounties_issued,
+        bounties_issued_cum=bounties_issued_cum,
+        fulfillments_submitted_cum=fulfillments_submitted_cum,
+        fulfillments_submitted=fulfillments_submitted,
+        fulfillments_accepted_cum=fulfillments_accepted_cum,
+        fulfillments_accepted=fulfillments_accepted,
+        fulfillments_pending_acceptance=fulfillments_submitted_cum - fulfillments_accepted_cum,
+        fulfillment_acceptance_rate=fulfillment_acceptance_rate,
+        bounty_fulfilled_rate=bounty_fulfilled_rate,
+        avg_fulfiller_acceptance_rate=avg_fulfiller_acceptance_rate,
+        avg_fulfillment_amount=avg_fulfillment_amount,
+        total_fulfillment_amount=total_fulfillment_amount,
+        total_unique_issuers=total_unique_issuers,
+        total_unique_issuers_cum=total_unique_issuers_cum,
+        total_unique_fulfillers=total_unique_fulfillers,
+        total_unique_fulfillers_cum=total_unique_fulfillers_cum,
+        bounty_draft=stages[DRAFT_STAGE],
+        bounty_active=stages[ACTIVE_STAGE],
+        bounty_completed=stages[COMPLETED_STAGE],
+        bounty_expired=stages[EXPIRED_STAGE],
+        bounty_dead=stages[DEAD_STAGE],
+        platform=platform)
+
+    return bounty_frame
 
 
 class DateUtilsTest(unittest.TestCase):
@@ -199,3 +444,260 @@ class TestStages(unittest.TestCase):
 
     def test_counter_of_bounties_on_dead_stage(self):
         self.assertEqual(get_bounty_dead(self.bounties), 19)
+
+
+class TimelineEngineTest(unittest.TestCase):
+    """ The vectorized engine against generate_timeline, frame by frame """
+    start = datetime(2030, 1, 1)
+    addresses = ['0xtimelineissuera', '0xtimelineissuerb', '0xtimelinefulfillera', '0xtimelinefulfillerb', '0xtimelinefulfillerc']
+
+    @classmethod
+    def at(cls, day, hour=12):
+        return cls.start + timedelta(days=day, hours=hour)
+
+    @classmethod
+    def setUpClass(cls):
+        issuer_a, issuer_b, fulfiller_a, fulfiller_b, fulfiller_c = cls.addresses
+
+        def bounty(bounty_id, platform, issuer, usd_price, states):
+            bounty = Bounty.objects.create(
+                bounty_id=bounty_id, platform=platform, issuer=issuer, usd_price=usd_price, deadline=cls.at(30))
+            for stage, change_date in states:
+                BountyState.objects.create(bounty=bounty, bounty_stage=stage, change_date=change_date)
+            return bounty
+
+        def fulfill(bounty, fulfiller, created, accepted_date=None, accepted=False, usd_price=None):
+            Fulfillment.objects.create(
+                bounty=bounty, fulfillment_id=Fulfillment.objects.filter(bounty=bounty).count(), fulfiller=fulfiller,
+                fulfillment_created=created, accepted_date=accepted_date, accepted=accepted, usd_price=usd_price, data='')
+
+        completed = bounty(9300, 'timeline-a', issuer_a, 50, [
+            (DRAFT_STAGE, cls.at(0, 10)), (ACTIVE_STAGE, cls.at(0)), (COMPLETED_STAGE, cls.at(2))])
+        bounty(9301, 'timeline-a', issuer_a, 0, [(DRAFT_STAGE, cls.at(0))])
+        bounty(9302, 'timeline-a', issuer_b, 0, [(DRAFT_STAGE, cls.at(1, 3)), (DEAD_STAGE, cls.at(1, 9))])
+        expired = bounty(9303, 'timeline-a', issuer_b, 20, [
+            (DRAFT_STAGE, cls.at(1)), (ACTIVE_STAGE, cls.at(2)), (EXPIRED_STAGE, cls.at(4))])
+        # the draft and dead states at the same time stop being noise once it's activated
+        bounty(9304, 'timeline-a', issuer_a, 0, [
+            (DRAFT_STAGE, cls.at(3)), (DEAD_STAGE, cls.at(3)), (ACTIVE_STAGE, cls.at(9))])
+        # the completed stage wins the tie with the active one
+        other_platform = bounty(9305, 'timeline-b', issuer_b, 30, [
+            (DRAFT_STAGE, cls.at(0)), (ACTIVE_STAGE, cls.at(1)), (COMPLETED_STAGE, cls.at(1))])
+        default_platform = bounty(9306, '', issuer_a, 10, [(DRAFT_STAGE, cls.at(2)), (ACTIVE_STAGE, cls.at(5))])
+
+        fulfill(completed, fulfiller_a, cls.at(0, 20), cls.at(2), True, 50)
+        fulfill(completed, fulfiller_b, cls.at(1))
+        # accepted before it was submitted
+        fulfill(expired, fulfiller_a, cls.at(2, 18), cls.at(1, 23), True, 20)
+        fulfill(expired, fulfiller_c, cls.at(3), cls.at(4))
+        fulfill(other_platform, fulfiller_b, cls.at(1), cls.at(1, 14), True)
+        fulfill(default_platform, fulfiller_a, None, cls.at(3), True, 7)
+        fulfill(default_platform, fulfiller_c, cls.at(10), cls.at(12), True, 3)
+
+    @classmethod
+    def tearDownClass(cls):
+        bounties = Bounty.objects.filter(bounty_id__in=range(9300, 9307))
+        Fulfillment.objects.filter(bounty__in=bounties).delete()
+        BountyState.objects.filter(bounty__in=bounties).delete()
+        bounties.delete()
+        for user in User.objects.filter(public_address__in=cls.addresses):
+            settings = user.settings_id
+            user.delete()
+            Settings.objects.filter(pk=settings).delete()
+
+    def assertMatchesGenerateTimeline(self, frames, is_week=False):
+        data = TimelineData.load()
+        for platform in ['timeline-a', 'timeline-b', DEFAULT_PLATFORM, ALL_PLATFORM]:
+            timelines = build_timelines(data, frames, platform, is_week)
+            self.assertEqual(len(timelines), len(frames))
+
+            for frame, timeline in zip(frames, timelines):
+                expected = generate_timeline(frame, platform=platform)
+                self.assertEqual(timeline.date, frame[0].date())
+                for field in BountiesTimeline._meta.get_fields():
+                    if field.name in ('id', 'date', 'is_week') + RUNNING_TOTAL_FIELDS:
+                        continue
+                    self.assertAlmostEqual(
+                        getattr(timeline, field.name), getattr(expected, field.name),
+                        msg='{} on {} for {}'.format(field.name, frame[0].date(), platform))
+
+    def test_days_match_generate_timeline(self):
+        self.assertMatchesGenerateTimeline([day_bounds(day) for day in range_days(self.at(-1), self.at(13))])
+
+    def test_weeks_match_generate_timeline(self):
+        self.assertMatchesGenerateTimeline(
+            [week_bounds(week) for week in range_weeks(self.at(-7), self.at(21))], is_week=True)
+
+    def test_frames_after_genesis_count_earlier_activity(self):
+        data = TimelineData.load()
+        frames = [day_bounds(day) for day in range_days(self.at(-1), self.at(13))]
+        whole = build_timelines(data, frames, ALL_PLATFORM)
+        tail = build_timelines(data, frames[5:], ALL_PLATFORM)
+
+        for timeline, expected in zip(tail, whole[5:]):
+            self.assertEqual(timeline.bounties_issued_cum, expected.bounties_issued_cum)
+            self.assertEqual(timeline.bounty_active, expected.bounty_active)
+            self.assertEqual(timeline.avg_fulfiller_acceptance_rate, expected.avg_fulfiller_acceptance_rate)
+
+    def test_continued_timelines_match_rebuilt_ones(self):
+        issuer_a, issuer_b, fulfiller_a, fulfiller_b, fulfiller_c = self.addresses
+        frames = [day_bounds(day) for day in range_days(self.at(-1), self.at(13))]
+        platforms = ['timeline-a', 'timeline-b', DEFAULT_PLATFORM, ALL_PLATFORM]
+        data = TimelineData.load()
+        stored = {platform: build_timelines(data, frames, platform) for platform in platforms}
+
+        # activity that came in after the timelines were stored, on an old bounty, and on a new
+        # one of an issuer and a fulfiller with earlier bounties and fulfillments
+        activated = BountyState.objects.create(
+            bounty=Bounty.objects.get(bounty_id=9301), bounty_stage=ACTIVE_STAGE, change_date=self.at(6))
+        late = Bounty.objects.create(
+            bounty_id=9307, platform='timeline-a', issuer=issuer_b, usd_price=40, deadline=self.at(30))
+        BountyState.objects.create(bounty=late, bounty_stage=DRAFT_STAGE, change_date=self.at(5, 8))
+        BountyState.objects.create(bounty=late, bounty_stage=COMPLETED_STAGE, change_date=self.at(8))
+        Fulfillment.objects.create(
+            bounty=late, fulfillment_id=0, fulfiller=fulfiller_b, fulfillment_created=self.at(7),
+            accepted_date=self.at(8), accepted=True, usd_price=40, data='')
+        self.addCleanup(late.delete)
+        self.addCleanup(BountyState.objects.filter(bounty=late).delete)
+        self.addCleanup(Fulfillment.objects.filter(bounty=late).delete)
+        self.addCleanup(activated.delete)
+
+        data = TimelineData.load()
+        active = TimelineData.load_active_since(frames[5][0].replace(tzinfo=None))
+        self.assertLess(len(active.states['bounty']), len(data.states['bounty']))
+
+        for platform in platforms:
+            rebuilt = build_timelines(data, frames, platform)
+            continued = continue_timelines(active, stored[platform][4], frames[4:], platform)
+            self.assertEqual([timeline.date for timeline in continued], [timeline.date for timeline in rebuilt[5:]])
+
+            for timeline, expected in zip(continued, rebuilt[5:]):
+                for field in BountiesTimeline._meta.get_fields():
+                    self.assertAlmostEqual(
+                        getattr(timeline, field.name), getattr(expected, field.name),
+                        msg='{} on {} for {}'.format(field.name, timeline.date, platform))
+
+
+# The per-row implementations the grouped queries replaced, kept to check they agree
+
+
+def legacy_avg_fulfiller_acceptance_rate(time_frame, accepted_date):
+    fulfillers = [b['fulfiller'] for b in time_frame.values('fulfiller').distinct()]
+    counter = 0
+    accumulator = 0
+
+    for fulfiller in fulfillers:
+        fulfillments = time_frame.filter(fulfiller=fulfiller)
+        accepted_fulfillments = fulfillments.filter(accepted=True, accepted_date__lte=accepted_date).count()
+        accumulator += accepted_fulfillments / fulfillments.count()
+        counter += 1
+
+    return accumulator / counter if counter > 0 else 0
+
+
+def legacy_total_amount_paid(time_frame, accepted_date):
+    fulfillers = [b['fulfiller'] for b in time_frame.values('fulfiller').distinct()]
+
+    total = 0
+    for fulfiller in fulfillers:
+        fulfillments = time_frame.filter(fulfiller=fulfiller)
+        accepted_fulfillments = fulfillments.filter(accepted=True, accepted_date__lte=accepted_date)
+        sum_fulfillments = accepted_fulfillments.aggregate(Sum('usd_price')).get('usd_price__sum')
+        total += sum_fulfillments if sum_fulfillments is not None else 0
+    return total
+
+
+def legacy_avg_fulfillment_amount(time_frame):
+    completed_bounties = filter(lambda bounty: bounty.bounty_stage == COMPLETED_STAGE, time_frame)
+    (total, count) = reduce(lambda prev, current: (
+        prev[0] + current.bounty.usd_price, prev[1] + 1), completed_bounties, (0, 0))
+
+    return total / count if count > 0 else 0
+
+
+def legacy_total_fulfillment_amount(time_frame):
+    completed_bounties = filter(lambda bounty: bounty.bounty_stage == COMPLETED_STAGE, time_frame)
+    return reduce(lambda prev, current: prev + current.bounty.fulfillment_amount, completed_bounties, 0)
+
+
+class AggregateMetricsParityTest(unittest.TestCase):
+    """ The grouped aggregate metrics against the per-row implementations they replaced """
+    start = datetime(2031, 1, 1)
+    addresses = ['0xparityissuer', '0xparityfulfillera', '0xparityfulfillerb', '0xparityfulfillerc']
+
+    @classmethod
+    def at(cls, day):
+        return cls.start + timedelta(days=day)
+
+    @classmethod
+    def setUpClass(cls):
+        issuer, fulfiller_a, fulfiller_b, fulfiller_c = cls.addresses
+        cls.bounties = []
+        for index, (usd_price, amount, stages) in enumerate([
+            (12.5, 10 ** 20, [(DRAFT_STAGE, 0), (ACTIVE_STAGE, 0), (COMPLETED_STAGE, 2)]),
+            (7.25, 3, [(DRAFT_STAGE, 1), (ACTIVE_STAGE, 1), (COMPLETED_STAGE, 4)]),
+            (0, 0, [(DRAFT_STAGE, 1), (ACTIVE_STAGE, 2), (EXPIRED_STAGE, 6)]),
+            (100, 5000, [(DRAFT_STAGE, 3), (ACTIVE_STAGE, 3), (COMPLETED_STAGE, 5), (ACTIVE_STAGE, 6)]),
+        ]):
+            bounty = Bounty.objects.create(
+                bounty_id=9310 + index, platform='parity', issuer=issuer, usd_price=usd_price,
+                fulfillment_amount=amount, deadline=cls.at(30))
+            for stage, day in stages:
+                BountyState.objects.create(bounty=bounty, bounty_stage=stage, change_date=cls.at(day))
+            cls.bounties.append(bounty)
+
+        first, second, expired, reopened = cls.bounties
+        for fulfillment_id, (bounty, fulfiller, created, accepted_day, accepted, usd_price) in enumerate([
+            (first, fulfiller_a, 1, 2, True, 12.5),
+            (first, fulfiller_b, 1, None, False, None),
+            (second, fulfiller_a, 2, 4, True, 7.25),
+            (second, fulfiller_c, 3, None, False, 1),
+            (expired, fulfiller_b, 3, None, False, None),
+            (reopened, fulfiller_b, 4, 5, True, 100),
+            (reopened, fulfiller_c, 4, 5, True, None),
+            # an accepted date without the fulfillment being accepted
+            (reopened, fulfiller_a, 5, 6, False, 3),
+        ]):
+            Fulfillment.objects.create(
+                bounty=bounty, fulfillment_id=fulfillment_id, fulfiller=fulfiller, fulfillment_created=cls.at(created),
+                accepted_date=cls.at(accepted_day) if accepted_day is not None else None, accepted=accepted,
+                usd_price=usd_price, data='')
+
+    @classmethod
+    def tearDownClass(cls):
+        Fulfillment.objects.filter(bounty__in=cls.bounties).delete()
+        BountyState.objects.filter(bounty__in=cls.bounties).delete()
+        Bounty.objects.filter(pk__in=[bounty.pk for bounty in cls.bounties]).delete()
+        for user in User.objects.filter(public_address__in=cls.addresses):
+            settings = user.settings_id
+            user.delete()
+            Settings.objects.filter(pk=settings).delete()
+
+    def test_fulfillment_metrics_match(self):
+        fulfillments = Fulfillment.objects.filter(bounty__platform='parity')
+        for day in range(-1, 8):
+            for time_frame in [
+                fulfillments.filter(fulfillment_created__lte=self.at(day)),
+                fulfillments.filter(accepted_date__lte=self.at(day)),
+            ]:
+                self.assertAlmostEqual(
+                    get_avg_fulfiller_acceptance_rate(time_frame, self.at(day)),
+                    legacy_avg_fulfiller_acceptance_rate(time_frame, self.at(day)), msg='day {}'.format(day))
+                self.assertAlmostEqual(
+                    get_total_amount_paid(time_frame, self.at(day)),
+                    legacy_total_amount_paid(time_frame, self.at(day)), msg='day {}'.format(day))
+
+        self.assertAlmostEqual(get_avg_fulfiller_acceptance_rate(fulfillments, self.at(7)), (2 / 3 + 1 / 3 + 1 / 2) / 3)
+        self.assertAlmostEqual(get_total_amount_paid(fulfillments, self.at(7)), 119.75)
+
+    def test_bounty_state_metrics_match(self):
+        states = BountyState.objects.filter(bounty__platform='parity')
+        for day in range(-1, 8):
+            time_frame = states.filter(change_date__lte=self.at(day))
+            self.assertAlmostEqual(
+                get_avg_fulfillment_amount(time_frame), legacy_avg_fulfillment_amount(time_frame), msg='day {}'.format(day))
+            self.assertEqual(
+                get_total_fulfillment_amount(time_frame), legacy_total_fulfillment_amount(time_frame), msg='day {}'.format(day))
+
+        self.assertAlmostEqual(get_avg_fulfillment_amount(states), (12.5 + 7.25 + 100) / 3)
+        self.assertEqual(get_total_fulfillment_amount(states), Decimal(10 ** 20 + 3 + 5000))
@@ -0,0 +1,392 @@
+import numpy as np
+from django.db.models import Q
+
+from analytics.models import BountiesTimeline
+from std_bounties.constants import EXPIRED_STAGE, DEAD_STAGE, COMPLETED_STAGE, ACTIVE_STAGE, DRAFT_STAGE
+from std_bounties.models import BountyState, Fulfillment
+
+
+ALL_PLATFORM = 'all'
+DEFAULT_PLATFORM = 'bounties-network'
+
+STAGE_FIELDS = (
+    (DRAFT_STAGE, 'bounty_draft'),
+    (ACTIVE_STAGE, 'bounty_active'),
+    (DEAD_STAGE, 'bounty_dead'),
+    (COMPLETED_STAGE, 'bounty_completed'),
+    (EXPIRED_STAGE, 'bounty_expired'),
+)
+
+# metrics counting what happened within each frame
+FRAME_FIELDS = (
+    'bounties_issued',
+    'fulfillments_submitted',
+    'fulfillments_accepted',
+    'total_unique_issuers',
+    'total_unique_fulfillers',
+)
+
+# the running totals the rates are derived from by add_rates, stored to continue from
+RUNNING_TOTAL_FIELDS = (
+    'completed_states',
+    'completed_usd_total',
+    'noise_bounties',
+    'fulfilled_bounties',
+    'fulfillments_accepted_submitted',
+    'fulfiller_acceptance_rate_total',
+)
+
+# every total as of the end of each frame
+TOTAL_FIELDS = (
+    'bounties_issued_cum',
+    'fulfillments_submitted_cum',
+    'fulfillments_accepted_cum',
+    'total_fulfillment_amount',
+    'total_unique_issuers_cum',
+    'total_unique_fulfillers_cum',
+) + tuple(field for _, field in STAGE_FIELDS) + RUNNING_TOTAL_FIELDS
+
+
+def to_datetime64(values):
+    """ Naive UTC datetimes, or None, as a datetime64 array with NaT for the missing ones """
+    return np.array(
+        [None if value is None else value.replace(tzinfo=None) for value in values],
+        dtype='datetime64[us]'
+    )
+
+
+def codes(values):
+    """ Small integer codes standing for each distinct value """
+    if not len(values):
+        return np.zeros(0, dtype=np.int64)
+    return np.unique(np.array(values, dtype=object), return_inverse=True)[1].reshape(-1)
+
+
+class TimelineData:
+    """ Every bounty state and fulfillment, loaded once as columns for the timeline engine """
+
+    STATE_FIELDS = ('bounty_id', 'bounty_stage', 'change_date', 'bounty__usd_price', 'bounty__issuer', 'bounty__platform')
+    FULFILLMENT_FIELDS = (
+        'bounty_id', 'fulfiller', 'fulfillment_created', 'accepted', 'accepted_date', 'usd_price', 'bounty__platform'
+    )
+
+    def __init__(self, states, fulfillments):
+        self.states = states
+        self.fulfillments = fulfillments
+
+    @classmethod
+    def load(cls, states=None, fulfillments=None):
+        """
+        @keyword states the BountyState queryset to load, every state by default
+        @keyword fulfillments the Fulfillment queryset to load, every fulfillment by default
+        """
+        states = states if states is not None else BountyState.objects.all()
+        fulfillments = fulfillments if fulfillments is not None else Fulfillment.objects.all()
+
+        bounty, stage, change_date, usd_price, issuer, platform = cls.columns(
+            states.values_list(*cls.STATE_FIELDS), len(cls.STATE_FIELDS))
+        state_columns = {
+            'bounty': np.array(bounty, dtype=np.int64),
+            'stage': np.array(stage, dtype=np.int64),
+            'time': to_datetime64(change_date),
+            'usd_price': np.array(usd_price, dtype=np.float64),
+            'issuer': codes(issuer),
+            'platform': np.array([value or '' for value in platform], dtype=object),
+        }
+
+        bounty, fulfiller, created, accepted, accepted_date, usd_price, platform = cls.columns(
+            fulfillments.values_list(*cls.FULFILLMENT_FIELDS), len(cls.FULFILLMENT_FIELDS))
+        fulfillment_columns = {
+            'bounty': np.array(bounty, dtype=np.int64),
+            'fulfiller': codes(fulfiller),
+            'created': to_datetime64(created),
+            'accepted': np.array(accepted, dtype=bool),
+            'accepted_date': to_datetime64(accepted_date),
+            # missing prices count as nothing paid, like the aggregate sums did
+            'usd_price': np.nan_to_num(np.array(usd_price, dtype=np.float64)),
+            'platform': np.array([value or '' for value in platform], dtype=object),
+        }
+
+        return cls(state_columns, fulfillment_columns)
+
+    @staticmethod
+    def columns(rows, width):
+        columns = list(zip(*rows))
+        return columns if columns else [()] * width
+
+    @classmethod
+    def load_active_since(cls, since):
+        """
+        Every state and fulfillment of the bounties and fulfillers with activity at or after a
+        date, and the first state of their issuers on each platform. Metrics computed from them
+        change from a frame ending before the date on exactly like they do for all the data.
+        """
+        fulfillments = Fulfillment.objects.filter(Q(fulfillment_created__gte=since) | Q(accepted_date__gte=since))
+        fulfillers = set(fulfillments.values_list('fulfiller', flat=True))
+        bounties = set(BountyState.objects.filter(change_date__gte=since).values_list('bounty_id', flat=True))
+        bounties.update(fulfillments.values_list('bounty_id', flat=True))
+
+        issuers = set(BountyState.objects.filter(bounty_id__in=bounties).values_list('bounty__issuer', flat=True))
+        first_states = BountyState.objects.filter(bounty__issuer__in=issuers).order_by(
+            'bounty__issuer', 'bounty__platform', 'change_date', 'id'
+        ).distinct('bounty__issuer', 'bounty__platform').values('id')
+
+        return cls.load(
+            BountyState.objects.filter(Q(bounty_id__in=bounties) | Q(id__in=first_states)),
+            Fulfillment.objects.filter(Q(bounty_id__in=bounties) | Q(fulfiller__in=fulfillers))
+        )
+
+    def platforms(self):
+        return sorted(set(self.states['platform']) - {''})
+
+    def for_platform(self, platform):
+        """ The states and fulfillments of bounties on a platform, like generate_timeline filters them """
+        def mask(platforms):
+            if platform == ALL_PLATFORM:
+                return np.ones(len(platforms), dtype=bool)
+            if platform == DEFAULT_PLATFORM:
+                return (platforms == DEFAULT_PLATFORM) | (platforms == '')
+            return platforms == platform
+
+        states = mask(self.states['platform'])
+        fulfillments = mask(self.fulfillments['platform'])
+        return TimelineData(
+            {name: column[states] for name, column in self.states.items()},
+            {name: column[fulfillments] for name, column in self.fulfillments.items()}
+        )
+
+
+def frame_positions(ends, times):
+    """ The index of the first frame ending at or after each time, len(ends) after the last one """
+    return np.searchsorted(ends, times, side='left')
+
+
+def cumulative(ends, times, weights=None):
+    """ The number of events, or the sum of their weights, at or before the end of each frame """
+    positions = frame_positions(ends, times)
+    return np.cumsum(np.bincount(positions, weights, minlength=len(ends) + 1)[:len(ends)])
+
+
+def per_frame(starts, ends, times, keys=None):
+    """ The number of events within each frame, or of distinct keys among them """
+    positions = frame_positions(ends, times)
+    inside = positions < len(ends)
+    inside[inside] = times[inside] >= starts[positions[inside]]
+    positions = positions[inside]
+
+    if keys is not None and len(positions):
+        positions = np.unique(np.stack([keys[inside], positions]), axis=1)[1]
+    return np.bincount(positions, minlength=len(ends))
+
+
+def changes(*columns):
+    """ Whether each row of sorted columns starts a new run of equal values """
+    change = np.ones(len(columns[0]), dtype=bool)
+    change[1:] = False
+    for column in columns:
+        change[1:] |= column[1:] != column[:-1]
+    return change
+
+
+def first_times(keys, times):
+    """ The earliest time of each distinct key """
+    order = np.lexsort((times, keys))
+    return times[order][changes(keys[order])]
+
+
+def ratio(numerator, denominator):
+    return np.divide(
+        numerator, denominator, out=np.zeros(len(denominator), dtype=np.float64), where=denominator > 0)
+
+
+def group_cumsum(values, new_group):
+    """ Running totals of values that restart at every new group """
+    totals = np.cumsum(values)
+    before = totals - values
+    return totals - before[new_group][np.cumsum(new_group) - 1]
+
+
+def compute_timeline(data, starts, ends):
+    """
+    Every timeline metric for a run of consecutive frames in one pass over the data, with the
+    same meaning generate_timeline, the per frame reference in the tests, gives them for each frame
+
+    @param data TimelineData, usually for_platform
+    @param starts datetime64 array of the first instant of each frame
+    @param ends datetime64 array of the last instant of each frame
+    returns {BountiesTimeline field: array with a value per frame}, the running totals included
+    """
+    frame_count = len(ends)
+    states = data.states
+    fulfillments = data.fulfillments
+    metrics = {}
+
+    # states sorted by bounty, then by time and stage like build_stages orders them
+    order = np.lexsort((states['stage'], states['time'], states['bounty']))
+    bounty = states['bounty'][order]
+    time = states['time'][order]
+    stage = states['stage'][order]
+
+    drafts = stage == DRAFT_STAGE
+    metrics['bounties_issued'] = per_frame(starts, ends, time[drafts], bounty[drafts])
+    metrics['bounties_issued_cum'] = cumulative(ends, first_times(bounty, time))
+    metrics['total_unique_issuers'] = per_frame(starts, ends, time[drafts], states['issuer'][order][drafts])
+    metrics['total_unique_issuers_cum'] = cumulative(ends, first_times(states['issuer'], states['time']))
+
+    completed = stage == COMPLETED_STAGE
+    metrics['completed_usd_total'] = cumulative(ends, time[completed], states['usd_price'][order][completed])
+    metrics['completed_states'] = cumulative(ends, time[completed])
+
+    # each bounty's last stage as of each frame, counted by adding it where it starts and
+    # removing the stage it replaces
+    positions = frame_positions(ends, time)
+    last = np.roll(changes(bounty, positions), -1)
+    last_bounty, last_position, last_stage = bounty[last], positions[last], stage[last]
+    replaces = ~changes(last_bounty)
+    replaced_stage = np.roll(last_stage, 1)
+    for stage_value, field in STAGE_FIELDS:
+        added = np.bincount(last_position[last_stage == stage_value], minlength=frame_count + 1)
+        removed = np.bincount(
+            last_position[replaces & (replaced_stage == stage_value)], minlength=frame_count + 1)
+        metrics[field] = np.cumsum(added - removed)[:frame_count]
+
+    # noise bounties (see get_noise_bounties) only have a draft, or a draft and a dead state. They
+    # are noise from their first state to their second, or from their second to their third.
+    group_start = np.flatnonzero(changes(bounty))
+    sizes = np.diff(np.r_[group_start, len(bounty)])
+    second = np.minimum(group_start + 1, len(bounty) - 1)
+    third = np.minimum(group_start + 2, len(bounty) - 1)
+    only_draft = stage[group_start] == DRAFT_STAGE
+    pair = np.sort(np.stack([stage[group_start], stage[second]]), axis=0)
+    draft_and_dead = (sizes >= 2) & (pair[0] == DRAFT_STAGE) & (pair[1] == DEAD_STAGE)
+    noise = cumulative(ends, time[group_start][only_draft])
+    noise -= cumulative(ends, time[second][only_draft & (sizes >= 2)])
+    noise += cumulative(ends, time[second][draft_and_dead])
+    noise -= cumulative(ends, time[third][draft_and_dead & (sizes >= 3)])
+    metrics['noise_bounties'] = noise
+
+    created = fulfillments['created']
+    accepted_date = fulfillments['accepted_date']
+    submitted = ~np.isnat(created)
+    has_accepted_date = ~np.isnat(accepted_date)
+
+    metrics['fulfillments_submitted'] = per_frame(starts, ends, created[submitted])
+    metrics['fulfillments_submitted_cum'] = cumulative(ends, created[submitted])
+    metrics['fulfillments_accepted'] = per_frame(starts, ends, accepted_date[has_accepted_date])
+    metrics['fulfillments_accepted_cum'] = cumulative(ends, accepted_date[has_accepted_date])
+
+    # a submitted fulfillment counts as accepted from the later of its two dates on
+    accepted_after = np.maximum(created, accepted_date)
+    metrics['fulfillments_accepted_submitted'] = cumulative(ends, accepted_after[submitted & has_accepted_date])
+    metrics['fulfilled_bounties'] = cumulative(
+        ends, first_times(fulfillments['bounty'][submitted], created[submitted]))
+
+    paid = fulfillments['accepted'] & has_accepted_date
+    metrics['total_fulfillment_amount'] = cumulative(ends, accepted_date[paid], fulfillments['usd_price'][paid])
+
+    fulfiller = fulfillments['fulfiller']
+    metrics['total_unique_fulfillers'] = per_frame(starts, ends, created[submitted], fulfiller[submitted])
+    metrics['total_unique_fulfillers_cum'] = cumulative(ends, first_times(fulfiller[submitted], created[submitted]))
+
+    # the average of every fulfiller's acceptance rate, as the sum of the changes to each rate
+    # over the number of fulfillers so far
+    accepted = submitted & paid
+    keys = np.stack([
+        np.r_[fulfiller[submitted], fulfiller[accepted]],
+        np.r_[frame_positions(ends, created[submitted]), frame_positions(ends, accepted_after[accepted])],
+    ])
+    rate_changes = np.zeros(frame_count + 1)
+    if keys.shape[1]:
+        keys, inverse = np.unique(keys, axis=1, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        new_fulfiller = changes(keys[0])
+        submitted_count = group_cumsum(np.bincount(inverse, np.r_[np.ones(submitted.sum()), np.zeros(accepted.sum())]), new_fulfiller)
+        accepted_count = group_cumsum(np.bincount(inverse, np.r_[np.zeros(submitted.sum()), np.ones(accepted.sum())]), new_fulfiller)
+        rates = accepted_count / submitted_count
+        previous_rates = np.where(new_fulfiller, 0, np.roll(rates, 1))
+        rate_changes = np.bincount(keys[1], rates - previous_rates, minlength=frame_count + 1)
+    metrics['fulfiller_acceptance_rate_total'] = np.cumsum(rate_changes[:frame_count])
+
+    return add_rates(metrics)
+
+
+def add_rates(metrics):
+    """ Adds the metrics derived from the running totals """
+    metrics['fulfillments_pending_acceptance'] = \
+        metrics['fulfillments_submitted_cum'] - metrics['fulfillments_accepted_cum']
+    metrics['fulfillment_acceptance_rate'] = ratio(
+        metrics['fulfillments_accepted_submitted'], metrics['fulfillments_submitted_cum'])
+    metrics['bounty_fulfilled_rate'] = ratio(
+        metrics['fulfilled_bounties'], metrics['bounties_issued_cum'] - metrics['noise_bounties'])
+    metrics['avg_fulfiller_acceptance_rate'] = ratio(
+        metrics['fulfiller_acceptance_rate_total'], metrics['total_unique_fulfillers_cum'])
+    metrics['avg_fulfillment_amount'] = ratio(metrics['completed_usd_total'], metrics['completed_states'])
+    return metrics
+
+
+def frame_arrays(frames):
+    """ The starts and ends of (floor, ceil) frames, like day_bounds returns them, as datetime64 arrays """
+    return to_datetime64([floor for floor, _ in frames]), to_datetime64([ceil for _, ceil in frames])
+
+
+def build_timelines(data, frames, platform, is_week=False):
+    """
+    BountiesTimeline rows for consecutive frames of a platform, computed with compute_timeline
+
+    @param data TimelineData of every platform
+    @param frames (floor, ceil) bounds of each day or week, in order
+    """
+    if not frames:
+        return []
+
+    starts, ends = frame_arrays(frames)
+    metrics = compute_timeline(data.for_platform(platform), starts, ends)
+    return timeline_rows(frames, metrics, platform, is_week)
+
+
+def continue_timelines(data, previous, frames, platform, is_week=False):
+    """
+    BountiesTimeline rows for the frames following a stored row, from its running totals and
+    how much they changed since in the data
+
+    @param data TimelineData of every platform, at least load_active_since the start of the first frame
+    @param previous the BountiesTimeline row of the frame right before, with its running totals
+    @param frames (floor, ceil) bounds of the previous row's frame, then of each frame to compute
+    """
+    if len(frames) < 2:
+        return []
+
+    starts, ends = frame_arrays(frames)
+    changed = compute_timeline(data.for_platform(platform), starts, ends)
+    metrics = {field: changed[field][1:] for field in FRAME_FIELDS}
+    for field in TOTAL_FIELDS:
+        metrics[field] = getattr(previous, field) + (changed[field][1:] - changed[field][0])
+    return timeline_rows(frames[1:], add_rates(metrics), platform, is_week)
+
+
+def timeline_rows(frames, metrics, platform, is_week):
+    return [
+        BountiesTimeline(
+            date=floor.date(),
+            is_week=is_week,
+            platform=platform,
+            **{field: values[index].item() for field, values in metrics.items()}
+        )
+        for index, (floor, _) in enumerate(frames)
+    ]
+
+
+def save_timelines(timelines, platform, is_week=False):
+    """ Updates the rows already stored for the same dates and bulk inserts the rest """
+    existing = dict(BountiesTimeline.objects.filter(
+        platform=platform, is_week=is_week, date__in=[timeline.date for timeline in timelines]
+    ).values_list('date', 'id'))
+
+    new_timelines = []
+    for timeline in timelines:
+        timeline.id = existing.get(timeline.date)
+        if timeline.id:
+            timeline.save()
+        else:
+            new_timelines.append(timeline)
+    BountiesTimeline.objects.bulk_create(new_timelines, batch_size=1000)
@@ -1,4 +1,5 @@
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 import logging
 from django.conf import settings
@@ -10,7 +11,9 @@ logger = logging.getLogger('django')
 SENDER = 'Bounties Team <team@bounties.network>'
 AWS_REGION = 'us-east-1'
 CHARSET = 'UTF-8'
-client = boto3.client('ses', region_name=AWS_REGION)
+# bounded, so a call from the side effect dispatcher can't outlast its lease
+client = boto3.client('ses', region_name=AWS_REGION, config=Config(
+    connect_timeout=5, read_timeout=10, retries={'max_attempts': 2}))
 
 
 def send_email(receiver, subject, html):
@@ -131,6 +131,10 @@ DATABASES = {
     }
 }
 
+# Database that replay_events reads the Event history from, while default holds the schema being rebuilt
+if os.environ.get('replay_source_db'):
+    DATABASES['replay_source'] = dict(DATABASES['default'], NAME=os.environ.get('replay_source_db'))
+
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
 
@@ -1,4 +1,5 @@
 import boto3
+from botocore.config import Config
 import json
 from botocore.exceptions import ClientError
 import logging
@@ -9,7 +10,9 @@ logger = logging.getLogger('django')
 
 
 AWS_REGION = 'us-east-1'
-client = boto3.client('sns', region_name=AWS_REGION)
+# bounded, so a call from the side effect dispatcher can't outlast its lease
+client = boto3.client('sns', region_name=AWS_REGION, config=Config(
+    connect_timeout=5, read_timeout=10, retries={'max_attempts': 2}))
 
 
 def sns_publish(receiver, message):
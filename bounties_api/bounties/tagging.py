@@ -0,0 +1,77 @@
+import threading
+
+from bounties.utils import bulk_insert_ignore_conflicts
+
+
+class TagSet:
+    """
+    Name to id lookups for a tag model (categories, skills, languages), cached in memory, and
+    set-based syncing of a many to many relation to a list of names.
+
+    @param model Tag model, whose save() fills normalized_name from name
+    @keyword lookup_field Field the given names are matched on, 'name' or 'normalized_name'
+    @keyword create Whether unknown names are created or ignored
+    """
+
+    def __init__(self, model, lookup_field='name', create=True):
+        self.model = model
+        self.lookup_field = lookup_field
+        self.create = create
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def clean(self, names):
+        if not isinstance(names, list):
+            return []
+
+        cleaned = (name.strip() for name in names if isinstance(name, str))
+        if self.lookup_field == 'normalized_name':
+            cleaned = (name.lower() for name in cleaned)
+        return list(dict.fromkeys(name for name in cleaned if name))
+
+    def ids(self, names):
+        names = self.clean(names)
+        with self.lock:
+            missing = [name for name in names if name not in self.cache]
+
+        if missing:
+            found = self.lookup(missing)
+            if self.create and len(found) < len(missing):
+                bulk_insert_ignore_conflicts(self.model, [
+                    self.model(name=name, normalized_name=name.lower())
+                    for name in missing if name not in found
+                ], ['name'])
+                found = self.lookup(missing)
+            with self.lock:
+                self.cache.update(found)
+
+        with self.lock:
+            return [self.cache[name] for name in names if name in self.cache]
+
+    def lookup(self, names):
+        return dict(self.model.objects.filter(
+            **{'{}__in'.format(self.lookup_field): names}
+        ).values_list(self.lookup_field, 'id'))
+
+    def forget(self, ids):
+        """Drop the cached names of these ids, so they are looked up again"""
+
+        with self.lock:
+            self.cache = {name: tag_id for name, tag_id in self.cache.items() if tag_id not in ids}
+
+    def sync(self, manager, names):
+        """Link the related manager to exactly these names, adding and removing only what changed"""
+
+        wanted = set(self.ids(names))
+        current = set(manager.values_list('id', flat=True))
+        added = wanted - current
+        if added:
+            # A tag deleted or merged since it was cached would only fail its foreign key at commit
+            stale = added - set(self.model.objects.filter(id__in=added).values_list('id', flat=True))
+            if stale:
+                self.forget(stale)
+                wanted = set(self.ids(names))
+        if current - wanted:
+            manager.remove(*(current - wanted))
+        if wanted - current:
+            manager.add(*(wanted - current))
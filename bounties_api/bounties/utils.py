@@ -3,6 +3,7 @@ from decimal import Decimal, Context, ROUND_HALF_UP
 import time
 import logging
 from django.conf import settings
+from django.db import connection
 
 logger = logging.getLogger('django')
 max_datetime = datetime.datetime(9999, 12, 31, 23, 59, 59, 999999)
@@ -79,6 +80,20 @@ def dictfetchall(cursor):
     ]
 
 
+def dictiter(cursor, chunk_size=100):
+    "Yields the rows of a cursor as dicts, fetching them a chunk at a time"
+    columns = None
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        # server side cursors only have a description after the first fetch
+        if columns is None:
+            columns = [col[0] for col in cursor.description]
+        for row in rows:
+            yield dict(zip(columns, row))
+
+
 def calculate_token_value(value, decimals):
     return (Decimal(value) / Decimal(pow(10, decimals))
             ).quantize(Decimal(10) ** -decimals)
@@ -114,3 +129,53 @@ def token_decimals(tokens):
 def usd_decimals(tokens):
     return create_usd_decimals(tokens).quantize(
         Decimal('.01'), rounding=ROUND_HALF_UP).normalize()
+
+
+def bulk_insert_ignore_conflicts(model, objs, conflict_fields, returning=('id',)):
+    """
+    INSERT ... ON CONFLICT DO NOTHING for unsaved model instances, in one statement.
+    Returns the `returning` columns of the rows that were actually inserted.
+    """
+    return bulk_upsert(model, objs, conflict_fields, returning=returning)
+
+
+def bulk_upsert(model, objs, conflict_fields, update_fields=None, returning=('id',)):
+    """
+    INSERT ... ON CONFLICT for unsaved model instances, in one statement. Conflicting rows get
+    `update_fields` from the new values, only if they differ, or are left alone without them.
+    Returns the `returning` columns of the rows that were inserted or updated.
+    """
+    if not objs:
+        return []
+
+    quote_name = connection.ops.quote_name
+    fields = [field for field in model._meta.local_concrete_fields if not field.primary_key]
+    rows = []
+    params = []
+    for obj in objs:
+        rows.append('({})'.format(', '.join(['%s'] * len(fields))))
+        params.extend(field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields)
+
+    table = quote_name(model._meta.db_table)
+    if update_fields:
+        columns = [quote_name(model._meta.get_field(name).column) for name in update_fields]
+        conflict_action = 'DO UPDATE SET {} WHERE ({}) IS DISTINCT FROM ({})'.format(
+            ', '.join('{0} = EXCLUDED.{0}'.format(column) for column in columns),
+            ', '.join('{}.{}'.format(table, column) for column in columns),
+            ', '.join('EXCLUDED.{}'.format(column) for column in columns),
+        )
+    else:
+        conflict_action = 'DO NOTHING'
+
+    sql = 'INSERT INTO {} ({}) VALUES {} ON CONFLICT ({}) {} RETURNING {}'.format(
+        table,
+        ', '.join(quote_name(field.column) for field in fields),
+        ', '.join(rows),
+        ', '.join(quote_name(model._meta.get_field(name).column) for name in conflict_fields),
+        conflict_action,
+        ', '.join(quote_name(column) for column in returning),
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
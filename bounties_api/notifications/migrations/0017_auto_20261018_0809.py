@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 08:09
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0016_auto_20190224_0054'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dashboardnotification',
+            index=models.Index(fields=['notification', 'is_activity'], name='dashboard_notif_activity'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-notification_created'], name='notification_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'viewed', '-created'], name='transaction_user_viewed'),
+        ),
+    ]
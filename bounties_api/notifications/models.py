@@ -20,6 +20,11 @@ class Notification(models.Model):
     dashboard = models.BooleanField(default=True, null=False)
     platform = models.CharField(max_length=128, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-notification_created'], name='notification_user_created'),
+        ]
+
 
 class DashboardNotification(models.Model):
     created = models.DateTimeField(auto_now_add=True)
@@ -30,6 +35,11 @@ class DashboardNotification(models.Model):
     string_data = models.CharField(max_length=512, blank=True)
     data = JSONField(null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['notification', 'is_activity'], name='dashboard_notif_activity'),
+        ]
+
 
 class Transaction(models.Model):
     user = models.ForeignKey('user.User', null=False)
@@ -45,3 +55,8 @@ class Transaction(models.Model):
     viewed = models.BooleanField(default=False, null=False)
     data = JSONField(default=dict, null=False)
     platform = models.CharField(max_length=128, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'viewed', '-created'], name='transaction_user_viewed'),
+        ]
@@ -5,7 +5,8 @@ from std_bounties.models import Contribution, Fulfillment, DraftBounty
 from std_bounties.serializers import BountySerializer, ContributionSerializer, FulfillmentSerializer
 from std_bounties.constants import DRAFT_STAGE, ACTIVE_STAGE, DEAD_STAGE, COMPLETED_STAGE, EXPIRED_STAGE, STANDARD_BOUNTIES_V1
 from std_bounties.client_helpers import map_bounty_data, map_token_data, map_fulfillment_data, get_token_pricing, get_historic_pricing
-from user.models import User
+from std_bounties.leaderboards import refresh_leaderboards
+from user.resolver import resolve_users, resolve_user
 from bounties.utils import getDateTimeFromTimestamp
 from django.db import transaction
 import logging
@@ -36,17 +37,19 @@ class BountyClient:
 
         # TODO what happens if issuers or approvers is actually blank?
         contract_state = {'issuers': {}, 'approvers': {}}
+        issuer_addresses = [issuer.lower() for issuer in kwargs.get('issuers', [])]
+        approver_addresses = [approver.lower() for approver in kwargs.get('approvers', [])]
+        users = resolve_users(issuer_addresses + approver_addresses)
+
         issuers = []
-        for index, issuer in enumerate(kwargs.get('issuers', [])):
-            user = User.objects.get_or_create(public_address=issuer.lower())[0]
-            issuers.append(user.pk)
-            contract_state['issuers'].update({issuer.lower(): index})
+        for index, issuer in enumerate(issuer_addresses):
+            issuers.append(users[issuer][0].pk)
+            contract_state['issuers'].update({issuer: index})
 
         approvers = []
-        for index, approver in enumerate(kwargs.get('approvers', [])):
-            user = User.objects.get_or_create(public_address=approver.lower())[0]
-            approvers.append(user.pk)
-            contract_state['approvers'].update({approver.lower(): index})
+        for index, approver in enumerate(approver_addresses):
+            approvers.append(users[approver][0].pk)
+            contract_state['approvers'].update({approver: index})
 
         bounty_data = {
             'bounty_id': bounty_id,
@@ -143,11 +146,11 @@ class BountyClient:
 
         return instance
 
-    @transaction.atomic
     def accept_fulfillment(self, bounty, **kwargs):
         event_date = datetime.datetime.fromtimestamp(int(kwargs.get('event_timestamp')))
-        bounty.balance = bounty.balance - bounty.fulfillment_amount
 
+        # Priced before any rows are written. The subscriber prefetches the day's price, so this
+        # only calls cryptocompare inside the event's transaction when that prefetch failed
         usd_price, token_price = get_historic_pricing(
             bounty.token_symbol,
             bounty.token_decimals,
@@ -155,19 +158,24 @@ class BountyClient:
             kwargs.get('event_timestamp')
         )
 
-        if bounty.balance < bounty.fulfillment_amount:
-            bounty.bounty_stage = COMPLETED_STAGE
-            bounty.usd_price = usd_price
-            bounty.token_lock_price = token_price
-            bounty.record_bounty_state(event_date)
+        with transaction.atomic():
+            bounty.balance = bounty.balance - bounty.fulfillment_amount
 
-        bounty.save()
+            if bounty.balance < bounty.fulfillment_amount:
+                bounty.bounty_stage = COMPLETED_STAGE
+                bounty.usd_price = usd_price
+                bounty.token_lock_price = token_price
+                bounty.record_bounty_state(event_date)
+
+            bounty.save()
+
+            fulfillment = Fulfillment.objects.get(bounty=bounty.pk, fulfillment_id=kwargs.get('fulfillment_id'))
+            fulfillment.accepted = True
+            fulfillment.usd_price = usd_price
+            fulfillment.accepted_date = getDateTimeFromTimestamp(kwargs.get('event_timestamp'))
+            fulfillment.save()
 
-        fulfillment = Fulfillment.objects.get(bounty=bounty.pk, fulfillment_id=kwargs.get('fulfillment_id'))
-        fulfillment.accepted = True
-        fulfillment.usd_price = usd_price
-        fulfillment.accepted_date = getDateTimeFromTimestamp(kwargs.get('event_timestamp'))
-        fulfillment.save()
+            refresh_leaderboards(issuers=[bounty.issuer], fulfillers=[fulfillment.fulfiller])
 
         return fulfillment
 
@@ -219,7 +227,7 @@ class BountyClient:
         bounty.save()
 
         contribution_serializer = ContributionSerializer(data={
-            'contributor': User.objects.get_or_create(public_address=kwargs.get('contributor').lower())[0].pk,
+            'contributor': resolve_user(kwargs.get('contributor').lower())[0].pk,
             'bounty': bounty.pk,
             'contribution_id': kwargs.get('contribution_id'),
             'amount': kwargs.get('amount'),
@@ -278,8 +286,9 @@ class BountyClient:
 
         issuers = kwargs.get('issuers')
         issuers_state = {}
+        users = resolve_users([issuer.lower() for issuer in issuers])
+        bounty.issuers.add(*[user.pk for user, _ in users.values()])
         for (index, issuer) in enumerate(issuers):
-            bounty.issuers.add(User.objects.get_or_create(public_address=issuer.lower())[0].pk)
             issuers_state.update({issuer.lower(): index})
 
         contract_state = json.loads(bounty.contract_state)
@@ -295,8 +304,9 @@ class BountyClient:
 
         approvers = kwargs.get('approvers')
         approvers_state = {}
+        users = resolve_users([approver.lower() for approver in approvers])
+        bounty.approvers.add(*[user.pk for user, _ in users.values()])
         for (index, approver) in enumerate(approvers):
-            bounty.approvers.add(User.objects.get_or_create(public_address=approver.lower())[0].pk)
             approvers_state.update({approver.lower(): index})
 
         contract_state = json.loads(bounty.contract_state)
@@ -309,10 +319,12 @@ class BountyClient:
 
     @transaction.atomic
     def change_bounty(self, bounty, **kwargs):
-        bounty = self.change_data(bounty, **kwargs)
-        bounty = self.change_deadline(bounty, **kwargs)
-        bounty = self.update_bounty_issuers(bounty, **kwargs)
-        bounty = self.update_bounty_approvers(bounty, **kwargs)
+        # each step saves the bounty, the changes are written once at the end
+        with bounty.coalesced_saves():
+            bounty = self.change_data(bounty, **kwargs)
+            bounty = self.change_deadline(bounty, **kwargs)
+            bounty = self.update_bounty_issuers(bounty, **kwargs)
+            bounty = self.update_bounty_approvers(bounty, **kwargs)
 
         return bounty
 
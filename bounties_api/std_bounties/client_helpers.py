@@ -1,17 +1,22 @@
+import bisect
+import calendar
 import json
 import requests
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from web3 import Web3, HTTPProvider
 from web3.contract import ConciseContract
 from web3.middleware import geth_poa_middleware
-from std_bounties.constants import rev_mapped_difficulties, BEGINNER, INTERMEDIATE, ADVANCED
+from std_bounties.constants import rev_mapped_difficulties, BEGINNER, INTERMEDIATE, ADVANCED, \
+    HUMAN_STANDARD_TOKEN, DS_TOKEN
 from std_bounties.contract import data
-from std_bounties.models import Token
+from std_bounties.ipfs_cache import ipfs_cache
+from std_bounties.models import Token, TokenContract, HistoricPrice, TokenPrice
 from utils.functional_tools import pluck
 
 from django.conf import settings
+from django.db import IntegrityError, transaction
 import ipfsapi
 import logging
 
@@ -23,6 +28,10 @@ if settings.ETH_NETWORK in ['rinkeby', 'consensysrinkeby', 'rinkebystaging', 'ri
     web3.middleware_stack.inject(geth_poa_middleware, layer=0)
 bounties_json = json.loads(data)
 ipfs = ipfsapi.connect(host='https://ipfs.bounties.network', port='443')
+# Checksummed token address to (symbol, decimals)
+token_metadata = {}
+# How old a price recorded by get_token_values can be and still stand in for a historic price
+RECORDED_PRICE_MAX_AGE = timedelta(days=1)
 bounty_v0_data_keys = [
     'uid',
     'description',
@@ -38,12 +47,30 @@ fulfillment_data_keys = [
 ]
 
 
+def fetch_ipfs_content(ipfs_hash):
+    return ipfs.cat(ipfs_hash)
+
+
+def prefetch_ipfs_data(messages):
+    """Concurrently warm the IPFS cache with the data hashes of upcoming events"""
+
+    ipfs_hashes = [
+        source.get('data')
+        for message in messages
+        for source in (message.contract_method_inputs, message.contract_event_data)
+    ]
+    ipfs_cache.prefetch(
+        [ipfs_hash for ipfs_hash in ipfs_hashes if isinstance(ipfs_hash, str) and len(ipfs_hash) == 46 and ipfs_hash.startswith('Qm')],
+        fetch_ipfs_content
+    )
+
+
 def map_bounty_data(ipfs_hash, bounty_id):
     if len(ipfs_hash) != 46 or not ipfs_hash.startswith('Qm'):
         logger.error('Data Hash Incorrect for bounty: {:d}'.format(bounty_id))
         return {}
 
-    raw_ipfs_data = ipfs.cat(ipfs_hash)
+    raw_ipfs_data = ipfs_cache.cat(ipfs_hash, fetch_ipfs_content)
 
     data = json.loads(raw_ipfs_data)
     meta = data.get('meta', {})
@@ -152,7 +179,7 @@ def map_fulfillment_data(data_hash, bounty_id, fulfillment_id):
                 bounty_id, fulfillment_id))
         data_JSON = "{}"
     else:
-        data_JSON = ipfs.cat(ipfs_hash)
+        data_JSON = ipfs_cache.cat(ipfs_hash, fetch_ipfs_content)
     if len(ipfs_hash) == 0:
         ipfs_hash = 'invalid'
 
@@ -200,6 +227,34 @@ def get_token_pricing(token_symbol, token_decimals, value):
 
 
 def get_historic_pricing(token_symbol, token_decimals, value, timestamp):
+    token_price = get_historic_price(token_symbol, timestamp)
+
+    if token_price is None:
+        usd_price, token_model = get_token_pricing(token_symbol, token_decimals, value)
+        token_price = token_model.price_usd if token_model else 0
+        return usd_price, token_price
+
+    return calculate_usd_price(value, token_decimals, token_price), token_price
+
+
+def get_historic_price(token_symbol, timestamp):
+    """
+    Returns the USD price of a token on the day of the timestamp, or None when cryptocompare
+    doesn't know the token or can't answer right now.
+
+    The first price found for a day, a price get_token_values recorded or else cryptocompare's
+    close, is stored and answers every later lookup of that day, so a replay always prices the
+    same events the same way. Tokens cryptocompare doesn't know are stored too.
+    """
+    date = datetime.utcfromtimestamp(int(timestamp)).date()
+    historic_price = HistoricPrice.objects.filter(symbol=token_symbol, date=date).first()
+    if historic_price:
+        return historic_price.price_usd
+
+    token_price = get_recorded_price(token_symbol, timestamp)
+    if token_price:
+        return store_historic_price(token_symbol, date, token_price.price_usd)
+
     r = requests.get('https://min-api.cryptocompare.com/data/pricehistorical?fsym={}&tsyms=USD&ts={}&extraParams=bountiesnetwork'.format(
         token_symbol,
         timestamp
@@ -210,13 +265,202 @@ def get_historic_pricing(token_symbol, token_decimals, value, timestamp):
     coin_data = r.json()
 
     if coin_data.get('Response', None) == 'Error':
-        usd_price, token_model = get_token_pricing(token_symbol, token_decimals, value)
-        token_price = token_model.price_usd if token_model else 0
-        return usd_price, token_price
+        if not is_unknown_token(coin_data):
+            # Rate limits and other transient errors fall back to the current price without
+            # remembering it
+            return None
+        price_usd = None
+    else:
+        price_usd = coin_data[token_symbol]['USD']
 
-    token_price = coin_data[token_symbol]['USD']
+    return store_historic_price(token_symbol, date, price_usd)
+
+
+def store_historic_price(token_symbol, date, price_usd):
+    """Stores the price of a day unless one was stored first, and returns the stored one"""
+
+    historic_price, _ = HistoricPrice.objects.get_or_create(
+        symbol=token_symbol,
+        date=date,
+        defaults={'price_usd': price_usd}
+    )
+
+    return historic_price.price_usd
+
+
+def get_recorded_price(token_symbol, timestamp):
+    """Returns the last price get_token_values recorded in the day up to the timestamp, if any"""
+
+    time = datetime.utcfromtimestamp(int(timestamp))
+    return TokenPrice.objects.filter(
+        symbol=token_symbol,
+        time__lte=time,
+        time__gt=time - RECORDED_PRICE_MAX_AGE,
+    ).order_by('-time').first()
+
+
+def prefetch_historic_prices(pairs):
+    """
+    Stores the daily prices for a backlog of (symbol, timestamp) pairs, with one request per
+    symbol covering all of its missing days instead of one request per pair. Resolves each day
+    the way get_historic_price would for its earliest pair.
+    """
+    first_times = {}
+    for symbol, timestamp in pairs:
+        if not symbol:
+            continue
+        time = datetime.utcfromtimestamp(int(timestamp))
+        first_times[symbol, time.date()] = min(time, first_times.get((symbol, time.date()), time))
+    if not first_times:
+        return
+
+    known = set(HistoricPrice.objects.filter(
+        symbol__in={symbol for symbol, _ in first_times},
+        date__in={date for _, date in first_times},
+    ).values_list('symbol', 'date'))
+    first_times = {day: time for day, time in first_times.items() if day not in known}
+    if not first_times:
+        return
+
+    recorded = {}
+    for symbol, time, price_usd in TokenPrice.objects.filter(
+        symbol__in={symbol for symbol, _ in first_times},
+        time__gt=min(first_times.values()) - RECORDED_PRICE_MAX_AGE,
+        time__lte=max(first_times.values()),
+    ).order_by('time').values_list('symbol', 'time', 'price_usd'):
+        times, prices = recorded.setdefault(symbol, ([], []))
+        times.append(time)
+        prices.append(price_usd)
+
+    # days get_token_values recorded a price for are stored from TokenPrice
+    recorded_prices, missing_dates = [], {}
+    for (symbol, date), time in first_times.items():
+        price_usd = find_recorded_price(*recorded.get(symbol, ([], [])), time)
+        if price_usd is not None:
+            recorded_prices.append(HistoricPrice(symbol=symbol, date=date, price_usd=price_usd))
+        else:
+            missing_dates.setdefault(symbol, []).append(date)
+    if recorded_prices:
+        store_historic_prices(recorded_prices)
+
+    for symbol, dates in missing_dates.items():
+        try:
+            prices = fetch_daily_prices(symbol, min(dates), max(dates))
+        except requests.RequestException as e:
+            logger.warning('Could not prefetch historic prices for {}: {}'.format(symbol, e))
+            continue
+
+        store_historic_prices([
+            HistoricPrice(symbol=symbol, date=date, price_usd=prices.get(date) if prices is not None else None)
+            for date in dates
+            if prices is None or date in prices
+        ])
+
+
+def find_recorded_price(times, prices, time):
+    """The price get_recorded_price finds for the time, from samples sorted by time"""
+
+    index = bisect.bisect_right(times, time)
+    if index > 0 and times[index - 1] > time - RECORDED_PRICE_MAX_AGE:
+        return prices[index - 1]
+    return None
 
-    return calculate_usd_price(value, token_decimals, token_price), token_price
+
+def fetch_daily_prices(token_symbol, from_date, to_date):
+    """Returns {date: USD close} between the two dates, or None when cryptocompare doesn't know the token"""
+
+    prices = {}
+    to_timestamp = calendar.timegm(to_date.timetuple())
+
+    while to_date >= from_date:
+        # histoday returns at most 2000 days, ending with the day of toTs
+        limit = max(min((to_date - from_date).days, 2000), 1)
+        r = requests.get('https://min-api.cryptocompare.com/data/histoday?fsym={}&tsym=USD&limit={}&toTs={}&extraParams=bountiesnetwork'.format(
+            token_symbol,
+            limit,
+            to_timestamp
+        ))
+
+        r.raise_for_status()
+
+        coin_data = r.json()
+        if coin_data.get('Response', None) == 'Error':
+            if not is_unknown_token(coin_data):
+                raise requests.RequestException(coin_data.get('Message'))
+            return None
+
+        for day in coin_data.get('Data', []):
+            prices[datetime.utcfromtimestamp(day['time']).date()] = day['close']
+
+        to_date = to_date - timedelta(days=limit + 1)
+        to_timestamp = calendar.timegm(to_date.timetuple())
+
+    return prices
+
+
+def is_unknown_token(coin_data):
+    """Whether a cryptocompare error says it has no prices for the token at all, which lasts"""
+
+    message = coin_data.get('Message', '').lower()
+    return 'there is no data for' in message or 'market does not exist' in message
+
+
+def store_historic_prices(historic_prices):
+    try:
+        with transaction.atomic():
+            HistoricPrice.objects.bulk_create(historic_prices)
+    except IntegrityError:
+        # Another process stored some of them first
+        for historic_price in historic_prices:
+            HistoricPrice.objects.get_or_create(
+                symbol=historic_price.symbol,
+                date=historic_price.date,
+                defaults={'price_usd': historic_price.price_usd}
+            )
+
+
+def get_token_metadata(token_contract):
+    """
+    Returns the symbol and decimals of an ERC20 token. These never change, so they are read from
+    the contract once and kept in the TokenContract table and in memory from then on.
+    """
+    address = web3.toChecksumAddress(token_contract)
+    metadata = token_metadata.get(address)
+    if metadata:
+        return metadata
+
+    token = TokenContract.objects.filter(address=address).first()
+    if not token:
+        token_symbol, token_decimals, abi = fetch_token_metadata(address)
+        token, _ = TokenContract.objects.get_or_create(
+            address=address,
+            defaults={'symbol': token_symbol, 'decimals': token_decimals, 'abi': abi}
+        )
+
+    metadata = token_metadata[address] = (token.symbol, token.decimals)
+    return metadata
+
+
+def fetch_token_metadata(address):
+    try:
+        HumanStandardToken = web3.eth.contract(
+            abi=bounties_json['interfaces']['HumanStandardToken'],
+            address=address,
+            ContractFactoryClass=ConciseContract
+        )
+
+        return HumanStandardToken.symbol(), HumanStandardToken.decimals(), HUMAN_STANDARD_TOKEN
+
+    except OverflowError:
+        DSToken = web3.eth.contract(
+            abi=bounties_json['interfaces']['DSToken'],
+            address=address,
+            ContractFactoryClass=ConciseContract
+        )
+
+        # Symbol in DSToken contract is bytes32 and unused chars are padded
+        # with '\x00'
+        return DSToken.symbol().decode().rstrip('\x00'), DSToken.decimals(), DS_TOKEN
 
 
 def map_token_data(version, token_contract, amount):
@@ -225,29 +469,7 @@ def map_token_data(version, token_contract, amount):
     if version == '0':
         pass
     elif version == '20':
-        HumanStandardToken_abi = bounties_json['interfaces']['HumanStandardToken']
-        DSToken_abi = bounties_json['interfaces']['DSToken']
-        try:
-            HumanStandardToken = web3.eth.contract(
-                abi=HumanStandardToken_abi,
-                address=web3.toChecksumAddress(token_contract),
-                ContractFactoryClass=ConciseContract
-            )
-
-            token_symbol = HumanStandardToken.symbol()
-            token_decimals = HumanStandardToken.decimals()
-
-        except OverflowError:
-            DSToken = web3.eth.contract(
-                abi=DSToken_abi,
-                address=web3.toChecksumAddress(token_contract),
-                ContractFactoryClass=ConciseContract
-            )
-
-            # Symbol in DSToken contract is bytes32 and unused chars are padded
-            # with '\x00'
-            token_symbol = DSToken.symbol().decode().rstrip('\x00')
-            token_decimals = DSToken.decimals()
+        token_symbol, token_decimals = get_token_metadata(token_contract)
     elif version == '721':
         # todo
         pass
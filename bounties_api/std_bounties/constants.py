@@ -32,6 +32,14 @@ TOKEN_CHOICES = (
     (ERC_721, 'ERC-721'),
 )
 
+HUMAN_STANDARD_TOKEN = 'HumanStandardToken'
+DS_TOKEN = 'DSToken'
+
+TOKEN_ABI_CHOICES = (
+    (HUMAN_STANDARD_TOKEN, 'HumanStandardToken'),
+    (DS_TOKEN, 'DSToken'),
+)
+
 STANDARD_BOUNTIES_V1 = 1
 STANDARD_BOUNTIES_V2 = 2
 CONTRACT_VERSION_CHOICES = (
@@ -39,4 +47,14 @@ CONTRACT_VERSION_CHOICES = (
     (STANDARD_BOUNTIES_V2, 'v2'),
 )
 
+ISSUER_LEADERBOARD = 'issuer'
+FULFILLER_LEADERBOARD = 'fulfiller'
+LEADERBOARD_CHOICES = (
+    (ISSUER_LEADERBOARD, 'Issuer'),
+    (FULFILLER_LEADERBOARD, 'Fulfiller'),
+)
+
+# leaderboard rows over every platform, platform names are never empty in them
+ALL_PLATFORMS = '*'
+
 rev_mapped_difficulties = dict((y, x) for x, y in DIFFICULTY_CHOICES)
@@ -0,0 +1,128 @@
+import os
+import socket
+
+from bounties.redis_client import redis_client
+
+# Seconds a claim is held without being completed, after which a redelivered event can be claimed again
+CLAIM_TTL = 300
+# Processed events are kept in one hash per range of blocks, listed in a sorted set by range. A shard
+# is dropped once the newest completed event is DEDUP_RETAIN_BLOCKS past its range, about 30 days of
+# blocks, however long that took. A resync from further back than that enqueues the events of the
+# dropped shards again and the subscriber handles them again.
+DEDUP_SHARD_BLOCKS = 10000
+DEDUP_RETAIN_BLOCKS = 200000
+DEDUP_SHARD_INDEX = 'dedup:shards'
+# Events queued before the subscriber sent block numbers only have a per event key
+LEGACY_DEDUP_TTL = 60 * 60 * 24 * 30
+
+PROCESSED = 'processed'
+BLACKLISTED = 'blacklisted'
+PENDING_BLACKLIST = 'pending_blacklist'
+CLAIMED = 'claimed'
+CLAIMED_ELSEWHERE = 'claimed_elsewhere'
+
+# Checks the dedup shard, the legacy dedup key, another consumer's claim and both blacklists,
+# then claims the event, in a single atomic round trip. An event claimed elsewhere is left to
+# that consumer even if its bounty was blacklisted since, so it isn't queued for a retry as well.
+CLAIM_SCRIPT = redis_client.register_script("""
+if redis.call('HEXISTS', KEYS[1], ARGV[3]) == 1 or redis.call('GET', KEYS[2]) == 'True' then
+    return 'processed'
+end
+if redis.call('EXISTS', KEYS[5]) == 1 then
+    return 'claimed_elsewhere'
+end
+if redis.call('GET', KEYS[3]) then
+    return 'blacklisted'
+end
+if redis.call('EXISTS', KEYS[4]) == 1 then
+    return 'pending_blacklist'
+end
+if redis.call('SET', KEYS[5], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    return 'claimed'
+end
+return 'claimed_elsewhere'
+""")
+
+
+# Drops the shards of the ranges below ARGV[1] and their entries in the index
+PRUNE_SCRIPT = redis_client.register_script("""
+local shards = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[1])
+for _, shard in ipairs(shards) do
+    redis.call('DEL', 'dedup:' .. shard)
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[1])
+return #shards
+""")
+
+
+def consumer_id():
+    return '{}:{}'.format(socket.gethostname(), os.getpid())
+
+
+def dedup_shard_key(block_number):
+    return 'dedup:{}'.format(block_number // DEDUP_SHARD_BLOCKS)
+
+
+def claim_key(message):
+    return 'claim:{}'.format(message.message_deduplication_id)
+
+
+def claim_keys(message):
+    return [
+        dedup_shard_key(message.block_number),
+        message.message_deduplication_id,
+        'blacklist:{}'.format(message.bounty_id),
+        'pending_blacklist:{}'.format(message.bounty_id),
+        claim_key(message),
+    ]
+
+
+def claim_args(message):
+    return [consumer_id(), CLAIM_TTL, message.message_deduplication_id]
+
+
+def claim_event(message):
+    status = CLAIM_SCRIPT(keys=claim_keys(message), args=claim_args(message))
+    return status.decode('UTF-8')
+
+
+def claim_events(messages):
+    """Claim a whole batch in one round trip, returning a status per message in order"""
+
+    pipe = redis_client.pipeline(transaction=False)
+    for message in messages:
+        CLAIM_SCRIPT(keys=claim_keys(message), args=claim_args(message), client=pipe)
+    return [status.decode('UTF-8') for status in pipe.execute()]
+
+
+def complete_events(messages):
+    # This means the contract subscriber will never send these events
+    # through to sqs again
+    pipe = redis_client.pipeline(transaction=False)
+    block_numbers = []
+    for message in messages:
+        if message.block_number >= 0:
+            pipe.hset(dedup_shard_key(message.block_number), message.message_deduplication_id, 1)
+            block_numbers.append(message.block_number)
+        else:
+            pipe.set(message.message_deduplication_id, 'True', ex=LEGACY_DEDUP_TTL)
+        pipe.delete(claim_key(message))
+    index_shards(pipe, block_numbers)
+    pipe.execute()
+
+
+def index_shards(pipe, block_numbers):
+    """Adds the shards of the blocks to the index, and drops the ones the newest block left behind"""
+
+    if not block_numbers:
+        return
+
+    for shard in {block_number // DEDUP_SHARD_BLOCKS for block_number in block_numbers}:
+        # shards written before they were dropped by height still have a TTL
+        pipe.persist(dedup_shard_key(shard * DEDUP_SHARD_BLOCKS))
+        pipe.zadd(DEDUP_SHARD_INDEX, **{str(shard): shard})
+    PRUNE_SCRIPT(
+        keys=[DEDUP_SHARD_INDEX],
+        args=[(max(block_numbers) - DEDUP_RETAIN_BLOCKS) // DEDUP_SHARD_BLOCKS],
+        client=pipe
+    )
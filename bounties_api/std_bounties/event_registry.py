@@ -0,0 +1,173 @@
+import logging
+import re
+
+from std_bounties import master_client
+from std_bounties.constants import STANDARD_BOUNTIES_V1, STANDARD_BOUNTIES_V2
+from std_bounties.models import Bounty
+
+logger = logging.getLogger('django')
+
+FIRST_CAP = re.compile('(.)([A-Z][a-z]+)')
+ALL_CAP = re.compile('([a-z0-9])([A-Z])')
+
+
+def v1_bounty_issued(message):
+    inputs = message.contract_method_inputs
+    return {
+        'creator': inputs.get('issuer'),
+        'issuers': [inputs.get('issuer')],
+        'approvers': [inputs.get('issuer')],
+        'data': inputs.get('data'),
+        'deadline': inputs.get('deadline'),
+        'fulfillment_amount': inputs.get('fulfillmentAmount'),
+        'value': inputs.get('value'),
+        'token': inputs.get('tokenContract'),
+        'token_version': '20' if inputs.get('paysTokens') else '0',
+    }
+
+
+def v1_fulfillment_accepted(message):
+    bounty = Bounty.objects.get(
+        bounty_id=message.bounty_id,
+        contract_version=STANDARD_BOUNTIES_V1,
+    )
+
+    return {
+        'fulfillment_id': message.contract_event_data.get('fulfillment_id'),
+        'token_amounts': [bounty.fulfillment_amount],
+        'approver': message.transaction_from,
+    }
+
+
+def v2_event_data(message):
+    return {k: v for (k, v) in message.contract_event_data.items() if 'bounty_id' not in k}
+
+
+# V1 event name to the master_client handlers it runs, each with the adapter that maps the
+# message onto the handler's keywords
+V1_EVENTS = {
+    'BountyIssued': [('bounty_issued', v1_bounty_issued)],
+    'BountyActivated': [
+        ('bounty_activated', lambda message: {
+            'issuer': message.contract_method_inputs.get('issuer', None),
+        }),
+    ],
+    'BountyFulfilled': [
+        ('bounty_fulfilled', lambda message: {
+            'fulfillment_id': message.contract_event_data.get('fulfillment_id'),
+            'fulfillers': [message.contract_event_data.get('fulfiller')],
+            'submitter': message.contract_event_data.get('fulfiller'),
+            'data': message.contract_method_inputs.get('data'),
+        }),
+    ],
+    # untested
+    'FulfillmentUpdated': [
+        ('fullfillment_updated', lambda message: {
+            'fulfillment_id': message.contract_event_data.get('fulfillment_id'),
+            'fulfillers': [message.transaction_from],
+            'data': message.contract_method_inputs.get('data'),
+        }),
+    ],
+    'FulfillmentAccepted': [('fulfillment_accepted', v1_fulfillment_accepted)],
+    # untested
+    'BountyKilled': [('bounty_killed', lambda message: {})],
+    'ContributionAdded': [
+        ('contribution_added', lambda message: {
+            'contribution_id': 0,
+            'contributor': message.contract_event_data.get('contributor'),
+            'amount': message.contract_event_data.get('value'),
+        }),
+    ],
+    # untested
+    'DeadlineExtended': [
+        ('bounty_deadline_changed', lambda message: {
+            'changer': message.transaction_from,
+            'deadline': message.contract_event_data.get('new_deadline'),
+        }),
+    ],
+    # this event only occurs when a draft bounty is edited
+    'BountyChanged': [],
+    # untested
+    'IssuerTransferred': [
+        ('bounty_issuers_updated', lambda message: {
+            'changer': message.transaction_from,
+            'issuers': [message.contract_event_data.get('new_issuer')],
+        }),
+        ('bounty_approvers_updated', lambda message: {
+            'changer': message.transaction_from,
+            'approvers': [message.contract_event_data.get('new_issuer')],
+        }),
+    ],
+    # untested
+    'PayoutIncreased': [
+        ('payout_increased', lambda message: {
+            'fulfillment_amount': message.contract_event_data.get('new_fulfillment_amount'),
+        }),
+        ('contribution_added', lambda message: {
+            'contribution_id': 0,
+            'contributor': message.transaction_from,
+            'amount': message.contract_method_inputs.get('value'),
+        }),
+    ],
+}
+
+# (contract_version, event name) to a list of (handler, adapter), or None for unknown events
+registry = {}
+
+
+def register(contract_version, event, handler_name, adapter):
+    registry.setdefault((contract_version, event), []).append((master_client.client[handler_name], adapter))
+
+
+def snake_case(event):
+    event = FIRST_CAP.sub(r'\1_\2', event)
+    return ALL_CAP.sub(r'\1_\2', event).lower()
+
+
+def lookup(contract_version, event):
+    key = (contract_version, event)
+    if key not in registry and contract_version == STANDARD_BOUNTIES_V2:
+        # V2 events share the names of the master_client handlers, so any new one is picked up
+        # here once and cached
+        handler_name = snake_case(event)
+        if handler_name in master_client.client:
+            register(contract_version, event, handler_name, v2_event_data)
+        else:
+            registry[key] = None
+
+    return registry.get(key)
+
+
+def resolve(message):
+    """Returns the (handler, keywords) calls that handle a message"""
+
+    handlers = lookup(message.contract_version, message.event)
+    if handlers is None:
+        if message.contract_version == STANDARD_BOUNTIES_V2:
+            raise KeyError(snake_case(message.event))
+        logger.warning('Event for bounty id {} not recognized: {}'.format(message.bounty_id, message.event))
+        return []
+
+    base_event_data = {
+        'bounty_id': message.bounty_id,
+        'contract_version': message.contract_version,
+        'event_date': message.event_date,
+        'event_timestamp': message.event_timestamp,
+        'uid': message.message_deduplication_id,
+    }
+
+    return [(handler, {**adapter(message), **base_event_data}) for handler, adapter in handlers]
+
+
+def dispatch(message):
+    for handler, keywords in resolve(message):
+        handler(**keywords)
+
+
+for event, handlers in V1_EVENTS.items():
+    registry[(STANDARD_BOUNTIES_V1, event)] = []
+    for handler_name, adapter in handlers:
+        register(STANDARD_BOUNTIES_V1, event, handler_name, adapter)
+
+for handler_name in master_client.client:
+    register(STANDARD_BOUNTIES_V2, ''.join(part.title() for part in handler_name.split('_')), handler_name, v2_event_data)
@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from redis.exceptions import RedisError
+
+from bounties.redis_client import redis_client
+
+logger = logging.getLogger('django')
+
+# IPFS content is addressed by its hash and never changes, so it is kept without expiry
+CONTENT_TTL = None
+# Hashes that failed to fetch are not retried for this many seconds
+MISSING_TTL = 60 * 10
+LOCAL_CACHE_SIZE = 2048
+PREFETCH_WORKERS = 8
+
+
+class MissingContentError(Exception):
+    pass
+
+
+class IPFSCache:
+    """
+    Two tier cache of IPFS content: an in-process LRU in front of redis, so a resync only
+    fetches content it has never seen. Failed fetches are remembered for MISSING_TTL so
+    retries don't hammer the gateway.
+    """
+
+    def __init__(self, max_size=LOCAL_CACHE_SIZE):
+        self.max_size = max_size
+        self.local = OrderedDict()
+        self.missing = {}
+        self.lock = threading.Lock()
+        self.stats = Counter()
+
+    def cat(self, ipfs_hash, fetch):
+        content = self.get_local(ipfs_hash)
+        if content is not None:
+            self.count('local_hits')
+            return content
+
+        if self.missing.get(ipfs_hash, 0) > time.time():
+            self.count('missing_hits')
+            raise MissingContentError('IPFS hash {} recently failed to fetch'.format(ipfs_hash))
+
+        try:
+            content, missing = redis_client.pipeline(transaction=False) \
+                .get(self.content_key(ipfs_hash)) \
+                .exists(self.missing_key(ipfs_hash)) \
+                .execute()
+        except RedisError as e:
+            self.count('redis_errors')
+            logger.warning('IPFS cache lookup for {} failed: {}'.format(ipfs_hash, e))
+            content, missing = None, False
+
+        if content is not None:
+            self.count('redis_hits')
+            self.set_local(ipfs_hash, content)
+            return content
+
+        if missing:
+            self.count('missing_hits')
+            raise MissingContentError('IPFS hash {} recently failed to fetch'.format(ipfs_hash))
+
+        self.count('misses')
+        return self.fetch(ipfs_hash, fetch)
+
+    def fetch(self, ipfs_hash, fetch, remember_missing=True):
+        try:
+            content = fetch(ipfs_hash)
+        except Exception:
+            self.count('fetch_errors')
+            if remember_missing:
+                self.set_missing(ipfs_hash)
+            raise
+
+        self.set_local(ipfs_hash, content)
+        try:
+            redis_client.set(self.content_key(ipfs_hash), content, ex=CONTENT_TTL)
+        except RedisError as e:
+            self.count('redis_errors')
+            logger.warning('IPFS cache store for {} failed: {}'.format(ipfs_hash, e))
+
+        return content
+
+    def prefetch(self, ipfs_hashes, fetch, max_workers=PREFETCH_WORKERS):
+        """
+        Warm both tiers for hashes that are about to be needed, fetching the uncached ones
+        concurrently. Failures are only logged, the handler gets its own attempt later.
+        """
+        now = time.time()
+        wanted = [
+            ipfs_hash for ipfs_hash in dict.fromkeys(ipfs_hashes)
+            if self.get_local(ipfs_hash) is None and self.missing.get(ipfs_hash, 0) <= now
+        ]
+        if not wanted:
+            return
+
+        try:
+            cached = redis_client.mget([self.content_key(ipfs_hash) for ipfs_hash in wanted])
+        except RedisError as e:
+            self.count('redis_errors')
+            logger.warning('IPFS cache prefetch lookup failed: {}'.format(e))
+            cached = [None] * len(wanted)
+
+        uncached = []
+        for ipfs_hash, content in zip(wanted, cached):
+            if content is None:
+                uncached.append(ipfs_hash)
+            else:
+                self.set_local(ipfs_hash, content)
+
+        if not uncached:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(uncached))) as executor:
+            futures = {
+                ipfs_hash: executor.submit(self.fetch, ipfs_hash, fetch, remember_missing=False)
+                for ipfs_hash in uncached
+            }
+
+        for ipfs_hash, future in futures.items():
+            if future.exception():
+                logger.warning('IPFS prefetch of {} failed: {}'.format(ipfs_hash, future.exception()))
+            else:
+                self.count('prefetched')
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def get_local(self, ipfs_hash):
+        with self.lock:
+            content = self.local.get(ipfs_hash)
+            if content is not None:
+                self.local.move_to_end(ipfs_hash)
+            return content
+
+    def set_local(self, ipfs_hash, content):
+        with self.lock:
+            self.local[ipfs_hash] = content
+            self.local.move_to_end(ipfs_hash)
+            while len(self.local) > self.max_size:
+                self.local.popitem(last=False)
+            self.missing.pop(ipfs_hash, None)
+
+    def set_missing(self, ipfs_hash):
+        self.missing[ipfs_hash] = time.time() + MISSING_TTL
+        try:
+            redis_client.set(self.missing_key(ipfs_hash), 1, ex=MISSING_TTL)
+        except RedisError as e:
+            self.count('redis_errors')
+            logger.warning('IPFS cache store for {} failed: {}'.format(ipfs_hash, e))
+
+    def content_key(self, ipfs_hash):
+        return 'ipfs:{}'.format(ipfs_hash)
+
+    def missing_key(self, ipfs_hash):
+        return 'ipfs_missing:{}'.format(ipfs_hash)
+
+    def log_stats(self):
+        logger.info('IPFS cache: {}'.format(', '.join(
+            '{} {}'.format(name, count) for name, count in sorted(self.stats.items()))))
+
+
+ipfs_cache = IPFSCache()
@@ -0,0 +1,169 @@
+import base64
+import itertools
+import json
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from std_bounties.constants import ALL_PLATFORMS, FULFILLER_LEADERBOARD, ISSUER_LEADERBOARD
+from std_bounties.models import Fulfillment, LeaderboardEntry
+from std_bounties.queries import LEADERBOARD_FULFILLER_ENTRIES, LEADERBOARD_FULFILLER_QUERY, LEADERBOARD_ISSUER_ENTRIES, \
+    LEADERBOARD_ISSUER_QUERY, LEADERBOARD_LIVE_COUNT, LEADERBOARD_LIVE_PAGE, LEADERBOARD_LOCK_ADDRESSES, LEADERBOARD_PAGE, \
+    LEADERBOARD_REFRESH
+from bounties.utils import dictiter
+
+LEADERBOARDS = {
+    FULFILLER_LEADERBOARD: (
+        LEADERBOARD_FULFILLER_ENTRIES, 'fulfillment.fulfiller', LEADERBOARD_FULFILLER_QUERY,
+        ('bounties_fulfilled', 'fulfillments_accepted')
+    ),
+    ISSUER_LEADERBOARD: (
+        LEADERBOARD_ISSUER_ENTRIES, 'bounty.issuer', LEADERBOARD_ISSUER_QUERY,
+        ('bounties_issued', 'fulfillments_paid')
+    ),
+}
+
+
+def refresh_leaderboard(kind, addresses=None):
+    """
+    Recompute the leaderboard rows of the given addresses on every platform, or of the whole
+    leaderboard when no addresses are given. Returns the number of rows deleted.
+
+    Holds a lock on each address until the surrounding transaction ends, and a whole leaderboard
+    refresh waits for the address refreshes in progress, so concurrent events can't overwrite
+    each other's totals.
+
+    @param kind ISSUER_LEADERBOARD or FULFILLER_LEADERBOARD
+    @keyword addresses the issuers or fulfillers whose accepted fulfillments changed
+    """
+    entries, address_column, _, _ = LEADERBOARDS[kind]
+    params = {'kind': kind, 'all_platforms': ALL_PLATFORMS}
+    entries_condition = condition = ''
+    if addresses is not None:
+        params['addresses'] = sorted(set(addresses))
+        entries_condition = 'AND {} = ANY(%(addresses)s)'.format(address_column)
+        condition = 'AND entry.address = ANY(%(addresses)s)'
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        if addresses is None:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [kind])
+        else:
+            cursor.execute('SELECT pg_advisory_xact_lock_shared(hashtext(%s))', [kind])
+            cursor.execute(LEADERBOARD_LOCK_ADDRESSES, params)
+
+        cursor.execute(
+            LEADERBOARD_REFRESH.format(entries=entries.format(entries_condition), condition=condition),
+            params
+        )
+        return cursor.rowcount
+
+
+def refresh_leaderboards(issuers=None, fulfillers=None):
+    refresh_leaderboard(ISSUER_LEADERBOARD, issuers)
+    refresh_leaderboard(FULFILLER_LEADERBOARD, fulfillers)
+
+
+def refresh_bounty_leaderboards(bounty, previous_issuer=None):
+    """
+    Recompute the rows a bounty's accepted fulfillments count towards, after its amount, issuer
+    or platform, or one of its fulfillments, changed
+
+    @keyword previous_issuer the issuer before the change, whose rows lose the bounty
+    """
+    fulfillers = set(Fulfillment.objects.filter(bounty=bounty, accepted=True).values_list('fulfiller', flat=True))
+    if not fulfillers:
+        return
+
+    issuers = {bounty.issuer, previous_issuer} - {None}
+    refresh_leaderboards(issuers=list(issuers), fulfillers=list(fulfillers))
+
+
+def keyset_condition(after, prefix=''):
+    """
+    The condition selecting the rows ranked after the given one, in total_usd desc (nulls first),
+    total desc, address order. Returns the SQL and its parameters.
+
+    @param after the (total_usd, total, address) of the last row of the previous page, or None
+    @keyword prefix the table alias of the ranked columns
+    """
+    if after is None:
+        return 'TRUE', []
+
+    total_usd, total, address = after
+    tie = '({p}total < %s OR ({p}total = %s AND {p}address > %s))'.format(p=prefix)
+    if total_usd is None:
+        return '({}total_usd IS NOT NULL OR {})'.format(prefix, tie), [total, total, address]
+    # the first comparison on its own lets the rank index start its scan at the previous page
+    return '{p}total_usd <= %s AND ({p}total_usd < %s OR {tie})'.format(p=prefix, tie=tie), \
+        [total_usd, total_usd, total, total, address]
+
+
+def encode_cursor(row):
+    return base64.urlsafe_b64encode(
+        json.dumps([row['total_usd'], str(row['total']), row['address']]).encode()
+    ).decode()
+
+
+def decode_cursor(cursor):
+    """
+    The (total_usd, total, address) a cursor from encode_cursor points after
+
+    @raises ValueError if the cursor wasn't made by encode_cursor
+    """
+    try:
+        total_usd, total, address = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        return (None if total_usd is None else float(total_usd)), Decimal(total), str(address)
+    except (TypeError, ValueError, ArithmeticError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def leaderboard_rows(kind, platforms, offset=0, limit=None, after=None):
+    """
+    Yields the size of a leaderboard, then the rows of a page of it in rank order, streamed from
+    a server side cursor. A single platform, or all of them, is read from the precomputed
+    leaderboard, and several platforms from the live query.
+
+    @param platforms the platforms to rank on, all of them when empty
+    @keyword limit None for every row from the offset on
+    @keyword after the (total_usd, total, address) to start after, see keyset_condition
+    """
+    _, _, live_query, (bounties, fulfillments) = LEADERBOARDS[kind]
+
+    if len(platforms) <= 1:
+        platform = platforms[0] if platforms else ALL_PLATFORMS
+        yield LeaderboardEntry.objects.filter(kind=kind, platform=platform).count()
+
+        keyset, keyset_params = keyset_condition(after, 'entry.')
+        yield from stream_rows(
+            LEADERBOARD_PAGE.format(bounties=bounties, fulfillments=fulfillments, keyset=keyset),
+            [kind, platform] + keyset_params + [limit, offset]
+        )
+        return
+
+    # fulfillments and their bounties can be on different platforms, so per platform rows can't
+    # be added up without counting some twice
+    query = live_query.format('AND (fulfillment.platform = ANY(%s) OR bounty.platform = ANY(%s))')
+    platform_params = [platforms, platforms]
+    keyset, keyset_params = keyset_condition(after)
+    rows = stream_rows(
+        LEADERBOARD_LIVE_PAGE.format(query=query, keyset=keyset),
+        platform_params + keyset_params + [limit, offset]
+    )
+
+    first = next(rows, None)
+    if first is None:
+        with connection.cursor() as cursor:
+            cursor.execute(LEADERBOARD_LIVE_COUNT.format(query=query), platform_params)
+            yield cursor.fetchone()[0]
+        return
+
+    yield first['full_count']
+    for row in itertools.chain([first], rows):
+        del row['full_count']
+        yield row
+
+
+def stream_rows(query, params):
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(query, params)
+        yield from dictiter(cursor)
@@ -0,0 +1,60 @@
+import re
+import timeit
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from std_bounties import event_registry
+from std_bounties.constants import STANDARD_BOUNTIES_V1, STANDARD_BOUNTIES_V2
+from std_bounties.message import Message
+
+V1_EVENTS = ['BountyIssued', 'BountyActivated', 'BountyFulfilled', 'ContributionAdded', 'IssuerTransferred', 'PayoutIncreased']
+V2_EVENTS = ['BountyIssued', 'ContributionAdded', 'BountyFulfilled', 'FulfillmentAccepted', 'BountyApproversUpdated', 'BountyDataChanged']
+
+
+def per_message_lookup(message):
+    """How the subscriber used to resolve a V2 handler, compiling both patterns for every message"""
+
+    s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', message.event)
+    event = re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
+    event_data = {k: v for (k, v) in message.contract_event_data.items() if 'bounty_id' not in k}
+    return event, event_data
+
+
+class Command(BaseCommand):
+    help = 'Time how long resolving an event to its handlers takes, without running the handlers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--number',
+            type=int,
+            dest='number',
+            help='Number of times to resolve each synthetic message',
+            default=10000
+        )
+
+    def handle(self, *args, **options):
+        number = options['number']
+        v1_messages = [self.message(event, STANDARD_BOUNTIES_V1) for event in V1_EVENTS]
+        v2_messages = [self.message(event, STANDARD_BOUNTIES_V2) for event in V2_EVENTS]
+
+        self.report('V1 registry', v1_messages, event_registry.resolve, number)
+        self.report('V2 registry', v2_messages, event_registry.resolve, number)
+        self.report('V2 per message re.sub', v2_messages, per_message_lookup, number)
+
+    def report(self, name, messages, resolve, number):
+        elapsed = timeit.timeit(lambda: [resolve(message) for message in messages], number=number)
+        self.stdout.write('{}: {:.2f} us per message'.format(name, elapsed / (number * len(messages)) * 1e6))
+
+    def message(self, event, contract_version):
+        return Message(
+            event=event,
+            bounty_id=1,
+            contract_version=contract_version,
+            event_date=datetime(2019, 1, 1),
+            event_timestamp='1546300800',
+            message_deduplication_id='0x0' + event,
+            transaction_from='0x0',
+            contract_method_inputs={'issuer': '0x0', 'data': '', 'value': '1'},
+            contract_event_data={'_bounty_id': '1', 'changer': '0x0', 'fulfiller': '0x0', 'value': '1'},
+        )
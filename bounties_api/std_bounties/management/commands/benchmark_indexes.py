@@ -0,0 +1,171 @@
+import random
+import re
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from notifications.models import DashboardNotification, Notification, Transaction
+from std_bounties.constants import STAGE_CHOICES
+from std_bounties.models import Bounty, Fulfillment
+from std_bounties.queries import LEADERBOARD_FULFILLER_QUERY
+from user.models import User
+
+# Indexes added for the API's filters, compared against the plans without them
+BENCHMARKED_INDEXES = [
+    'bounty_platform_stage_created',
+    'bounty_issuer',
+    'fulfillment_fulfiller',
+    'fulfillment_accepted_bounty',
+    'fulfillment_accepted_fulfiller',
+    'fulfillment_accepted_date',
+    'notification_user_created',
+    'dashboard_notif_activity',
+    'transaction_user_viewed',
+]
+
+PLATFORMS = ['bounties-network', 'gitcoin', 'colorado', 'consensys', 'ethdenver']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN ANALYZE the hottest API queries on generated data, with and without their indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bounties',
+            type=int,
+            dest='bounties',
+            help='Number of bounties to generate, with two fulfillments each',
+            default=20000
+        )
+
+    def handle(self, *args, **options):
+        if not settings.LOCAL:
+            raise CommandError('The index benchmark only runs against a local database')
+
+        # Everything, including the generated data and dropped indexes, is rolled back at the end
+        try:
+            with transaction.atomic():
+                self.run(options['bounties'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def run(self, bounty_count):
+        users = self.generate(bounty_count)
+        queries = self.queries(users)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT indexname, indexdef FROM pg_indexes WHERE indexname = ANY(%s)', [BENCHMARKED_INDEXES])
+            definitions = dict(cursor.fetchall())
+            for name in BENCHMARKED_INDEXES:
+                if name not in definitions:
+                    self.stdout.write('Index {} does not exist, run the migrations first'.format(name))
+
+            for name in definitions:
+                cursor.execute('DROP INDEX {}'.format(name))
+            cursor.execute('ANALYZE')
+            without = {name: self.explain(cursor, sql, params) for name, (sql, params) in queries.items()}
+
+            for definition in definitions.values():
+                cursor.execute(definition)
+            cursor.execute('ANALYZE')
+            with_indexes = {name: self.explain(cursor, sql, params) for name, (sql, params) in queries.items()}
+
+        for name in queries:
+            self.stdout.write('{}\n  without: {}\n  with:    {}'.format(name, without[name], with_indexes[name]))
+
+    def explain(self, cursor, sql, params):
+        cursor.execute('EXPLAIN ANALYZE ' + sql, params)
+        plan = [row[0] for row in cursor.fetchall()]
+        execution_time = next((line for line in plan if line.startswith('Execution')), '')
+        scans = sorted({match for line in plan for match in re.findall(r'(\w+ Scan(?: (?:using|on) \w+)?)', line)})
+        return '{} [{}]'.format(execution_time, ', '.join(scans))
+
+    def queries(self, users):
+        user = users[0]
+        bounties = Bounty.objects.filter(platform='gitcoin', bounty_stage=1).order_by('-bounty_created')[:25]
+        by_issuer = Bounty.objects.filter(issuer=user.public_address)
+        by_fulfiller = Fulfillment.objects.filter(fulfiller=user.public_address)
+        accepted = Fulfillment.objects.filter(accepted=True, accepted_date__lte=datetime(2018, 6, 1))
+        activity = DashboardNotification.objects.filter(
+            notification__user__public_address=user.public_address,
+            is_activity=True
+        ).order_by('-notification__notification_created')[:25]
+        transactions = Transaction.objects.filter(
+            viewed=False,
+            user__public_address=user.public_address
+        ).order_by('viewed', '-created')
+
+        return {
+            'bounties by platform and stage': bounties.query.sql_with_params(),
+            'bounties by issuer': by_issuer.query.sql_with_params(),
+            'fulfillments by fulfiller': by_fulfiller.query.sql_with_params(),
+            'accepted fulfillments to date': accepted.values('id').query.sql_with_params(),
+            'fulfiller leaderboard': (LEADERBOARD_FULFILLER_QUERY.format(''), []),
+            'activity notifications': activity.query.sql_with_params(),
+            'unviewed transactions': transactions.query.sql_with_params(),
+        }
+
+    def generate(self, bounty_count):
+        self.stdout.write('Generating {} bounties'.format(bounty_count))
+        start = datetime(2018, 1, 1)
+        users = User.objects.bulk_create([
+            User(public_address='0xbenchmark{:030d}'.format(index)) for index in range(max(bounty_count // 10, 1))
+        ])
+
+        bounties = Bounty.objects.bulk_create([
+            Bounty(
+                bounty_id=index,
+                issuer=random.choice(users).public_address,
+                platform=random.choice(PLATFORMS),
+                bounty_stage=random.choice(STAGE_CHOICES)[0],
+                bounty_created=start + timedelta(minutes=index * 15),
+                deadline=start + timedelta(minutes=index * 15, days=30),
+                fulfillment_amount=random.randint(1, 10 ** 6),
+            )
+            for index in range(bounty_count)
+        ], batch_size=2000)
+
+        Fulfillment.objects.bulk_create([
+            Fulfillment(
+                fulfillment_id=index,
+                bounty=bounty,
+                fulfiller=random.choice(users).public_address,
+                accepted=index == 0 and bounty.bounty_stage == 3,
+                accepted_date=bounty.bounty_created + timedelta(days=7) if index == 0 else None,
+                usd_price=random.random() * 1000,
+            )
+            for bounty in bounties for index in range(2)
+        ], batch_size=2000)
+
+        # the first user is a heavy one, like an active issuer, with half of the notifications and transactions
+        notifications = Notification.objects.bulk_create([
+            Notification(
+                user=users[0] if index % 2 else random.choice(users),
+                uid='benchmark{}'.format(index),
+                notification_name=random.choice([1, 2, 3]),
+                notification_created=start + timedelta(minutes=index * 5),
+            )
+            for index in range(bounty_count * 2)
+        ], batch_size=2000)
+        DashboardNotification.objects.bulk_create([
+            DashboardNotification(notification=notification, is_activity=index % 2 == 0)
+            for index, notification in enumerate(notifications)
+        ], batch_size=2000)
+
+        Transaction.objects.bulk_create([
+            Transaction(user=users[0] if index % 2 else random.choice(users), tx_hash='0xbenchmark{}'.format(index), viewed=index % 5 != 0)
+            for index in range(bounty_count)
+        ], batch_size=2000)
+
+        # Check the deferred foreign keys now, indexes can't be created while their triggers are pending
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+        return users
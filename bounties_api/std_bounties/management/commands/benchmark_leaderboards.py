@@ -0,0 +1,89 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+
+from bounties.utils import dictfetchall
+from std_bounties.constants import FULFILLER_LEADERBOARD, ISSUER_LEADERBOARD
+from std_bounties.leaderboards import refresh_leaderboard
+from std_bounties.management.commands.benchmark_indexes import Command as IndexBenchmark, Rollback
+from std_bounties.queries import LEADERBOARD_FULFILLER_QUERY, LEADERBOARD_ISSUER_QUERY
+from std_bounties.views import LeaderboardFulfiller, LeaderboardIssuer
+
+LEADERBOARDS = [
+    (ISSUER_LEADERBOARD, LeaderboardIssuer, LEADERBOARD_ISSUER_QUERY),
+    (FULFILLER_LEADERBOARD, LeaderboardFulfiller, LEADERBOARD_FULFILLER_QUERY),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare leaderboard page latency from the live aggregation and the precomputed leaderboards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            dest='sizes',
+            help='Comma separated numbers of bounties to generate, each benchmarked on its own',
+            default='2000,20000,100000'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            dest='requests',
+            help='Number of page requests to time for each leaderboard',
+            default=200
+        )
+
+    def handle(self, *args, **options):
+        if not settings.LOCAL:
+            raise CommandError('The leaderboard benchmark only runs against a local database')
+
+        for size in [int(size) for size in options['sizes'].split(',')]:
+            try:
+                with transaction.atomic():
+                    self.run(size, options['requests'])
+                    raise Rollback()
+            except Rollback:
+                pass
+
+    def run(self, bounty_count, requests):
+        IndexBenchmark(stdout=self.stdout).generate(bounty_count)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        factory = RequestFactory()
+
+        for kind, view, query in LEADERBOARDS:
+            started = time.time()
+            refresh_leaderboard(kind)
+            refresh_time = (time.time() - started) * 1000
+
+            # what the views did before, the whole aggregation sliced in python
+            def live(offset):
+                with connection.cursor() as cursor:
+                    cursor.execute(query.format(''))
+                    return dictfetchall(cursor)[offset:offset + 25]
+
+            # several platforms are still aggregated live, but paged in sql
+            def live_paged(offset):
+                return view.as_view()(factory.get('/', {'platform__in': 'gitcoin,consensys', 'limit': 25, 'offset': offset}))
+
+            def precomputed(offset):
+                return view.as_view()(factory.get('/', {'platform': 'gitcoin', 'limit': 25, 'offset': offset}))
+
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE std_bounties_leaderboardentry')
+            pages = max(bounty_count // 250, 1)
+
+            self.stdout.write('{} bounties, {} leaderboard, refreshed in {:.0f}ms'.format(bounty_count, kind, refresh_time))
+            for name, page in (('live', live), ('live paged', live_paged), ('precomputed', precomputed)):
+                timings = sorted(self.time(page, random.randrange(pages) * 25) for _ in range(requests))
+                self.stdout.write('  {:<12} p50 {:8.2f}ms  p99 {:8.2f}ms'.format(
+                    name, timings[len(timings) // 2], timings[int(len(timings) * 0.99) - 1]))
+
+    def time(self, page, offset):
+        started = time.time()
+        page(offset)
+        return (time.time() - started) * 1000
@@ -0,0 +1,109 @@
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bounties.sqs_client import sqs_client
+from std_bounties.management.commands.bounties_subscriber import SQS_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Compare single and batch SQS consumption throughput against the local elasticmq queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            type=int,
+            dest='messages',
+            help='Number of synthetic events to enqueue for each mode',
+            default=500
+        )
+
+    def handle(self, *args, **options):
+        if not settings.LOCAL:
+            raise CommandError('The subscriber benchmark only runs against the local elasticmq queue')
+
+        total = options['messages']
+        queue_url = sqs_client.create_queue(
+            QueueName='benchmark_{}.fifo'.format(uuid.uuid4().hex[:12]),
+            Attributes={'FifoQueue': 'true'},
+        )['QueueUrl']
+
+        try:
+            results = {}
+            for mode, batch_size in (('single', 1), ('batch', SQS_BATCH_SIZE)):
+                self.fill_queue(queue_url, total)
+                elapsed = self.drain_queue(queue_url, total, batch_size)
+                results[mode] = total / elapsed
+                self.stdout.write('{}: {} events in {:.2f}s ({:.1f} events/s)'.format(
+                    mode, total, elapsed, results[mode]))
+
+            self.stdout.write('batch mode speedup: {:.1f}x'.format(results['batch'] / results['single']))
+            self.stdout.write('Outside LOCAL the single mode also sleeps 1s per receive, capping it at 1 event/s')
+        finally:
+            sqs_client.delete_queue(QueueUrl=queue_url)
+
+    def fill_queue(self, queue_url, total):
+        run = uuid.uuid4().hex
+        for start in range(0, total, SQS_BATCH_SIZE):
+            entries = []
+            for index in range(start, min(start + SQS_BATCH_SIZE, total)):
+                deduplication_id = '{}{}BountyIssued'.format(run, index)
+                entries.append({
+                    'Id': str(index),
+                    'MessageBody': 'Event Subscription',
+                    'MessageGroupId': 'Event_Subscriber',
+                    'MessageDeduplicationId': deduplication_id,
+                    'MessageAttributes': self.message_attributes(index, deduplication_id),
+                })
+            sqs_client.send_message_batch(QueueUrl=queue_url, Entries=entries)
+
+    def drain_queue(self, queue_url, total, batch_size):
+        received = 0
+        start = time.time()
+        while received < total:
+            response = sqs_client.receive_message(
+                QueueUrl=queue_url,
+                AttributeNames=['MessageDeduplicationId'],
+                MessageAttributeNames=['All'],
+                MaxNumberOfMessages=batch_size,
+                WaitTimeSeconds=1,
+            )
+            messages = response.get('Messages', [])
+            if not messages:
+                raise CommandError('Queue ran dry after {} of {} events'.format(received, total))
+
+            if batch_size == 1:
+                sqs_client.delete_message(QueueUrl=queue_url, ReceiptHandle=messages[0]['ReceiptHandle'])
+            else:
+                sqs_client.delete_message_batch(
+                    QueueUrl=queue_url,
+                    Entries=[
+                        {'Id': str(index), 'ReceiptHandle': message['ReceiptHandle']}
+                        for index, message in enumerate(messages)
+                    ],
+                )
+            received += len(messages)
+
+        return time.time() - start
+
+    def message_attributes(self, index, deduplication_id):
+        attributes = {
+            'Event': 'BountyIssued',
+            'BountyId': str(index),
+            'FulfillmentId': '-1',
+            'MessageDeduplicationId': deduplication_id,
+            'TransactionHash': '0x{:064x}'.format(index),
+            'TransactionFrom': '0x{:040x}'.format(index),
+            'ContractMethodInputs': json.dumps({}),
+            'ContractEventData': json.dumps({}),
+            'ContractVersion': 'v2',
+            'TimeStamp': str(int(time.time())),
+        }
+        return {
+            key: {'DataType': 'Number' if key in ('BountyId', 'FulfillmentId', 'TimeStamp') else 'String',
+                  'StringValue': value}
+            for key, value in attributes.items()
+        }
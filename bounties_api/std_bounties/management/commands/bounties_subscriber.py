@@ -1,20 +1,28 @@
 import time
 import logging
+import multiprocessing
 import pprint
-import re
+import queue
+import signal
 
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.db import connections, transaction
 from ipfsapi.exceptions import StatusError
 from botocore.exceptions import ClientError
 
 from bounties.redis_client import redis_client
 from bounties.sqs_client import sqs_client
-from std_bounties import master_client
+from std_bounties import event_registry
+from std_bounties.client_helpers import prefetch_ipfs_data, prefetch_historic_prices
+from std_bounties.event_deduplication import (
+    claim_event, claim_events, complete_events,
+    PROCESSED, BLACKLISTED, PENDING_BLACKLIST, CLAIMED_ELSEWHERE
+)
 from std_bounties.models import Event
 from std_bounties.message import Message
-from std_bounties.constants import STANDARD_BOUNTIES_V1, STANDARD_BOUNTIES_V2
 from notifications.models import Transaction
+from user.resolver import user_identity_map
 
 from std_bounties.bounty_client import BountyClient
 from notifications.notification_client import NotificationClient
@@ -27,6 +35,32 @@ slack_client = SlackMessageClient()
 logger = logging.getLogger('django')
 pp = pprint.PrettyPrinter(indent=4)
 
+# SQS caps a single receive at 10 messages and a long poll at 20 seconds
+SQS_BATCH_SIZE = 10
+SQS_WAIT_TIME_SECONDS = 20
+# Events whose handlers price the bounty's token at the time of the event
+PRICED_EVENTS = ('FulfillmentAccepted', 'BountyKilled', 'BountyDrained')
+# How long the dispatcher waits on worker results before checking the workers are still alive
+WORKER_POLL_SECONDS = 5
+
+
+def partition_worker(tasks, results):
+    # The dispatcher owns shutdown: it finishes the in-flight batch and then sends a None sentinel
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    command = Command()
+    for message in iter(tasks.get, None):
+        try:
+            outcome = command.process_message(message)
+            if outcome != CLAIMED_ELSEWHERE:
+                complete_events([message])
+            results.put((message.receipt_handle, outcome != CLAIMED_ELSEWHERE))
+        except Exception as e:
+            # goes to rollbar, the event stays on the queue and is redelivered
+            logger.error(e)
+            results.put((message.receipt_handle, False))
+
 
 class Command(BaseCommand):
     help = 'Listen to SQS queue for contract events'
@@ -39,12 +73,34 @@ class Command(BaseCommand):
             help='Process blacklisted events',
             default=False
         )
+        parser.add_argument(
+            '--batch',
+            action='store_true',
+            dest='batch',
+            help='Long poll for up to {} events at a time and delete them in one call'.format(SQS_BATCH_SIZE),
+            default=False
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            dest='workers',
+            help='Handle each batch on this many processes, partitioned by bounty id',
+            default=0
+        )
 
     def handle(self, *args, **options):
         if options['blacklist']:
             self.resolve_blacklist()
             return
 
+        if options['workers'] > 0:
+            self.consume_partitioned(options['workers'])
+            return
+
+        if options['batch']:
+            self.consume_batches()
+            return
+
         while True:
             try:
                 # poll by the second
@@ -66,46 +122,227 @@ class Command(BaseCommand):
                 # There is only ever 1 because MaxNumberOfMessages=1
                 message = Message.from_event(messages[0])
 
-                already_deduplicated = redis_client.get(message.message_deduplication_id)
-                if already_deduplicated and already_deduplicated.decode('UTF-8') == 'True':
+                # Fetch its IPFS data and price outside of the handler's transaction
+                self.prefetch([message])
+
+                if self.process_message(message) != CLAIMED_ELSEWHERE:
                     self.remove_from_queue(message)
-                    continue
 
-                # If someone uploads a data hash that is faulty, then we want to blacklist all events around that
-                # bounty id. It can either be a permanent blacklist, typically added manually, or a pending blacklist.
-                # All the events in the pending blacklist will retry later.
-                permanent_blacklist = redis_client.get('blacklist:{}'.format(message.bounty_id))
-                pending_blacklist = redis_client.exists('pending_blacklist:{}'.format(message.bounty_id))
+            except Exception as e:
+                # goes to rollbar
+                logger.error(e)
 
-                if permanent_blacklist or pending_blacklist:
-                    self.remove_from_queue(message)
-                    if permanent_blacklist:
-                        logger.info('Skipping event for {}, permanent blacklist found'.format(message.bounty_id))
-                    else:
-                        logger.info('Pending blacklist exists for {}, adding event {}'.format(message.bounty_id, message.event))
-                        self.add_to_blacklist(message)
+    def consume_batches(self):
+        while True:
+            try:
+                response = sqs_client.receive_message(
+                    QueueUrl=settings.QUEUE_URL,
+                    AttributeNames=['MessageDeduplicationId'],
+                    MessageAttributeNames=['All'],
+                    MaxNumberOfMessages=SQS_BATCH_SIZE,
+                    WaitTimeSeconds=SQS_WAIT_TIME_SECONDS,
+                )
+
+                messages = [Message.from_event(event) for event in response.get('Messages', [])]
+                if not messages:
                     continue
 
-                self.handle_message(message)
-                self.remove_from_queue(message)
+                # Fetch the batch's IPFS data and prices up front, outside of any handler's transaction
+                self.prefetch(messages)
+
+                # The queue is FIFO with a single message group, so a batch comes back in the
+                # order the events were emitted. Handling it sequentially keeps every bounty's
+                # events in order. The whole batch is claimed up front, so a bounty that gets
+                # blacklisted part way through is tracked here for the rest of the batch.
+                blacklisted_bounties = set()
+                processed = []
+                with user_identity_map():
+                    for message, status in zip(messages, claim_events(messages)):
+                        if message.bounty_id in blacklisted_bounties and status not in (PROCESSED, CLAIMED_ELSEWHERE):
+                            status = PENDING_BLACKLIST
+
+                        outcome = self.process_message(message, status)
+                        if outcome in (BLACKLISTED, PENDING_BLACKLIST):
+                            blacklisted_bounties.add(message.bounty_id)
+                        if outcome != CLAIMED_ELSEWHERE:
+                            processed.append(message)
+
+                complete_events(processed)
+                self.remove_batch_from_queue(processed)
 
             except Exception as e:
                 # goes to rollbar
                 logger.error(e)
-                self.remove_from_queue(message)
-                self.add_to_blacklist(message)
+
+    def consume_partitioned(self, worker_count):
+        """
+        Fan each batch out to worker processes, sending every event of a bounty to the same
+        worker so a bounty's events stay in order while different bounties run concurrently.
+
+        The queue uses a single message group, so SQS holds back the next batch until the
+        current one is deleted. The dispatcher therefore waits for the whole batch before
+        deleting it, and on SIGTERM/SIGINT it finishes that batch before stopping the workers.
+        """
+        self.shutting_down = False
+
+        def request_shutdown(signum, frame):
+            logger.info('Received signal {}, draining in-flight events'.format(signum))
+            self.shutting_down = True
+
+        signal.signal(signal.SIGTERM, request_shutdown)
+        signal.signal(signal.SIGINT, request_shutdown)
+
+        # Forked workers must open their own database connections
+        connections.close_all()
+        results = multiprocessing.Queue()
+        workers = [self.start_worker(results) for _ in range(worker_count)]
+
+        try:
+            while not self.shutting_down:
+                try:
+                    response = sqs_client.receive_message(
+                        QueueUrl=settings.QUEUE_URL,
+                        AttributeNames=['MessageDeduplicationId'],
+                        MessageAttributeNames=['All'],
+                        MaxNumberOfMessages=SQS_BATCH_SIZE,
+                        WaitTimeSeconds=SQS_WAIT_TIME_SECONDS,
+                    )
+
+                    messages = [Message.from_event(event) for event in response.get('Messages', [])]
+                    if not messages:
+                        continue
+
+                    # Warm the IPFS cache's redis tier and the price table before the workers need them
+                    self.prefetch(messages)
+
+                    for message in messages:
+                        _, tasks = workers[message.bounty_id % worker_count]
+                        tasks.put(message)
+
+                    processed = self.collect_results(messages, workers, results)
+                    self.remove_batch_from_queue(processed)
+
+                except Exception as e:
+                    # goes to rollbar
+                    logger.error(e)
+        finally:
+            for _, tasks in workers:
+                tasks.put(None)
+            for process, _ in workers:
+                process.join()
+
+    def start_worker(self, results):
+        tasks = multiprocessing.Queue()
+        process = multiprocessing.Process(target=partition_worker, args=(tasks, results))
+        process.start()
+        return process, tasks
+
+    def collect_results(self, messages, workers, results):
+        pending = {message.receipt_handle: message for message in messages}
+        processed = []
+
+        while pending:
+            try:
+                receipt_handle, succeeded = results.get(timeout=WORKER_POLL_SECONDS)
+            except queue.Empty:
+                dead = [index for index, (process, _) in enumerate(workers) if not process.is_alive()]
+                if not dead:
+                    continue
+
+                # Whatever the dead worker still held is left on the queue and redelivered
+                # once its visibility timeout runs out
+                for index in dead:
+                    logger.error('Subscriber worker {} exited with code {}, restarting it'.format(
+                        index, workers[index][0].exitcode))
+                    workers[index] = self.start_worker(results)
+                break
+
+            message = pending.pop(receipt_handle, None)
+            if message and succeeded:
+                processed.append(message)
+
+        return processed
+
+    def prefetch(self, messages):
+        prefetch_ipfs_data(messages)
+
+        priced = [message for message in messages if message.event in PRICED_EVENTS]
+        if not priced:
+            return
+
+        token_symbols = {
+            (bounty_id, contract_version): token_symbol
+            for bounty_id, contract_version, token_symbol in Bounty.objects.filter(
+                bounty_id__in={message.bounty_id for message in priced}
+            ).values_list('bounty_id', 'contract_version', 'token_symbol')
+        }
+        prefetch_historic_prices([
+            (token_symbols.get((message.bounty_id, message.contract_version)), message.event_timestamp)
+            for message in priced
+        ])
+
+    def process_message(self, message, status=None):
+        """
+        Handle an event unless it was already processed, is blacklisted or is being handled by
+        another consumer. Returns the outcome, and only CLAIMED_ELSEWHERE events must stay on the queue.
+        """
+        if status is None:
+            status = claim_event(message)
+
+        if status in (PROCESSED, CLAIMED_ELSEWHERE):
+            return status
+
+        # If someone uploads a data hash that is faulty, then we want to blacklist all events around that
+        # bounty id. It can either be a permanent blacklist, typically added manually, or a pending blacklist.
+        # All the events in the pending blacklist will retry later.
+        if status == BLACKLISTED:
+            logger.info('Skipping event for {}, permanent blacklist found'.format(message.bounty_id))
+            return status
+
+        if status == PENDING_BLACKLIST:
+            logger.info('Pending blacklist exists for {}, adding event {}'.format(message.bounty_id, message.event))
+            self.add_to_blacklist(message)
+            return status
+
+        try:
+            self.handle_message(message)
+        except Exception as e:
+            # goes to rollbar
+            logger.error(e)
+            self.add_to_blacklist(message)
+            return PENDING_BLACKLIST
+
+        return PROCESSED
 
     def remove_from_queue(self, message):
-        # This means the contract subscriber will never send this event
-        # through to sqs again
-        redis_client.set(message.message_deduplication_id, 'True')
+        complete_events([message])
         try:
             sqs_client.delete_message(
                 QueueUrl=settings.QUEUE_URL,
                 ReceiptHandle=message.receipt_handle,
             )
         except ClientError as e:
-            logger.warning('SQS delete_message hit an error: '.format(e.response['Error']['Message']))
+            logger.warning('SQS delete_message hit an error: {}'.format(e.response['Error']['Message']))
+
+    def remove_batch_from_queue(self, messages):
+        if not messages:
+            return
+
+        try:
+            response = sqs_client.delete_message_batch(
+                QueueUrl=settings.QUEUE_URL,
+                Entries=[
+                    {'Id': str(index), 'ReceiptHandle': message.receipt_handle}
+                    for index, message in enumerate(messages)
+                ],
+            )
+        except ClientError as e:
+            logger.warning('SQS delete_message_batch hit an error: {}'.format(e.response['Error']['Message']))
+            return
+
+        for failure in response.get('Failed', []):
+            logger.warning('SQS delete_message_batch could not delete entry {}: {}'.format(
+                failure['Id'], failure.get('Message')))
 
     def add_to_blacklist(self, message):
         existing = redis_client.lrange('pending_blacklist:{}'.format(message.bounty_id), 0, -1)
@@ -127,7 +364,9 @@ class Command(BaseCommand):
             try:
                 retry = redis_client.lpop(key).decode('UTF-8')
                 logger.warning('Retrying event: {}'.format(retry))
-                self.handle_message(Message.from_string(retry))
+                message = Message.from_string(retry)
+                self.prefetch([message])
+                self.handle_message(message)
             except Exception as e:
                 # Don't re-raise - we just place it back in the list and try
                 # again later
@@ -139,12 +378,17 @@ class Command(BaseCommand):
                 print(len(retries))
 
     def handle_message(self, message):
+        # Users the event creates are only remembered by an enclosing batch once its transaction
+        # has committed, a rolled back event leaves no users behind
+        with user_identity_map():
+            self.apply_message(message)
+
+    # The state change, its Event row and its side effect outbox entries are committed together
+    @transaction.atomic
+    def apply_message(self, message):
         logger.info('For bounty id {}, running event {}'.format(message.bounty_id, message.event))
 
-        if message.contract_version == STANDARD_BOUNTIES_V1:
-            self.notify_master_client(message)
-        else:
-            self.notify_master_client_v2(message)
+        self.notify_master_client(message)
 
         bounty = Bounty.objects.get(bounty_id=message.bounty_id, contract_version=message.contract_version)
 
@@ -218,178 +462,8 @@ class Command(BaseCommand):
         #      slack_client.payout_increased(bounty)
 
     def notify_master_client(self, message):
-        event = message.event
-        inputs = message.contract_method_inputs
-        event_data = message.contract_event_data
-
         try:
-            base_event_data = {
-                'bounty_id': message.bounty_id,
-                'contract_version': STANDARD_BOUNTIES_V1,
-                'event_date': message.event_date,
-                'event_timestamp': message.event_timestamp,
-                'uid': message.message_deduplication_id,
-            }
-
-            if event == 'BountyIssued':
-                master_client.client['bounty_issued'](
-                    **base_event_data,
-                    **{
-                        'creator': inputs.get('issuer'),
-                        'issuers': [inputs.get('issuer')],
-                        'approvers': [inputs.get('issuer')],
-                        'data': inputs.get('data'),
-                        'deadline': inputs.get('deadline'),
-                        'fulfillment_amount': inputs.get('fulfillmentAmount'),
-                        'value': inputs.get('value'),
-                        'token': inputs.get('tokenContract'),
-                        'token_version': '20' if inputs.get('paysTokens') else '0',
-                    },
-                )
-
-            elif event == 'BountyActivated':
-                master_client.client['bounty_activated'](
-                    **base_event_data,
-                    **{
-                        'issuer': inputs.get('issuer', None)
-                    },
-                )
-
-            elif event == 'BountyFulfilled':
-                master_client.client['bounty_fulfilled'](
-                    **base_event_data,
-                    **{
-                        'fulfillment_id': event_data.get('fulfillment_id'),
-                        'fulfillers': [event_data.get('fulfiller')],
-                        'submitter': event_data.get('fulfiller'),
-                        'data': inputs.get('data'),
-                    },
-                )
-
-            # untested
-            elif event == 'FulfillmentUpdated':
-                master_client.client['fullfillment_updated'](
-                    **base_event_data,
-                    **{
-                        'fulfillment_id': event_data.get('fulfillment_id'),
-                        'fulfillers': [message.transaction_from],
-                        'data': inputs.get('data'),
-                    },
-                )
-
-            elif event == 'FulfillmentAccepted':
-                bounty = Bounty.objects.get(
-                    bounty_id=message.bounty_id,
-                    contract_version=STANDARD_BOUNTIES_V1,
-                )
-
-                master_client.client['fulfillment_accepted'](
-                    **base_event_data,
-                    **{
-                        'fulfillment_id': event_data.get('fulfillment_id'),
-                        'token_amounts': [bounty.fulfillment_amount],
-                        'approver': message.transaction_from,
-                    },
-                )
-
-            # untested
-            elif event == 'BountyKilled':
-                master_client.client['bounty_killed'](
-                    **base_event_data,
-                )
-
-            elif event == 'ContributionAdded':
-                master_client.client['contribution_added'](
-                    **base_event_data,
-                    **{
-                        'contribution_id': 0,
-                        'contributor': event_data.get('contributor'),
-                        'amount': event_data.get('value'),
-                    }
-                )
-
-            # untested
-            elif event == 'DeadlineExtended':
-                master_client.client['bounty_deadline_changed'](
-                    **base_event_data,
-                    **{
-                        'changer': message.transaction_from,
-                        'deadline': event_data.get('new_deadline'),
-                    },
-                )
-
-            elif event == 'BountyChanged':
-                # this event only occurs when a draft bounty is edited
-                pass
-
-            # untested
-            elif event == 'IssuerTransferred':
-                master_client.client['bounty_issuers_updated'](
-                    **base_event_data,
-                    **{
-                        'changer': message.transaction_from,
-                        'issuers': [event_data.get('new_issuer')],
-                    },
-                )
-
-                master_client.client['bounty_approvers_updated'](
-                    **base_event_data,
-                    **{
-                        'changer': message.transaction_from,
-                        'approvers': [event_data.get('new_issuer')],
-                    },
-                )
-
-            # untested
-            elif event == 'PayoutIncreased':
-                master_client.client['payout_increased'](
-                    **base_event_data,
-                    **{
-                        'fulfillment_amount': event_data.get('new_fulfillment_amount'),
-                    },
-                )
-
-                master_client.client['contribution_added'](
-                    **base_event_data,
-                    **{
-                        'contribution_id': 0,
-                        'contributor': message.transaction_from,
-                        'amount': inputs.get('value'),
-                    }
-                )
-
-            else:
-                logger.warning('Event for bounty id {} not recognized: {}'.format(message.bounty_id, event))
-
-        except StatusError as e:
-            if e.original.response.status_code == 504:
-                logger.warning('Timeout for bounty id {}'.format(message.bounty_id))
-            raise e
-
-    def notify_master_client_v2(self, message):
-        try:
-            # make camel case
-            event = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', message.event)
-            event = re.sub('([a-z0-9])([A-Z])', r'\1_\2', event).lower()
-
-            events_to_skip = [
-                # not relevant for getting stb 2.0 to be compatible with stb 1.0,
-                # and this event may change to `bounty_issuers_changed` instead
-                # 'bounty_issuers_updated',
-                # 'bounty_approvers_updated',
-            ]
-
-            if event in events_to_skip:
-                return
-
-            master_client.client[event](
-                message.bounty_id,
-                contract_version=STANDARD_BOUNTIES_V2,
-                event_date=message.event_date,
-                event_timestamp=message.event_timestamp,
-                uid=message.message_deduplication_id,
-                **{k: v for (k, v) in message.contract_event_data.items() if 'bounty_id' not in k},
-            )
+            event_registry.dispatch(message)
         except StatusError as e:
             if e.original.response.status_code == 504:
                 logger.warning('Timeout for bounty id {}'.format(message.bounty_id))
@@ -0,0 +1,123 @@
+import logging
+import time
+from datetime import datetime, timedelta
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+# registers the notification, slack and seo clients with std_bounties.side_effects
+from std_bounties import master_client
+from std_bounties.models import SideEffect
+from std_bounties.side_effects import dispatch
+
+logger = logging.getLogger('django')
+
+MAX_ATTEMPTS = 8
+# How long a claimed side effect is left to its dispatcher before others may retry it. The lease
+# is renewed before each call, so it only has to outlast one: slack calls time out after 10s and
+# ses and sns calls after three attempts of at most 15s.
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+class Command(BaseCommand):
+    help = 'Send the notifications, slack messages and sns publishes queued in the side effect outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            dest='batch_size',
+            help='Number of side effects to claim at a time',
+            default=50
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            dest='once',
+            help='Exit once the outbox is drained',
+            default=False
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                dispatched = self.dispatch_batch(options['batch_size'])
+            except Exception as e:
+                # goes to rollbar
+                logger.error(e)
+                dispatched = 0
+
+            if not dispatched:
+                if options['once']:
+                    return
+                time.sleep(1)
+
+    def dispatch_batch(self, batch_size):
+        side_effects = self.claim(batch_size)
+
+        # Each call and its result get their own short transaction, so a slow slack or sns call
+        # never holds the rest of the batch
+        for side_effect in side_effects:
+            if not self.renew_lease(side_effect):
+                logger.warning('Side effect {} was taken over by another dispatcher'.format(side_effect.id))
+                continue
+
+            try:
+                # notifications write to the database, and are marked dispatched with their writes
+                with transaction.atomic():
+                    dispatch(side_effect)
+                    side_effect.dispatched = datetime.now()
+                    side_effect.save(update_fields=['dispatched'])
+            except Exception as e:
+                self.record_failure(side_effect, e)
+
+        return len(side_effects)
+
+    @transaction.atomic
+    def claim(self, batch_size):
+        """
+        Lease a batch of due side effects to this dispatcher. Until the lease runs out other
+        dispatchers skip them, and one that crashed has them retried once it has.
+        """
+        # skip_locked lets several dispatchers claim from the outbox side by side
+        side_effects = list(SideEffect.objects.select_for_update(skip_locked=True).filter(
+            dispatched__isnull=True,
+            next_attempt__lte=datetime.now()
+        ).order_by('id')[:batch_size])
+
+        lease = datetime.now() + CLAIM_LEASE
+        SideEffect.objects.filter(pk__in=[side_effect.pk for side_effect in side_effects]).update(next_attempt=lease)
+        for side_effect in side_effects:
+            side_effect.next_attempt = lease
+        return side_effects
+
+    def renew_lease(self, side_effect):
+        """
+        Start a fresh lease on a claimed side effect before its call, so the calls ahead of it in
+        the batch don't use up its time. Returns False when its lease ran out and another
+        dispatcher claimed it since.
+        """
+        lease = datetime.now() + CLAIM_LEASE
+        renewed = SideEffect.objects.filter(
+            pk=side_effect.pk,
+            dispatched__isnull=True,
+            next_attempt=side_effect.next_attempt
+        ).update(next_attempt=lease)
+        side_effect.next_attempt = lease
+        return renewed == 1
+
+    def record_failure(self, side_effect, error):
+        side_effect.attempts += 1
+        side_effect.last_error = str(error)
+        # a model argument that was deleted since won't come back
+        if side_effect.attempts >= MAX_ATTEMPTS or isinstance(error, ObjectDoesNotExist):
+            logger.error('Giving up on side effect {} {}.{}: {}'.format(
+                side_effect.id, side_effect.client, side_effect.method, error))
+            side_effect.next_attempt = None
+        else:
+            logger.warning('Side effect {} {}.{} failed, retrying: {}'.format(
+                side_effect.id, side_effect.client, side_effect.method, error))
+            side_effect.next_attempt = datetime.now() + timedelta(seconds=2 ** side_effect.attempts)
+
+        side_effect.save(update_fields=['attempts', 'last_error', 'next_attempt'])
@@ -1,79 +1,92 @@
 import requests
-from math import pow
-from decimal import Decimal
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
 from std_bounties.constants import DEAD_STAGE, COMPLETED_STAGE
-from std_bounties.models import Token, Bounty, DraftBounty
+from std_bounties.models import Token
+from bounties.utils import bulk_upsert
+from datetime import datetime
 import logging
 import sys
+import time
 
 logger = logging.getLogger('django')
 
+TOKEN_CHUNK_SIZE = 500
+
+# Reprices every bounty whose token has a price, from the oldest token row with its symbol (the
+# one get_token_pricing uses), and links bounties that don't have a token yet to it
+REPRICE_SQL = '''
+    UPDATE {table} bounty
+    SET usd_price = bounty.fulfillment_amount / power(10::numeric, bounty.token_decimals) * token.price_usd::numeric,
+        token_id = COALESCE(bounty.token_id, token.id)
+    FROM (
+        SELECT DISTINCT ON (symbol) id, symbol, price_usd
+        FROM std_bounties_token
+        WHERE price_usd IS NOT NULL
+        ORDER BY symbol, id
+    ) token
+    WHERE bounty.token_symbol = token.symbol
+      AND bounty.token_decimals IS NOT NULL
+      AND {condition}
+'''
+
 
 class Command(BaseCommand):
     help = 'Update current token values, and update usd_price on all bounties'
 
     def handle(self, *args, **options):
         try:
-            token_cache = {}
+            started = time.time()
             r = requests.get(
                 'https://api.coinmarketcap.com/v1/ticker/?convert=USD&limit=1000000')
             r.raise_for_status()
             coins = r.json()
-            for coin in coins:
-                symbol = coin['symbol']
-                price_usd = coin['price_usd']
-                coin_data = {
-                    'normalized_name': coin['id'],
-                    'name': coin['name'],
-                    'symbol': symbol,
-                }
-
-                token_cache[symbol] = price_usd
-                Token.objects.update_or_create(
-                    **coin_data, defaults={'price_usd': price_usd})
-
-            all_bounties = Bounty.objects.exclude(
-                bounty_stage__in=[DEAD_STAGE, COMPLETED_STAGE])
-            for bounty in all_bounties:
-                price = token_cache.get(bounty.token_symbol, None)
-                if not price:
-                    try:
-                        current_token = Token.objects.get(symbol=bounty.token_symbol)
-                        price = current_token.price_usd
-                    except Token.DoesNotExist:
-                        price = None
 
-                if price is not None:
-                    decimals = bounty.token_decimals
-                    fulfillment_amount = bounty.fulfillment_amount
-                    bounty.usd_price = (
-                        fulfillment_amount / Decimal(pow(10, decimals))) * Decimal(price)
-                    bounty.tokenLockPrice = None
-                    bounty.save()
-                # maybe a token was not added to coinmarketcap until later
-                if price is not None and not bounty.token:
-                    token_model = Token.objects.get(symbol=bounty.token_symbol)
-                    bounty.token = token_model
-                    bounty.save()
+            with transaction.atomic():
+                self.update_tokens(coins)
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        REPRICE_SQL.format(table='std_bounties_bounty', condition='NOT bounty.bounty_stage = ANY(%s)'),
+                        [[DEAD_STAGE, COMPLETED_STAGE]]
+                    )
+                    bounties = cursor.rowcount
+                    # drafts are only repriced from tokens in the current ticker
+                    cursor.execute(
+                        REPRICE_SQL.format(table='std_bounties_draftbounty', condition='NOT bounty.on_chain AND token.symbol = ANY(%s)'),
+                        [list({coin['symbol'] for coin in coins if coin['price_usd'] is not None})]
+                    )
+                    draft_bounties = cursor.rowcount
 
-            all_draft_bounties = DraftBounty.objects.filter(on_chain=False)
-            for draft_bounty in all_draft_bounties:
-                price = token_cache.get(draft_bounty.token_symbol, None)
-                if price is not None:
-                    decimals = draft_bounty.token_decimals
-                    fulfillment_amount = draft_bounty.fulfillment_amount
-                    draft_bounty.usd_price = (
-                        fulfillment_amount / Decimal(pow(10, decimals))) * Decimal(price)
-                    draft_bounty.save()
-                # maybe a token was not added to coinmarketcap until later
-                if price is not None and not draft_bounty.token:
-                    token_model = Token.objects.get(
-                        symbol=draft_bounty.token_symbol)
-                    draft_bounty.token = token_model
-                    draft_bounty.save()
+            logger.info('Repriced {} bounties and {} draft bounties from {} tokens in {:.1f}s'.format(
+                bounties, draft_bounties, len(coins), time.time() - started))
 
         except Exception as e:
             # goes to rollbar
             logger.exception(e)
             sys.exit(1)
+
+    def update_tokens(self, coins):
+        prices = {
+            (coin['id'], coin['name'], coin['symbol']): coin['price_usd']
+            for coin in coins
+        }
+        tokens = [
+            Token(normalized_name=normalized_name, name=name, symbol=symbol, price_usd=price_usd)
+            for (normalized_name, name, symbol), price_usd in prices.items()
+        ]
+
+        for start in range(0, len(tokens), TOKEN_CHUNK_SIZE):
+            bulk_upsert(Token, tokens[start:start + TOKEN_CHUNK_SIZE], ['normalized_name', 'name', 'symbol'], ['price_usd'])
+
+        # one sample per symbol, from the same token row bounties are priced from
+        with connection.cursor() as cursor:
+            cursor.execute(
+                '''
+                INSERT INTO std_bounties_tokenprice (symbol, time, price_usd)
+                SELECT DISTINCT ON (symbol) symbol, %s, price_usd
+                FROM std_bounties_token
+                WHERE price_usd IS NOT NULL AND symbol = ANY(%s)
+                ORDER BY symbol, id
+                ''',
+                [datetime.utcnow(), list({symbol for _, _, symbol in prices})]
+            )
@@ -0,0 +1,81 @@
+import logging
+import re
+
+from django.core.management.base import BaseCommand
+
+from bounties.redis_client import redis_client
+from std_bounties.client_helpers import web3
+from std_bounties.event_deduplication import dedup_shard_key, index_shards, LEGACY_DEDUP_TTL
+
+logger = logging.getLogger('django')
+
+# Legacy dedup keys are the transaction hash followed by the event name
+LEGACY_KEY = re.compile(r'^0x[0-9a-fA-F]{64}[A-Za-z]+$')
+
+
+class Command(BaseCommand):
+    help = 'Move the legacy per event dedup keys into the block range shards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resolve-blocks',
+            action='store_true',
+            dest='resolve_blocks',
+            help='Look up each transaction block to move the key into its shard, instead of only expiring it',
+            default=False
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            dest='chunk_size',
+            help='Number of keys to migrate per redis pipeline',
+            default=1000
+        )
+
+    def handle(self, *args, **options):
+        migrated = 0
+        chunk = []
+
+        for key in redis_client.scan_iter(match='0x*', count=options['chunk_size']):
+            key = key.decode('UTF-8')
+            if not LEGACY_KEY.match(key):
+                continue
+
+            chunk.append(key)
+            if len(chunk) >= options['chunk_size']:
+                migrated += self.migrate(chunk, options['resolve_blocks'])
+                chunk = []
+
+        if chunk:
+            migrated += self.migrate(chunk, options['resolve_blocks'])
+
+        logger.info('Migrated {} legacy dedup keys'.format(migrated))
+
+    def migrate(self, keys, resolve_blocks):
+        pipe = redis_client.pipeline(transaction=False)
+        block_numbers = []
+
+        for key in keys:
+            block_number = self.block_number(key[:66]) if resolve_blocks else None
+
+            if block_number is None:
+                # The subscriber only rescans from its current block, so an old key just has to
+                # outlive the window in which its event could still be redelivered
+                pipe.expire(key, LEGACY_DEDUP_TTL)
+            else:
+                pipe.hset(dedup_shard_key(block_number), key, 1)
+                pipe.delete(key)
+                block_numbers.append(block_number)
+
+        index_shards(pipe, block_numbers)
+        pipe.execute()
+        return len(keys)
+
+    def block_number(self, transaction_hash):
+        try:
+            transaction = web3.eth.getTransaction(transaction_hash)
+        except Exception as e:
+            logger.warning('Could not look up transaction {}: {}'.format(transaction_hash, e))
+            return None
+
+        return transaction['blockNumber'] if transaction else None
@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from std_bounties.constants import FULFILLER_LEADERBOARD, ISSUER_LEADERBOARD
+from std_bounties.leaderboards import refresh_leaderboard
+import logging
+
+logger = logging.getLogger('django')
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed issuer and fulfiller leaderboards'
+
+    # The subscriber keeps the rows of the bounties and addresses its events touch current. This
+    # rebuilds them all, after the leaderboard queries change or data was edited outside of events
+    def handle(self, *args, **options):
+        try:
+            for kind in (ISSUER_LEADERBOARD, FULFILLER_LEADERBOARD):
+                started = time.time()
+                with transaction.atomic():
+                    deleted = refresh_leaderboard(kind)
+                logger.info('Refreshed the {} leaderboard in {:.1f}s, {} rows removed'.format(
+                    kind, time.time() - started, deleted))
+        except Exception as e:
+            # goes to rollbar
+            logger.exception(e)
+            raise e
@@ -0,0 +1,152 @@
+import logging
+import time
+from contextlib import ExitStack
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from std_bounties.client_helpers import prefetch_ipfs_data, prefetch_historic_prices
+from std_bounties.ipfs_cache import ipfs_cache
+from std_bounties.management.commands.bounties_subscriber import Command as SubscriberCommand, PRICED_EVENTS
+from std_bounties.message import Message
+from std_bounties.models import Bounty, Event
+from std_bounties.side_effects import suppress_side_effects
+from user.resolver import user_identity_map
+
+logger = logging.getLogger('django')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild bounty state in a fresh database by replaying the stored contract events in order'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            dest='source',
+            help='Database alias holding the events, see replay_source_db in settings',
+            default='replay_source'
+        )
+        parser.add_argument(
+            '--no-side-effects',
+            action='store_true',
+            dest='no_side_effects',
+            help='Skip notifications, slack messages and sns publishes',
+            default=False
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            dest='force',
+            help='Replay even if the target database already has bounties',
+            default=False
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            dest='chunk_size',
+            help='Number of events to prefetch IPFS data and prices for at a time',
+            default=500
+        )
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if source not in settings.DATABASES:
+            raise CommandError('Unknown database {}, set replay_source_db to the database holding the events'.format(source))
+        if source == DEFAULT_DB_ALIAS:
+            raise CommandError('Events have to be replayed into a different database than the one holding them')
+        if Bounty.objects.exists() and not options['force']:
+            raise CommandError('The target database already has bounties, use --force to replay into it anyway')
+
+        events = Event.objects.using(source).select_related('bounty').order_by('event_date', 'id')
+        total = events.count()
+        subscriber = SubscriberCommand()
+        report = ReplayReport(total)
+        # Like the subscriber's blacklist, a bounty whose event failed doesn't get its later events
+        failed_bounties = set()
+
+        with ExitStack() as stack:
+            if options['no_side_effects']:
+                stack.enter_context(suppress_side_effects())
+
+            iterator = events.iterator()
+            while True:
+                chunk = list(islice(iterator, options['chunk_size']))
+                if not chunk:
+                    break
+
+                messages = [(event, self.to_message(event)) for event in chunk if event.bounty]
+                report.skipped += len(chunk) - len(messages)
+                self.prefetch(messages)
+
+                with user_identity_map():
+                    for event, message in messages:
+                        bounty_key = (message.bounty_id, message.contract_version)
+                        if bounty_key in failed_bounties:
+                            report.skipped += 1
+                            continue
+
+                        try:
+                            subscriber.handle_message(message)
+                            report.replayed += 1
+                        except Exception as e:
+                            logger.error('Replaying event {} ({}) for bounty {} failed: {}'.format(
+                                event.id, message.event, message.bounty_id, e))
+                            failed_bounties.add(bounty_key)
+                            report.failed += 1
+
+                report.log_progress()
+
+        report.log_summary()
+        ipfs_cache.log_stats()
+
+    def to_message(self, event):
+        return Message(
+            receipt_handle='',
+            event=event.event,
+            bounty_id=event.bounty.bounty_id,
+            fulfillment_id=event.fulfillment_id if event.fulfillment_id is not None else -1,
+            message_deduplication_id=event.transaction_hash + event.event,
+            transaction_from=event.transaction_from,
+            transaction_hash=event.transaction_hash,
+            # event_date was built with datetime.fromtimestamp, so mktime gives back the block timestamp
+            event_timestamp=str(int(time.mktime(event.event_date.timetuple()))),
+            event_date=event.event_date,
+            contract_method_inputs=event.contract_inputs or {},
+            contract_event_data=event.contract_event_data or {},
+            contract_version=event.bounty.contract_version,
+        )
+
+    def prefetch(self, messages):
+        prefetch_ipfs_data([message for _, message in messages])
+        prefetch_historic_prices([
+            (event.bounty.token_symbol, message.event_timestamp)
+            for event, message in messages
+            if message.event in PRICED_EVENTS
+        ])
+
+
+class ReplayReport:
+    def __init__(self, total):
+        self.total = total
+        self.replayed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started = time.time()
+
+    @property
+    def processed(self):
+        return self.replayed + self.failed + self.skipped
+
+    def rate(self):
+        return self.processed / max(time.time() - self.started, 0.001)
+
+    def log_progress(self):
+        rate = self.rate()
+        logger.info('Replayed {}/{} events ({:.1f} events/s, {} failed, {} skipped, about {:.0f}s left)'.format(
+            self.processed, self.total, rate, self.failed, self.skipped, (self.total - self.processed) / max(rate, 0.001)))
+
+    def log_summary(self):
+        logger.info('Replay finished in {:.1f}s: {} replayed, {} failed, {} skipped, {:.1f} events/s'.format(
+            time.time() - self.started, self.replayed, self.failed, self.skipped, self.rate()))
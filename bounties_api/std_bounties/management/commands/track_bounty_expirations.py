@@ -1,35 +1,69 @@
 import time
-from datetime import datetime, timezone
+from datetime import datetime
 from django.core.management.base import BaseCommand
-from notifications.notification_client import NotificationClient
+from django.db import connection, transaction
+from django.db.models import Min
 from std_bounties.constants import ACTIVE_STAGE, EXPIRED_STAGE
-from std_bounties.models import Bounty
+from std_bounties.master_client import notification_client
+from std_bounties.models import Bounty, record_bounty_states
 import logging
 
 logger = logging.getLogger('django')
-notification_client = NotificationClient()
+
+# Deadlines can be added or moved while the scheduler sleeps, so it checks for the next one at
+# least this often. Each check is a single indexed MIN(deadline) query.
+MAX_SLEEP_SECONDS = 60
 
 # TODO - This should just be a scheduled cronjob.
 # There is no need to have this as a long running job
 
 
 class Command(BaseCommand):
-    help = 'Listen for contract events'
+    help = 'Expire active bounties as their deadlines pass'
 
     def handle(self, *args, **options):
         try:
             while True:
-                expired_bounties = Bounty.objects.filter(
-                    deadline__lt=datetime.now(timezone.utc),
-                    bounty_stage=ACTIVE_STAGE
-                )
-                for bounty in expired_bounties:
-                    bounty.bounty_stage = EXPIRED_STAGE
-                    bounty.save()
-                    bounty_state = bounty.record_bounty_state(bounty.deadline)
-                    notification_client.bounty_expired(bounty.id, bounty.deadline, bounty_state[0].id)
-                time.sleep(60)
+                expire_bounties(datetime.now())
+                time.sleep(self.seconds_until_next_expiry())
         except Exception as e:
             # goes to rollbar
             logger.exception(e)
             raise e
+
+    def seconds_until_next_expiry(self):
+        next_deadline = Bounty.objects.filter(bounty_stage=ACTIVE_STAGE).aggregate(Min('deadline'))['deadline__min']
+        if next_deadline is None:
+            return MAX_SLEEP_SECONDS
+
+        return min(max((next_deadline - datetime.now()).total_seconds(), 0), MAX_SLEEP_SECONDS)
+
+
+@transaction.atomic
+def expire_bounties(now):
+    """
+    Expire every active bounty whose deadline has passed with one UPDATE, then record their
+    state changes and queue their notifications in bulk. Returns the expired bounty ids.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '''
+            UPDATE std_bounties_bounty
+            SET bounty_stage = %s, modified = %s
+            WHERE bounty_stage = %s AND deadline < %s
+            RETURNING id, deadline
+            ''',
+            [EXPIRED_STAGE, now, ACTIVE_STAGE, now]
+        )
+        expired = cursor.fetchall()
+
+    if not expired:
+        return []
+
+    states = record_bounty_states([(bounty_id, EXPIRED_STAGE, deadline) for bounty_id, deadline in expired])
+    notification_client.queue_many('bounty_expired', [
+        ((state.bounty_id, state.change_date, state.id), {}) for state in states
+    ])
+
+    logger.info('Expired {} bounties'.format(len(expired)))
+    return [bounty_id for bounty_id, _ in expired]
@@ -0,0 +1,29 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from std_bounties.client_helpers import get_token_metadata
+from std_bounties.models import Bounty
+
+logger = logging.getLogger('django')
+
+
+class Command(BaseCommand):
+    help = 'Populate the token contract metadata cache from the tokens of existing bounties'
+
+    def handle(self, *args, **options):
+        token_contracts = Bounty.objects.filter(
+            token_version=20
+        ).exclude(
+            token_contract=''
+        ).values_list('token_contract', flat=True).distinct()
+
+        cached = 0
+        for token_contract in token_contracts:
+            try:
+                get_token_metadata(token_contract)
+                cached += 1
+            except Exception as e:
+                logger.error('Could not cache token contract {}: {}'.format(token_contract, e))
+
+        logger.info('Cached metadata for {} token contracts'.format(cached))
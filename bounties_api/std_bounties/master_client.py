@@ -4,12 +4,14 @@ from std_bounties.slack_client import SlackMessageClient
 from std_bounties.seo_client import SEOClient
 from std_bounties.models import Bounty, Fulfillment
 from std_bounties.constants import STANDARD_BOUNTIES_V1
+from std_bounties.leaderboards import refresh_bounty_leaderboards
+from std_bounties.side_effects import SideEffectClient
 
 
 bounty_client = BountyClient()
-notification_client = NotificationClient()
-slack_client = SlackMessageClient()
-seo_client = SEOClient()
+notification_client = SideEffectClient('notification', NotificationClient())
+slack_client = SideEffectClient('slack', SlackMessageClient())
+seo_client = SideEffectClient('seo', SEOClient())
 
 client = {}
 
@@ -130,6 +132,7 @@ def fullfillment_updated(bounty_id, contract_version, **kwargs):
 
     bounty = Bounty.objects.get(bounty_id=bounty_id, contract_version=contract_version)
     bounty_client.update_fulfillment(bounty, **kwargs)
+    refresh_bounty_leaderboards(bounty)
 
     fulfillment_id = kwargs.get('fulfillment_id')
     notification_client.fulfillment_updated(bounty_id, **kwargs)
@@ -172,7 +175,9 @@ def bounty_changed(bounty_id, contract_version, **kwargs):
     """
 
     bounty = Bounty.objects.get(bounty_id=bounty_id, contract_version=contract_version)
+    previous_issuer = bounty.issuer
     bounty_client.change_bounty(bounty, **kwargs)
+    refresh_bounty_leaderboards(bounty, previous_issuer)
     notification_client.bounty_changed(bounty, **kwargs)
     slack_client.bounty_changed(bounty)
     seo_client.bounty_preview_screenshot(bounty.platform, bounty_id, contract_version)
@@ -188,7 +193,9 @@ def bounty_data_changed(bounty_id, contract_version, **kwargs):
     """
 
     bounty = Bounty.objects.get(bounty_id=bounty_id, contract_version=contract_version)
+    previous_issuer = bounty.issuer
     bounty_client.change_data(bounty, **kwargs)
+    refresh_bounty_leaderboards(bounty, previous_issuer)
 
 
 @export
@@ -201,7 +208,9 @@ def bounty_issuers_updated(bounty_id, contract_version, **kwargs):
     """
 
     bounty = Bounty.objects.get(bounty_id=bounty_id, contract_version=contract_version)
+    previous_issuer = bounty.issuer
     bounty = bounty_client.update_bounty_issuers(bounty, **kwargs)
+    refresh_bounty_leaderboards(bounty, previous_issuer)
     seo_client.bounty_preview_screenshot(bounty.platform, bounty_id, contract_version)
 
 
@@ -292,6 +301,7 @@ def payout_increased(bounty_id, contract_version, **kwargs):
 
     bounty = Bounty.objects.get(bounty_id=bounty_id, contract_version=contract_version)
     bounty_client.increase_payout(bounty, **kwargs)
+    refresh_bounty_leaderboards(bounty)
 
     seo_client.bounty_preview_screenshot(bounty.platform, bounty_id, contract_version)
 
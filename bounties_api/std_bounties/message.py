@@ -24,8 +24,10 @@ class Message:
     transaction_from = ''
     transaction_hash = ''
     event_timestamp = -1
+    block_number = -1
     event_date = None
     contract_method_inputs = {}
+    contract_event_data = {}
 
     @staticmethod
     def from_event(event):
@@ -36,6 +38,8 @@ class Message:
 
         message_attributes = event['MessageAttributes']
         event_timestamp = message_attributes['TimeStamp']['StringValue']
+        # Events queued before the subscriber sent block numbers don't have one
+        block_number = message_attributes.get('BlockNumber', {}).get('StringValue', -1)
 
         return Message(
             receipt_handle=event['ReceiptHandle'],
@@ -47,6 +51,7 @@ class Message:
             transaction_hash=message_attributes['TransactionHash']['StringValue'],
             event_timestamp=event_timestamp,
             event_date=datetime.fromtimestamp(int(event_timestamp)),
+            block_number=int(block_number),
             contract_method_inputs=json.loads(message_attributes['ContractMethodInputs']['StringValue']),
             contract_event_data=json.loads(message_attributes['ContractEventData']['StringValue']),
             contract_version=STANDARD_BOUNTIES_V2 if message_attributes['ContractVersion']['StringValue'] == 'v2' else STANDARD_BOUNTIES_V1
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 07:53
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('std_bounties', '0029_merge_20190530_1805'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenContract',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=42, unique=True)),
+                ('symbol', models.CharField(max_length=128)),
+                ('decimals', models.IntegerField()),
+                ('abi', models.CharField(choices=[('HumanStandardToken', 'HumanStandardToken'), ('DSToken', 'DSToken')], max_length=32)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 07:54
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('std_bounties', '0030_tokencontract'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricPrice',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=128)),
+                ('date', models.DateField()),
+                ('price_usd', models.FloatField(null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='historicprice',
+            unique_together=set([('symbol', 'date')]),
+        ),
+    ]
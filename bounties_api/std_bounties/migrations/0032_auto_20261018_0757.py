@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 07:57
+from __future__ import unicode_literals
+
+import datetime
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('std_bounties', '0031_auto_20261018_0754'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SideEffect',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client', models.CharField(max_length=32)),
+                ('method', models.CharField(max_length=128)),
+                ('arguments', django.contrib.postgres.fields.jsonb.JSONField(default=dict)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(default=datetime.datetime.now, null=True)),
+                ('dispatched', models.DateTimeField(null=True)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='sideeffect',
+            index_together=set([('dispatched', 'next_attempt')]),
+        ),
+    ]
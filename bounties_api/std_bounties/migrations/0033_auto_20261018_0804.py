@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 08:04
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+BACKFILL_LATEST_STATES = '''
+    UPDATE std_bounties_bounty bounty
+    SET latest_state_stage = state.bounty_stage, latest_state_date = state.change_date
+    FROM (
+        SELECT DISTINCT ON (bounty_id) bounty_id, bounty_stage, change_date
+        FROM std_bounties_bountystate
+        ORDER BY bounty_id, change_date DESC, id DESC
+    ) state
+    WHERE bounty.id = state.bounty_id
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('std_bounties', '0032_auto_20261018_0757'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bounty',
+            name='latest_state_date',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='bounty',
+            name='latest_state_stage',
+            field=models.IntegerField(choices=[(0, 'Draft'), (1, 'Active'), (2, 'Dead'), (3, 'Completed'), (4, 'Expired')], null=True),
+        ),
+        migrations.RunSQL(BACKFILL_LATEST_STATES, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 08:07
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+# update_or_create could leave duplicate tokens behind, keep the oldest of each. The foreign keys
+# are checked as each statement runs rather than at commit, otherwise the pending checks on the
+# token table stop the unique constraint from being added in the same transaction.
+MERGE_DUPLICATE_TOKENS = '''
+    SET CONSTRAINTS ALL IMMEDIATE;
+
+    CREATE TEMPORARY TABLE duplicate_token ON COMMIT DROP AS
+    SELECT token.id, keeper.id AS keeper_id
+    FROM std_bounties_token token
+    JOIN (
+        SELECT MIN(id) AS id, normalized_name, name, symbol
+        FROM std_bounties_token
+        GROUP BY normalized_name, name, symbol
+    ) keeper USING (normalized_name, name, symbol)
+    WHERE token.id <> keeper.id;
+
+    UPDATE std_bounties_bounty SET token_id = duplicate_token.keeper_id
+    FROM duplicate_token WHERE std_bounties_bounty.token_id = duplicate_token.id;
+
+    UPDATE std_bounties_draftbounty SET token_id = duplicate_token.keeper_id
+    FROM duplicate_token WHERE std_bounties_draftbounty.token_id = duplicate_token.id;
+
+    DELETE FROM std_bounties_token WHERE id IN (SELECT id FROM duplicate_token);
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('std_bounties', '0033_auto_20261018_0804'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenPrice',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=128)),
+                ('time', models.DateTimeField()),
+                ('price_usd', models.FloatField()),
+            ],
+        ),
+        migrations.RunSQL(MERGE_DUPLICATE_TOKENS, migrations.RunSQL.noop),
+        migrations.AlterUniqueTogether(
+            name='token',
+            unique_together=set([('normalized_name', 'name', 'symbol')]),
+        ),
+        migrations.AddIndex(
+            model_name='tokenprice',
+            index=models.Index(fields=['symbol', 'time'], name='std_bountie_symbol_902f60_idx'),
+        ),
+    ]
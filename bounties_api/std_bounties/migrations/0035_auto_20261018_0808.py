@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 08:08
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('std_bounties', '0034_auto_20261018_0807'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bounty',
+            index=models.Index(fields=['bounty_stage', 'deadline'], name='std_bountie_bounty__f1a366_idx'),
+        ),
+    ]
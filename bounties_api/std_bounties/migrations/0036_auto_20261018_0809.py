@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 08:09
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+# Leaderboards, reviews and the timeline only look at accepted fulfillments
+PARTIAL_INDEXES = [
+    ('fulfillment_accepted_bounty', 'bounty_id'),
+    ('fulfillment_accepted_fulfiller', 'fulfiller'),
+    ('fulfillment_accepted_date', 'accepted_date'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('std_bounties', '0035_auto_20261018_0808'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bounty',
+            index=models.Index(fields=['platform', 'bounty_stage', '-bounty_created'], name='bounty_platform_stage_created'),
+        ),
+        migrations.AddIndex(
+            model_name='bounty',
+            index=models.Index(fields=['issuer'], name='bounty_issuer'),
+        ),
+        migrations.AddIndex(
+            model_name='fulfillment',
+            index=models.Index(fields=['fulfiller'], name='fulfillment_fulfiller'),
+        ),
+    ] + [
+        migrations.RunSQL(
+            'CREATE INDEX {} ON std_bounties_fulfillment ({}) WHERE accepted'.format(name, column),
+            'DROP INDEX {}'.format(name),
+        )
+        for name, column in PARTIAL_INDEXES
+    ]
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 08:15
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+# Fill the leaderboards once, the subscriber and refresh_leaderboards keep them current. The
+# queries are copied here as they were, so later changes to std_bounties.queries don't change
+# what this migration does.
+BACKFILL_FULFILLERS = """
+INSERT INTO std_bounties_leaderboardentry (kind, platform, address, total, total_usd, bounties, fulfillments)
+SELECT
+    'fulfiller' as kind,
+    platform.name as platform,
+    fulfillment.fulfiller as address,
+    SUM(bounty."fulfillment_amount") as total,
+    SUM(fulfillment.usd_price) as total_usd,
+    COUNT(bounty) as bounties,
+    COUNT(fulfillment.id) as fulfillments
+FROM std_bounties_fulfillment fulfillment
+JOIN std_bounties_bounty bounty
+ON fulfillment.bounty_id = bounty.id
+JOIN user_user profile
+ON fulfillment.fulfiller = profile.public_address
+CROSS JOIN LATERAL (
+    SELECT '*' UNION SELECT fulfillment.platform UNION SELECT bounty.platform
+) platform(name)
+WHERE fulfillment.accepted = true AND platform.name <> ''
+GROUP BY platform.name, fulfillment.fulfiller
+"""
+
+BACKFILL_ISSUERS = """
+INSERT INTO std_bounties_leaderboardentry (kind, platform, address, total, total_usd, bounties, fulfillments)
+SELECT
+    'issuer' as kind,
+    platform.name as platform,
+    bounty.issuer as address,
+    SUM(bounty."fulfillment_amount") as total,
+    SUM(fulfillment.usd_price) as total_usd,
+    COUNT(distinct(bounty.id)) as bounties,
+    COUNT(fulfillment) as fulfillments
+FROM std_bounties_fulfillment fulfillment
+JOIN std_bounties_bounty bounty
+ON fulfillment.bounty_id = bounty.id
+JOIN user_user profile
+ON bounty.issuer = profile.public_address
+CROSS JOIN LATERAL (
+    SELECT '*' UNION SELECT fulfillment.platform UNION SELECT bounty.platform
+) platform(name)
+WHERE fulfillment.accepted = true AND platform.name <> ''
+GROUP BY platform.name, bounty.issuer
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('std_bounties', '0036_auto_20261018_0809'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('issuer', 'Issuer'), ('fulfiller', 'Fulfiller')], max_length=16)),
+                ('platform', models.CharField(max_length=128)),
+                ('address', models.CharField(max_length=128)),
+                ('total', models.DecimalField(decimal_places=0, max_digits=128)),
+                ('total_usd', models.FloatField(null=True)),
+                ('bounties', models.IntegerField()),
+                ('fulfillments', models.IntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['kind', 'platform', '-total_usd', '-total', 'address'], name='leaderboard_rank'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='leaderboardentry',
+            unique_together=set([('kind', 'platform', 'address')]),
+        ),
+        migrations.RunSQL(
+            [BACKFILL_ISSUERS, BACKFILL_FULFILLERS],
+            migrations.RunSQL.noop
+        ),
+    ]
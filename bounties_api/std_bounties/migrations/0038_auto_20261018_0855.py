@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 08:55
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('std_bounties', '0037_auto_20261018_0815'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bountystate',
+            index=models.Index(fields=['change_date'], name='bounty_state_change_date'),
+        ),
+        migrations.AddIndex(
+            model_name='fulfillment',
+            index=models.Index(fields=['modified'], name='fulfillment_modified'),
+        ),
+        migrations.AddIndex(
+            model_name='fulfillment',
+            index=models.Index(fields=['fulfillment_created'], name='fulfillment_created'),
+        ),
+        migrations.AddIndex(
+            model_name='fulfillment',
+            index=models.Index(fields=['accepted_date'], name='fulfillment_accepted_date_any'),
+        ),
+    ]
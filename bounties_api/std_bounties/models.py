@@ -1,14 +1,19 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import copy
 import uuid
 import json
-from django.db import models
+from contextlib import contextmanager
+from datetime import datetime
+from django.db import connection, models
+from django.db.models import Q
 from django.core.validators import MaxValueValidator, MinValueValidator
 from user.models import User
+from user.resolver import resolve_user
 from std_bounties.constants import STAGE_CHOICES, CONTRACT_VERSION_CHOICES, STANDARD_BOUNTIES_V1, DIFFICULTY_CHOICES, \
-    DRAFT_STAGE, EXPIRED_STAGE, ACTIVE_STAGE, TOKEN_CHOICES
-from django.core.exceptions import ObjectDoesNotExist
+    DRAFT_STAGE, EXPIRED_STAGE, ACTIVE_STAGE, TOKEN_CHOICES, TOKEN_ABI_CHOICES, LEADERBOARD_CHOICES
+from bounties.tagging import TagSet
 from bounties.utils import calculate_token_value
 from django.contrib.postgres.fields import JSONField, ArrayField
 
@@ -35,6 +40,9 @@ class Category(models.Model):
         super(Category, self).save(*args, **kwargs)
 
 
+category_tags = TagSet(Category)
+
+
 class Comment(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     modified = models.DateTimeField(auto_now=True)
@@ -48,32 +56,89 @@ class Token(models.Model):
     symbol = models.CharField(max_length=128)
     price_usd = models.FloatField(default=0, null=True)
 
+    class Meta:
+        unique_together = ('normalized_name', 'name', 'symbol')
+
+
+class TokenPrice(models.Model):
+    """A token's price each time get_token_values ran, so past prices can be looked up locally"""
+
+    symbol = models.CharField(max_length=128)
+    time = models.DateTimeField()
+    price_usd = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['symbol', 'time']),
+        ]
+
+
+class TokenContract(models.Model):
+    address = models.CharField(max_length=42, unique=True)
+    symbol = models.CharField(max_length=128)
+    decimals = models.IntegerField()
+    abi = models.CharField(max_length=32, choices=TOKEN_ABI_CHOICES)
+
+
+class HistoricPrice(models.Model):
+    symbol = models.CharField(max_length=128)
+    date = models.DateField()
+    # null when no historic price is known for the token
+    price_usd = models.FloatField(null=True)
+
+    class Meta:
+        unique_together = ('symbol', 'date')
+
 
 class BountyState(models.Model):
     bounty = models.ForeignKey('Bounty')
     bounty_stage = models.IntegerField(null=False)
     change_date = models.DateTimeField(null=False)
 
-    def save(self, *args, **kwargs):
-        # Until we have a better event system, this logic is needed for when we resync to the
-        # blockchain. Since expired is mutable, we need to make sure it was applied after the
-        # other events - see track_bounty_expirations
-        queryset = BountyState.objects.filter(bounty=self.bounty)
-        if queryset.exists():
-            last_record = queryset.latest()
-            last_stage = last_record.bounty_stage
-            if last_stage == EXPIRED_STAGE and self.change_date < last_record.change_date:
-                last_record.delete()
-            if last_stage == ACTIVE_STAGE and self.bounty.deadline < self.change_date:
-                BountyState.objects.create(
-                    bounty=self.bounty,
-                    bounty_stage=EXPIRED_STAGE,
-                    change_date=self.bounty.deadline
-                )
-        super(BountyState, self).save(*args, **kwargs)
-
     class Meta:
         get_latest_by = 'change_date'
+        indexes = [
+            models.Index(fields=['change_date'], name='bounty_state_change_date'),
+        ]
+
+
+def refresh_latest_bounty_states(bounty_ids=None):
+    """Recompute Bounty.latest_state_* from the BountyState history, for some or all bounties"""
+
+    sql = '''
+        UPDATE std_bounties_bounty bounty
+        SET latest_state_stage = state.bounty_stage, latest_state_date = state.change_date
+        FROM (
+            SELECT DISTINCT ON (bounty_id) bounty_id, bounty_stage, change_date
+            FROM std_bounties_bountystate
+            {}
+            ORDER BY bounty_id, change_date DESC, id DESC
+        ) state
+        WHERE bounty.id = state.bounty_id
+    '''
+    with connection.cursor() as cursor:
+        if bounty_ids is None:
+            cursor.execute(sql.format(''))
+        else:
+            cursor.execute(sql.format('WHERE bounty_id = ANY(%s)'), [list(bounty_ids)])
+
+
+def record_bounty_states(states):
+    """
+    Bulk form of Bounty.record_bounty_state for replays and backfills, which write a known history.
+    The history is appended as given, without the expiry reordering of record_bounty_state.
+
+    @param states (bounty id, bounty_stage, change_date) tuples
+    @return the created BountyStates
+    """
+
+    created = BountyState.objects.bulk_create([
+        BountyState(bounty_id=bounty_id, bounty_stage=bounty_stage, change_date=change_date)
+        for bounty_id, bounty_stage, change_date in states
+    ])
+    if created:
+        refresh_latest_bounty_states({state.bounty_id for state in created})
+    return created
 
 
 class BountyAbstract(models.Model):
@@ -131,6 +196,12 @@ class BountyAbstract(models.Model):
         abstract = True
 
 
+def stored_value(value):
+    """A copy of a loaded field value that a later in place change to the field doesn't alter"""
+
+    return copy.copy(value) if isinstance(value, (dict, list)) else value
+
+
 class Bounty(BountyAbstract):
     # legacy fields
     issuer = models.CharField(max_length=128)
@@ -176,19 +247,81 @@ class Bounty(BountyAbstract):
     raw_ipfs_data = JSONField(null=True)
     raw_event_data = JSONField(null=True)
 
+    # The newest BountyState, kept here so recording a stage change doesn't have to look it up
+    latest_state_stage = models.IntegerField(choices=STAGE_CHOICES, null=True)
+    latest_state_date = models.DateTimeField(null=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Bounty, cls).from_db(db, field_names, values)
+        instance._stored_values = {
+            attname: stored_value(instance.__dict__[attname]) for attname in field_names if attname in instance.__dict__
+        }
+        return instance
+
+    def mark_clean(self, fields=None):
+        """
+        Remember the current field values as the ones stored in the database. Values are kept by
+        reference and JSON values are copied one level deep, so a change nested further inside
+        one of them is only saved once the field is assigned again.
+        """
+
+        if not hasattr(self, '_stored_values'):
+            self._stored_values = {}
+        for field in self._meta.concrete_fields:
+            # deferred fields aren't loaded
+            if field.attname not in self.__dict__:
+                continue
+            if fields is None or field.name in fields or field.attname in fields:
+                self._stored_values[field.attname] = stored_value(self.__dict__[field.attname])
+
+    def dirty_fields(self):
+        stored = getattr(self, '_stored_values', {})
+        deferred = self.get_deferred_fields()
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname not in deferred and (
+                field.attname not in stored or stored[field.attname] != getattr(self, field.attname)
+            )
+        ]
+
+    @contextmanager
+    def coalesced_saves(self):
+        """
+        Within this block save() only marks the bounty as changed, and the changed fields are
+        written with a single UPDATE when the block exits cleanly.
+        """
+
+        self._save_depth = getattr(self, '_save_depth', 0) + 1
+        try:
+            yield self
+        finally:
+            self._save_depth -= 1
+
+        if self._save_depth == 0 and getattr(self, '_save_pending', False):
+            self._save_pending = False
+            self.save()
+
     def save(self, *args, **kwargs):
+        if getattr(self, '_save_depth', 0):
+            self._save_pending = True
+            return
+
         fulfillment_amount = self.fulfillment_amount
         balance = self.balance
         decimals = self.token_decimals
         self.calculated_balance = calculate_token_value(balance, decimals)
         self.calculated_fulfillment_amount = calculate_token_value(fulfillment_amount, decimals)
 
+        updating = self.pk is not None and not self._state.adding and not args and not kwargs
+        dirty = self.dirty_fields() if updating else None
+
         issuers = json.loads(self.contract_state or '{}').get('issuers', None)
 
-        if issuers:
+        if issuers and (not updating or self.user_id is None or 'contract_state' in dirty):
             issuer = next((address for address, index in issuers.items() if index == 0), None)
-            user, created = User.objects.get_or_create(
-                public_address=issuer.lower(),
+            user, created = resolve_user(
+                issuer.lower(),
                 defaults={
                     'name': self.issuer_name,
                     'email': self.issuer_email,
@@ -198,32 +331,72 @@ class Bounty(BountyAbstract):
             self.user = user
             self.issuer = issuer
 
+        if updating:
+            # Only write what changed since the bounty was loaded or last saved
+            dirty = self.dirty_fields()
+            if not dirty:
+                return
+            kwargs['update_fields'] = dirty + [
+                field.name for field in self._meta.concrete_fields if getattr(field, 'auto_now', False)
+            ]
+
         super(Bounty, self).save(*args, **kwargs)
+        self.mark_clean()
 
     def record_bounty_state(self, event_date):
-        """Makes sure no duplicates are created"""
-        # Need to make this a post_event signal. The only problem is we need a better event system
-        # since this call requires an event_date
-        return BountyState.objects.get_or_create(
-            bounty=self, bounty_stage=self.bounty_stage, change_date=event_date)
+        """
+        Append the bounty's current stage to its history, unless that exact state is already there.
+        Returns (state, created) like get_or_create.
+        """
+        stage = self.bounty_stage
+        latest_stage, latest_date = self.latest_state_stage, self.latest_state_date
+
+        # Events normally arrive in order, so only an older date can be a duplicate
+        if latest_date is not None and event_date <= latest_date:
+            existing = BountyState.objects.filter(bounty=self, bounty_stage=stage, change_date=event_date).first()
+            if existing:
+                return existing, False
+
+        # Until we have a better event system, this logic is needed for when we resync to the
+        # blockchain. Since expired is mutable, we need to make sure it was applied after the
+        # other events - see track_bounty_expirations
+        rewound = False
+        states = []
+        if latest_stage == EXPIRED_STAGE and event_date < latest_date:
+            BountyState.objects.filter(bounty=self, bounty_stage=EXPIRED_STAGE, change_date=latest_date).delete()
+            rewound = True
+        if latest_stage == ACTIVE_STAGE and self.deadline < event_date:
+            states.append(BountyState(bounty=self, bounty_stage=EXPIRED_STAGE, change_date=self.deadline))
+        state = BountyState(bounty=self, bounty_stage=stage, change_date=event_date)
+        states.append(state)
+        BountyState.objects.bulk_create(states)
+
+        if rewound:
+            refresh_latest_bounty_states([self.pk])
+            self.refresh_from_db(fields=['latest_state_stage', 'latest_state_date'])
+            self.mark_clean(['latest_state_stage', 'latest_state_date'])
+        elif latest_date is None or event_date >= latest_date:
+            self.latest_state_stage = stage
+            self.latest_state_date = event_date
+            self.mark_clean(['latest_state_stage', 'latest_state_date'])
+            Bounty.objects.filter(
+                Q(latest_state_date__isnull=True) | Q(latest_state_date__lte=event_date),
+                pk=self.pk,
+            ).update(latest_state_stage=stage, latest_state_date=event_date)
+
+        return state, True
 
     def save_and_clear_categories(self, categories):
-        # this is really messy, but this is bc of psql django bugs
-        self.categories.clear()
-        if isinstance(categories, list):
-            for category in categories:
-                if isinstance(category, str):
-                    try:
-                        if category != '':
-                            matching_category = Category.objects.get(
-                                name=category.strip())
-                            self.categories.add(matching_category)
-                    except ObjectDoesNotExist:
-                        self.categories.create(name=category.strip())
+        category_tags.sync(self.categories, categories)
 
     class Meta:
         indexes = [
             models.Index(fields=['bounty_id', 'contract_version']),
+            # the expiry scheduler looks up active bounties by deadline
+            models.Index(fields=['bounty_stage', 'deadline']),
+            # the explorer lists a platform's bounties in a stage, newest first
+            models.Index(fields=['platform', 'bounty_stage', '-bounty_created'], name='bounty_platform_stage_created'),
+            models.Index(fields=['issuer'], name='bounty_issuer'),
         ]
 
 
@@ -281,9 +454,20 @@ class Fulfillment(models.Model):
     data_json = JSONField(null=True)
     fulfillers = ArrayField(models.CharField(max_length=128), null=True)
 
+    # Partial indexes on accepted fulfillments, which Django can't declare, are created in
+    # migration 0036
+    class Meta:
+        indexes = [
+            models.Index(fields=['fulfiller'], name='fulfillment_fulfiller'),
+            # the incremental timeline update looks for what changed, and was active, since a date
+            models.Index(fields=['modified'], name='fulfillment_modified'),
+            models.Index(fields=['fulfillment_created'], name='fulfillment_created'),
+            models.Index(fields=['accepted_date'], name='fulfillment_accepted_date_any'),
+        ]
+
     def save(self, *args, **kwargs):
-        user, created = User.objects.get_or_create(
-            public_address=self.fulfiller,
+        user, created = resolve_user(
+            self.fulfiller,
             defaults={
                 'name': self.fulfiller_name,
                 'email': self.fulfiller_email,
@@ -291,9 +475,12 @@ class Fulfillment(models.Model):
             }
         )
         if not created and not user.profile_touched_manually:
-            user.name = self.fulfiller_name if self.fulfiller_name else user.name
-            user.email = self.fulfiller_email if self.fulfiller_email else user.email
-            user.save()
+            name = self.fulfiller_name if self.fulfiller_name else user.name
+            email = self.fulfiller_email if self.fulfiller_email else user.email
+            if (name, email) != (user.name, user.email):
+                user.name = name
+                user.email = email
+                user.save(update_fields=['name', 'email', 'edited'])
         self.user = user
         super(Fulfillment, self).save(*args, **kwargs)
 
@@ -309,6 +496,26 @@ class RankedCategory(models.Model):
         db_table = 'category_ranks'
 
 
+class LeaderboardEntry(models.Model):
+    # precomputed leaderboard row for an address on a platform (or ALL_PLATFORMS), kept up to
+    # date by std_bounties.leaderboards
+    kind = models.CharField(max_length=16, choices=LEADERBOARD_CHOICES)
+    platform = models.CharField(max_length=128)
+    address = models.CharField(max_length=128)
+    total = models.DecimalField(decimal_places=0, max_digits=128)
+    total_usd = models.FloatField(null=True)
+    # bounties issued or fulfilled, and fulfillments paid or accepted
+    bounties = models.IntegerField()
+    fulfillments = models.IntegerField()
+
+    class Meta:
+        unique_together = (('kind', 'platform', 'address'),)
+        indexes = [
+            # serves a page of a leaderboard in rank order
+            models.Index(fields=['kind', 'platform', '-total_usd', '-total', 'address'], name='leaderboard_rank'),
+        ]
+
+
 class Event(models.Model):
     event = models.CharField(max_length=128)
     bounty = models.ForeignKey(Bounty, null=True)
@@ -347,6 +554,23 @@ class Contribution(models.Model):
         super(Contribution, self).save(*args, **kwargs)
 
 
+class SideEffect(models.Model):
+    # outbox of notification, slack and sns calls, written in the same transaction as the event
+    # that caused them and sent by the dispatch_side_effects command
+    client = models.CharField(max_length=32)
+    method = models.CharField(max_length=128)
+    arguments = JSONField(default=dict)
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.IntegerField(default=0)
+    # null once the dispatcher gives up on it
+    next_attempt = models.DateTimeField(null=True, default=datetime.now)
+    dispatched = models.DateTimeField(null=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        index_together = (('dispatched', 'next_attempt'),)
+
+
 class FulfillerApplication(models.Model):
     ACCEPTED = 'A'
     REJECTED = 'R'
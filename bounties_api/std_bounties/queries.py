@@ -18,7 +18,7 @@ JOIN user_user profile
 ON fulfillment.fulfiller = profile.public_address
 WHERE fulfillment.accepted = true {}
 GROUP BY fulfillment.fulfiller, profile.name, profile.email, profile.github, profile.small_profile_image_url
-ORDER BY total_usd desc, total desc
+ORDER BY total_usd desc, total desc, address
 """
 
 
@@ -40,5 +40,115 @@ JOIN user_user profile
 ON bounty.issuer = profile.public_address
 WHERE fulfillment.accepted = true {}
 GROUP BY bounty.issuer, profile.name, profile.email, profile.github, profile.small_profile_image_url
-ORDER BY total_usd desc, total desc
+ORDER BY total_usd desc, total desc, address
+"""
+
+
+# Fresh leaderboard rows, per address for every platform a fulfillment counts towards (its own,
+# its bounty's, and ALL_PLATFORMS) so a single platform matches the filter on the queries above
+LEADERBOARD_FULFILLER_ENTRIES = """
+SELECT
+	%(kind)s as kind,
+	platform.name as platform,
+	fulfillment.fulfiller as address,
+	SUM(bounty."fulfillment_amount") as total,
+	SUM(fulfillment.usd_price) as total_usd,
+	COUNT(bounty) as bounties,
+	COUNT(fulfillment.id) as fulfillments
+FROM std_bounties_fulfillment fulfillment
+JOIN std_bounties_bounty bounty
+ON fulfillment.bounty_id = bounty.id
+JOIN user_user profile
+ON fulfillment.fulfiller = profile.public_address
+CROSS JOIN LATERAL (
+	SELECT %(all_platforms)s UNION SELECT fulfillment.platform UNION SELECT bounty.platform
+) platform(name)
+WHERE fulfillment.accepted = true AND platform.name <> '' {}
+GROUP BY platform.name, fulfillment.fulfiller
+"""
+
+
+LEADERBOARD_ISSUER_ENTRIES = """
+SELECT
+	%(kind)s as kind,
+	platform.name as platform,
+	bounty.issuer as address,
+	SUM(bounty."fulfillment_amount") as total,
+	SUM(fulfillment.usd_price) as total_usd,
+	COUNT(distinct(bounty.id)) as bounties,
+	COUNT(fulfillment) as fulfillments
+FROM std_bounties_fulfillment fulfillment
+JOIN std_bounties_bounty bounty
+ON fulfillment.bounty_id = bounty.id
+JOIN user_user profile
+ON bounty.issuer = profile.public_address
+CROSS JOIN LATERAL (
+	SELECT %(all_platforms)s UNION SELECT fulfillment.platform UNION SELECT bounty.platform
+) platform(name)
+WHERE fulfillment.accepted = true AND platform.name <> '' {}
+GROUP BY platform.name, bounty.issuer
+"""
+
+
+# Upserts the fresh rows and deletes the ones that no longer have any accepted fulfillments,
+# in one statement. The delete sees the table as it was before the upsert.
+# Refreshes of the same addresses wait on each other, so a row is recomputed from a snapshot that
+# already holds the other transaction's changes. Taken in address order so two refreshes can't deadlock.
+LEADERBOARD_LOCK_ADDRESSES = """
+SELECT pg_advisory_xact_lock(hashtext(%(kind)s), hashtext(address))
+FROM unnest(%(addresses)s::varchar[]) address
+"""
+
+
+LEADERBOARD_REFRESH = """
+WITH fresh AS ({entries}),
+upserted AS (
+	INSERT INTO std_bounties_leaderboardentry (kind, platform, address, total, total_usd, bounties, fulfillments)
+	SELECT * FROM fresh
+	ON CONFLICT (kind, platform, address) DO UPDATE SET
+		total = EXCLUDED.total,
+		total_usd = EXCLUDED.total_usd,
+		bounties = EXCLUDED.bounties,
+		fulfillments = EXCLUDED.fulfillments
+	RETURNING id
+)
+DELETE FROM std_bounties_leaderboardentry entry
+WHERE entry.kind = %(kind)s {condition} AND entry.id NOT IN (SELECT id FROM upserted)
+"""
+
+
+LEADERBOARD_PAGE = """
+SELECT
+	entry.address as address,
+	profile.name as name,
+	profile.email as email,
+	profile.github as githubUsername,
+	profile.small_profile_image_url as profile_image,
+	entry.total as total,
+	entry.total_usd as total_usd,
+	entry.bounties as {bounties},
+	entry.fulfillments as {fulfillments}
+FROM std_bounties_leaderboardentry entry
+JOIN user_user profile
+ON entry.address = profile.public_address
+WHERE entry.kind = %s AND entry.platform = %s AND {keyset}
+ORDER BY entry.total_usd desc, entry.total desc, entry.address
+LIMIT %s OFFSET %s
+"""
+
+
+# A page of a live leaderboard query, with the size of the whole leaderboard on every row
+LEADERBOARD_LIVE_PAGE = """
+SELECT * FROM (
+	SELECT leaderboard.*, COUNT(*) OVER() as full_count
+	FROM ({query}) leaderboard
+) leaderboard
+WHERE {keyset}
+ORDER BY total_usd desc, total desc, address
+LIMIT %s OFFSET %s
+"""
+
+
+LEADERBOARD_LIVE_COUNT = """
+SELECT COUNT(*) FROM ({query}) leaderboard
 """
@@ -132,13 +132,13 @@ class BountySerializer(CustomSerializer):
     categories = CategorySerializer(read_only=True, many=True)
     current_market_token_data = TokenSerializer(read_only=True, source='token')
     user = UserSerializer(read_only=True)
-    fulfillment_count = serializers.ReadOnlyField(source='fulfillments.count')
+    fulfillment_count = serializers.SerializerMethodField()
     application_count = serializers.SerializerMethodField()
-    comment_count = serializers.ReadOnlyField(source='comments.count')
+    comment_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Bounty
-        exclude = ('comments',)
+        exclude = ('comments', 'latest_state_stage', 'latest_state_date')
         extra_fields = ['id']
         extra_kwargs = {
             'data_categories': {'write_only': True},
@@ -146,9 +146,23 @@ class BountySerializer(CustomSerializer):
             'data_json': {'write_only': True},
         }
 
+    # BountyViewSet annotates the counts, other callers fall back to a query each
+
+    def get_fulfillment_count(self, obj):
+        if hasattr(obj, 'fulfillment_count'):
+            return obj.fulfillment_count
+        return obj.fulfillments.count()
+
     def get_application_count(self, obj):
+        if hasattr(obj, 'application_count'):
+            return obj.application_count
         return obj.fulfillerapplication_set.count()
 
+    def get_comment_count(self, obj):
+        if hasattr(obj, 'comment_count'):
+            return obj.comment_count
+        return obj.comments.count()
+
     def to_representation(self, instance):
         data = super(BountySerializer, self).to_representation(instance)
 
@@ -159,10 +173,13 @@ class BountySerializer(CustomSerializer):
                 'request' in self.context and
                 self.context['request'].current_user
         ):
-            user_has_applied = FulfillerApplication.objects.filter(
-                bounty=instance.pk,
-                applicant=self.context['request'].current_user.pk
-            ).first()
+            if hasattr(instance, 'current_user_applications'):
+                user_has_applied = next(iter(instance.current_user_applications), None)
+            else:
+                user_has_applied = FulfillerApplication.objects.filter(
+                    bounty=instance.pk,
+                    applicant=self.context['request'].current_user.pk
+                ).first()
 
             data.update({'user_has_applied': not not user_has_applied})
             data.update(
@@ -0,0 +1,120 @@
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import models
+from django.utils.dateparse import parse_datetime
+
+from std_bounties.models import SideEffect
+
+_state = threading.local()
+
+# SideEffectClient name to the client it wraps, used by the dispatcher to make the actual calls
+clients = {}
+
+
+def side_effects_suppressed():
+    return getattr(_state, 'suppressed', False)
+
+
+@contextmanager
+def suppress_side_effects():
+    """Within this block, calls made through a SideEffectClient are dropped"""
+
+    previous = side_effects_suppressed()
+    _state.suppressed = True
+    try:
+        yield
+    finally:
+        _state.suppressed = previous
+
+
+class SideEffectClient:
+    """
+    Wraps a client whose calls only notify the outside world (notifications, slack, sns).
+    Calls are written to the SideEffect outbox, inside whatever transaction is handling the
+    event, and made later by the dispatch_side_effects command.
+
+    Model arguments are stored by reference and loaded again when the call is made, so the
+    clients describe a bounty as it is when the message goes out rather than as it was at the
+    event. While the subscriber keeps up that is moments later, after a backlog it can include
+    later events. A row deleted in the meantime makes the call fail for good.
+    """
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        clients[name] = client
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            if side_effects_suppressed():
+                return None
+            SideEffect.objects.create(**self.side_effect(name, *args, **kwargs))
+
+        return call
+
+    def queue_many(self, method, calls):
+        """
+        Queue many calls of one method with a single insert
+
+        @param method Name of the wrapped client's method
+        @param calls (args, kwargs) for each call
+        """
+        if side_effects_suppressed() or not calls:
+            return []
+        return SideEffect.objects.bulk_create([
+            SideEffect(**self.side_effect(method, *args, **kwargs)) for args, kwargs in calls
+        ])
+
+    def side_effect(self, method, *args, **kwargs):
+        return {
+            'client': self.name,
+            'method': method,
+            'arguments': {'args': encode(list(args)), 'kwargs': encode(kwargs)},
+        }
+
+
+def dispatch(side_effect):
+    client = clients[side_effect.client]
+    arguments = decode(side_effect.arguments)
+    getattr(client, side_effect.method)(*arguments.get('args', []), **arguments.get('kwargs', {}))
+
+
+def encode(value):
+    # models by reference, see SideEffectClient
+    if isinstance(value, models.Model):
+        return {'__model__': value._meta.label, 'pk': value.pk}
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    if isinstance(value, dict):
+        return {key: encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+
+    raise TypeError('Cannot store a {} in the side effect outbox'.format(type(value).__name__))
+
+
+def decode(value):
+    if isinstance(value, dict):
+        if '__model__' in value:
+            return apps.get_model(value['__model__']).objects.get(pk=value['pk'])
+        if '__datetime__' in value:
+            return parse_datetime(value['__datetime__'])
+        if '__decimal__' in value:
+            return Decimal(value['__decimal__'])
+        return {key: decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+
+    return value
@@ -3,10 +3,14 @@ from std_bounties.client_helpers import calculate_token_quantity
 from bounties.utils import bounty_url_for
 from utils.functional_tools import narrower
 
+# seconds, so a call from the side effect dispatcher can't outlast its lease
+SLACK_TIMEOUT = 10
+
 
 def notify_slack(sc, channel, event, msg):
     sc.api_call(
         'chat.postMessage',
+        timeout=SLACK_TIMEOUT,
         channel=channel,
         text='*{}*: {}'.format(event, msg),
         mrkdwn=True
@@ -0,0 +1,157 @@
+import queue
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from bounties.redis_client import redis_client
+from std_bounties.event_deduplication import CLAIMED_ELSEWHERE, PENDING_BLACKLIST, PROCESSED, claim_event, \
+    claim_events, claim_key, complete_events, dedup_shard_key
+from std_bounties.management.commands.bounties_subscriber import Command, partition_worker
+from std_bounties.message import Message
+from std_bounties.models import Bounty
+from user.models import Settings, User
+from user.resolver import resolve_user, user_identity_map
+
+ADDRESS = '0xsubscriberrollback'
+# far past the chain head, so the dedup shard only ever holds these tests' events
+BLOCK_NUMBER = 10 ** 12
+SUBSCRIBER = 'std_bounties.management.commands.bounties_subscriber'
+
+
+def batch_message(name, bounty_id):
+    return Message(
+        receipt_handle=name, event='BountyIssued', bounty_id=bounty_id, fulfillment_id=-1,
+        message_deduplication_id='0xsubscriber{}'.format(name), transaction_from='0xsubscriber',
+        transaction_hash='0xsubscriber', event_timestamp='1546300800', event_date=datetime(2019, 1, 1),
+        block_number=BLOCK_NUMBER, contract_method_inputs={}, contract_event_data={}, contract_version=1,
+    )
+
+
+class TestHandleMessage(unittest.TestCase):
+    def tearDown(self):
+        users = User.objects.filter(public_address=ADDRESS)
+        settings = list(users.values_list('settings_id', flat=True))
+        users.delete()
+        Settings.objects.filter(pk__in=settings).delete()
+
+    def message(self):
+        return Message(
+            receipt_handle='', event='BountyIssued', bounty_id=9400, fulfillment_id=-1,
+            message_deduplication_id='0xrollbackBountyIssued', transaction_from=ADDRESS, transaction_hash='0xrollback',
+            event_timestamp='1546300800', event_date=datetime(2019, 1, 1), contract_method_inputs={},
+            contract_event_data={}, contract_version=1,
+        )
+
+    def test_rolled_back_event_leaves_no_users_in_the_batch(self):
+        subscriber = Command()
+        with user_identity_map() as identity_map:
+            # the user is created, then the event fails on the missing bounty and rolls back
+            with mock.patch.object(subscriber, 'notify_master_client', lambda message: resolve_user(ADDRESS)):
+                with self.assertRaises(Bounty.DoesNotExist):
+                    subscriber.handle_message(self.message())
+
+            self.assertNotIn(ADDRESS, identity_map)
+            self.assertFalse(User.objects.filter(public_address=ADDRESS).exists())
+
+            # a later event of the batch creates the user again instead of reusing the rolled back one
+            user, created = resolve_user(ADDRESS)
+            self.assertTrue(created)
+            self.assertTrue(User.objects.filter(pk=user.pk).exists())
+
+
+class TestConsumeBatches(unittest.TestCase):
+    def setUp(self):
+        self.handled, self.pending, self.skipped = batch_message('handled', 9401), batch_message('failing', 9402), \
+            batch_message('skipped', 9402)
+        self.elsewhere, self.processed = batch_message('elsewhere', 9401), batch_message('processed', 9403)
+        self.messages = [self.handled, self.pending, self.elsewhere, self.skipped, self.processed]
+
+        self.sqs_patcher = mock.patch('{}.sqs_client'.format(SUBSCRIBER))
+        self.sqs_client = self.sqs_patcher.start()
+        self.sqs_client.receive_message.side_effect = [{'Messages': self.messages}, KeyboardInterrupt]
+        self.sqs_client.delete_message_batch.return_value = {}
+        # the events are already messages
+        self.from_event_patcher = mock.patch.object(Message, 'from_event', lambda event: event)
+        self.from_event_patcher.start()
+        # kept apart from the real index, which these block numbers would prune
+        self.index_patcher = mock.patch('std_bounties.event_deduplication.DEDUP_SHARD_INDEX', 'test:dedup:shards')
+        self.index_patcher.start()
+
+    def tearDown(self):
+        self.sqs_patcher.stop()
+        self.from_event_patcher.stop()
+        self.index_patcher.stop()
+        redis_client.delete(
+            dedup_shard_key(BLOCK_NUMBER), 'pending_blacklist:9402', 'test:dedup:shards',
+            *[claim_key(message) for message in self.messages])
+
+    def handle_message(self, message):
+        if message is self.pending:
+            raise ValueError('faulty data hash')
+
+    def test_batch_outcomes(self):
+        complete_events([self.processed])
+        claim_event(self.elsewhere)
+
+        subscriber = Command()
+        subscriber.prefetch = mock.Mock()
+        subscriber.handle_message = mock.Mock(side_effect=self.handle_message)
+        with self.assertRaises(KeyboardInterrupt):
+            subscriber.consume_batches()
+
+        # the bounty is blacklisted part way through, so its later event isn't handled
+        self.assertEqual(subscriber.handle_message.call_args_list, [mock.call(self.handled), mock.call(self.pending)])
+        self.assertEqual(
+            [message.decode('UTF-8') for message in redis_client.lrange('pending_blacklist:9402', 0, -1)],
+            [str(self.pending), str(self.skipped)])
+
+        # everything but the event another consumer holds is done with
+        self.assertEqual(
+            [entry['ReceiptHandle'] for entry in self.sqs_client.delete_message_batch.call_args[1]['Entries']],
+            ['handled', 'failing', 'skipped', 'processed'])
+        self.assertEqual(claim_events(self.messages), [PROCESSED] * 2 + [CLAIMED_ELSEWHERE] + [PROCESSED] * 2)
+
+
+class TestPartitions(unittest.TestCase):
+    def test_events_of_a_bounty_go_to_the_same_worker(self):
+        messages = [batch_message(str(index), bounty_id) for index, bounty_id in enumerate([9411, 9412, 9413, 9411, 9414])]
+        workers = [(mock.Mock(), queue.Queue()) for _ in range(3)]
+
+        subscriber = Command()
+        subscriber.prefetch = mock.Mock()
+        subscriber.start_worker = mock.Mock(side_effect=workers)
+        subscriber.collect_results = mock.Mock(return_value=messages)
+        subscriber.remove_batch_from_queue = mock.Mock()
+        with mock.patch('{}.sqs_client'.format(SUBSCRIBER)) as sqs_client, \
+                mock.patch('{}.connections'.format(SUBSCRIBER)), mock.patch('signal.signal'), \
+                mock.patch.object(Message, 'from_event', lambda event: event):
+            sqs_client.receive_message.side_effect = [{'Messages': messages}, KeyboardInterrupt]
+            with self.assertRaises(KeyboardInterrupt):
+                subscriber.consume_partitioned(3)
+
+        routed = [list(iter(tasks.get_nowait, None)) for _, tasks in workers]
+        self.assertEqual(routed, [[messages[0], messages[3], messages[4]], [messages[1]], [messages[2]]])
+        subscriber.remove_batch_from_queue.assert_called_once_with(messages)
+        for process, _ in workers:
+            process.join.assert_called_once_with()
+
+    def test_worker_reports_each_event(self):
+        handled, elsewhere, failing = [batch_message(name, 9420) for name in ['handled', 'elsewhere', 'failing']]
+        outcomes = {'handled': PROCESSED, 'elsewhere': CLAIMED_ELSEWHERE}
+
+        def process_message(self, message):
+            if message is failing:
+                raise ValueError('redis is down')
+            return outcomes[message.receipt_handle]
+
+        tasks, results = queue.Queue(), queue.Queue()
+        for message in [handled, elsewhere, failing, None]:
+            tasks.put(message)
+        with mock.patch.object(Command, 'process_message', process_message), mock.patch('signal.signal'), \
+                mock.patch('{}.complete_events'.format(SUBSCRIBER)) as complete:
+            partition_worker(tasks, results)
+
+        # only events that were handled or skipped are completed and left to be deleted
+        complete.assert_called_once_with([handled])
+        self.assertEqual(
+            [results.get_nowait() for _ in range(3)], [('handled', True), ('elsewhere', False), ('failing', False)])
@@ -0,0 +1,76 @@
+import unittest
+from datetime import datetime
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from std_bounties.constants import ACTIVE_STAGE
+from std_bounties.models import Bounty
+
+
+class TestBountySave(unittest.TestCase):
+    def setUp(self):
+        Bounty.objects.create(
+            bounty_id=9002,
+            bounty_stage=ACTIVE_STAGE,
+            deadline=datetime(2019, 6, 1),
+            fulfillment_amount=1,
+            token_decimals=18,
+        )
+        self.bounty = Bounty.objects.get(bounty_id=9002)
+
+    def tearDown(self):
+        self.bounty.delete()
+
+    def test_unchanged_bounty_is_not_written(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.bounty.save()
+        self.assertEqual(len(queries), 0)
+
+    def test_only_dirty_fields_are_written(self):
+        self.bounty.title = 'Changed'
+        Bounty.objects.filter(pk=self.bounty.pk).update(description='Written elsewhere')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.bounty.save()
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"title"', queries[0]['sql'])
+        self.assertNotIn('"description"', queries[0]['sql'])
+        self.assertEqual(Bounty.objects.get(pk=self.bounty.pk).description, 'Written elsewhere')
+
+    def test_coalesced_saves(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.bounty.coalesced_saves():
+                self.bounty.title = 'Changed'
+                self.bounty.save()
+                self.bounty.balance = 10 ** 18
+                self.bounty.save()
+
+        self.assertEqual(len(queries), 1)
+        stored = Bounty.objects.get(pk=self.bounty.pk)
+        self.assertEqual(stored.title, 'Changed')
+        self.assertEqual(stored.calculated_balance, 1)
+        self.assertEqual(self.bounty.dirty_fields(), [])
+
+    def test_json_changes_are_written(self):
+        Bounty.objects.filter(pk=self.bounty.pk).update(data_categories=['design'], data_issuer={'name': 'Issuer'})
+        bounty = Bounty.objects.get(pk=self.bounty.pk)
+
+        bounty.data_categories.append('code')
+        bounty.data_issuer = dict(bounty.data_issuer, email='issuer@bounties.network')
+        self.assertEqual(sorted(bounty.dirty_fields()), ['data_categories', 'data_issuer'])
+
+        bounty.save()
+        stored = Bounty.objects.get(pk=self.bounty.pk)
+        self.assertEqual(stored.data_categories, ['design', 'code'])
+        self.assertEqual(stored.data_issuer, {'name': 'Issuer', 'email': 'issuer@bounties.network'})
+
+    def test_deferred_fields_are_not_written(self):
+        bounty = Bounty.objects.defer('description').get(pk=self.bounty.pk)
+        Bounty.objects.filter(pk=self.bounty.pk).update(description='Written elsewhere')
+
+        bounty.title = 'Changed'
+        self.assertEqual(bounty.dirty_fields(), ['title'])
+        bounty.save()
+        self.assertEqual(Bounty.objects.get(pk=self.bounty.pk).description, 'Written elsewhere')
@@ -0,0 +1,82 @@
+import unittest
+from datetime import datetime
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from std_bounties.constants import ACTIVE_STAGE, COMPLETED_STAGE, DEAD_STAGE, EXPIRED_STAGE
+from std_bounties.models import Bounty, BountyState, record_bounty_states, refresh_latest_bounty_states
+
+
+class TestBountyState(unittest.TestCase):
+    def setUp(self):
+        self.bounty = Bounty.objects.create(
+            bounty_id=9001,
+            bounty_stage=DEAD_STAGE,
+            deadline=datetime(2019, 6, 1),
+            fulfillment_amount=1,
+        )
+
+    def tearDown(self):
+        BountyState.objects.filter(bounty=self.bounty).delete()
+        self.bounty.delete()
+
+    def history(self):
+        return list(BountyState.objects.filter(bounty=self.bounty).order_by('change_date', 'id').values_list('bounty_stage', 'change_date'))
+
+    def record(self, stage, date):
+        self.bounty.bounty_stage = stage
+        return self.bounty.record_bounty_state(date)
+
+    def test_in_order_transition(self):
+        self.record(DEAD_STAGE, datetime(2019, 1, 1))
+
+        with CaptureQueriesContext(connection) as queries:
+            state, created = self.record(ACTIVE_STAGE, datetime(2019, 1, 2))
+
+        self.assertTrue(created)
+        self.assertEqual(len(queries), 2)
+        self.bounty.refresh_from_db()
+        self.assertEqual((self.bounty.latest_state_stage, self.bounty.latest_state_date), (ACTIVE_STAGE, datetime(2019, 1, 2)))
+
+    def test_duplicate_state(self):
+        self.record(ACTIVE_STAGE, datetime(2019, 1, 2))
+        first = self.bounty.latest_state_date
+        self.record(COMPLETED_STAGE, datetime(2019, 1, 3))
+
+        state, created = self.record(ACTIVE_STAGE, first)
+
+        self.assertFalse(created)
+        self.assertEqual(len(self.history()), 2)
+
+    def test_expiry_is_reordered(self):
+        self.record(ACTIVE_STAGE, datetime(2019, 1, 2))
+        # passing the deadline while active adds the expiry first
+        self.record(COMPLETED_STAGE, datetime(2019, 7, 1))
+        self.assertEqual(self.history(), [
+            (ACTIVE_STAGE, datetime(2019, 1, 2)),
+            (EXPIRED_STAGE, datetime(2019, 6, 1)),
+            (COMPLETED_STAGE, datetime(2019, 7, 1)),
+        ])
+
+        # an expiry recorded ahead of an older event is dropped
+        self.record(EXPIRED_STAGE, datetime(2019, 8, 1))
+        self.record(ACTIVE_STAGE, datetime(2019, 7, 15))
+
+        self.bounty.refresh_from_db()
+        self.assertEqual((self.bounty.latest_state_stage, self.bounty.latest_state_date), (ACTIVE_STAGE, datetime(2019, 7, 15)))
+        self.assertNotIn((EXPIRED_STAGE, datetime(2019, 8, 1)), self.history())
+
+    def test_bulk_record_and_refresh(self):
+        record_bounty_states([
+            (self.bounty.pk, ACTIVE_STAGE, datetime(2019, 1, 2)),
+            (self.bounty.pk, COMPLETED_STAGE, datetime(2019, 1, 5)),
+            (self.bounty.pk, DEAD_STAGE, datetime(2019, 1, 4)),
+        ])
+        self.bounty.refresh_from_db()
+        self.assertEqual((self.bounty.latest_state_stage, self.bounty.latest_state_date), (COMPLETED_STAGE, datetime(2019, 1, 5)))
+
+        Bounty.objects.filter(pk=self.bounty.pk).update(latest_state_stage=None, latest_state_date=None)
+        refresh_latest_bounty_states()
+        self.bounty.refresh_from_db()
+        self.assertEqual(self.bounty.latest_state_stage, COMPLETED_STAGE)
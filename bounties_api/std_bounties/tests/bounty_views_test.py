@@ -0,0 +1,84 @@
+import unittest
+from datetime import datetime
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from std_bounties.constants import ACTIVE_STAGE
+from std_bounties.models import Bounty, Category, Comment, FulfillerApplication, Fulfillment
+from user.models import Language, Settings, Skill, User
+
+
+class TestBountyViewSet(unittest.TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name='Query Count')
+        self.skill = Skill.objects.create(name='Query Count')
+        self.language = Language.objects.create(name='Query Count')
+        self.users = []
+        self.bounties = []
+
+    def tearDown(self):
+        for bounty in self.bounties:
+            Fulfillment.objects.filter(bounty=bounty).delete()
+            FulfillerApplication.objects.filter(bounty=bounty).delete()
+            bounty.comments.all().delete()
+            bounty.delete()
+        for user in self.users:
+            settings = user.settings_id
+            user.delete()
+            Settings.objects.filter(pk=settings).delete()
+        self.category.delete()
+        self.skill.delete()
+        self.language.delete()
+
+    def create_bounties(self, count):
+        for index in range(len(self.bounties), len(self.bounties) + count):
+            user = User.objects.create(public_address='0xquerycount{}'.format(index))
+            user.categories.add(self.category)
+            user.skills.add(self.skill)
+            user.languages.add(self.language)
+            self.users.append(user)
+
+            bounty = Bounty.objects.create(
+                bounty_id=9100 + index,
+                bounty_stage=ACTIVE_STAGE,
+                deadline=datetime(2030, 1, 1),
+                user=user,
+                issuer=user.public_address,
+                platform='query-count',
+            )
+            bounty.issuers.add(user)
+            bounty.approvers.add(user)
+            bounty.categories.add(self.category)
+            bounty.comments.add(Comment.objects.create(user=user, text='comment'))
+            FulfillerApplication.objects.create(bounty=bounty, applicant=user, message='application')
+            for fulfillment_id in range(2):
+                Fulfillment.objects.create(
+                    bounty=bounty, fulfillment_id=fulfillment_id, fulfiller=user.public_address, accepted=False, data='')
+            self.bounties.append(bounty)
+
+    def get_page(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/bounty/', {'platform': 'query-count', 'limit': 25})
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_page_query_count_is_fixed(self):
+        self.create_bounties(5)
+        _, five_bounty_queries = self.get_page()
+
+        self.create_bounties(20)
+        page, queries = self.get_page()
+
+        self.assertEqual(len(page['results']), 25)
+        self.assertEqual(queries, five_bounty_queries)
+        # count, page, then categories, issuers, approvers and the user's categories, languages and skills
+        self.assertEqual(queries, 8)
+
+        bounty = page['results'][0]
+        self.assertEqual(bounty['fulfillment_count'], 2)
+        self.assertEqual(bounty['application_count'], 1)
+        self.assertEqual(bounty['comment_count'], 1)
+        self.assertEqual(bounty['user']['skills'], [self.skill.pk])
@@ -1,7 +1,10 @@
 import unittest
+from unittest import mock
+from datetime import date, datetime
 from decimal import Decimal
-from std_bounties.models import Token
-from std_bounties.client_helpers import calculate_token_quantity, calculate_usd_price, get_token_pricing
+from std_bounties.models import Token, HistoricPrice, TokenPrice
+from std_bounties.client_helpers import calculate_token_quantity, calculate_usd_price, get_token_pricing, \
+    get_historic_price, get_historic_pricing, prefetch_historic_prices
 
 
 class TestCalculationHelpers(unittest.TestCase):
@@ -14,6 +17,10 @@ class TestCalculationHelpers(unittest.TestCase):
             price_usd='600')
         cls.eth_token.save()
 
+    def tearDown(self):
+        HistoricPrice.objects.filter(symbol__in=['HST', 'PRE', 'REC', 'ERR', 'UNK']).delete()
+        TokenPrice.objects.filter(symbol='REC').delete()
+
     def test_calculate_token_quantity(self):
         value = '100000'
         decimals = 3
@@ -78,3 +85,90 @@ class TestCalculationHelpers(unittest.TestCase):
                                                    token_decimals, value)
         self.assertEqual(token_model, self.eth_token)
         self.assertEqual(usd_price, expected_usd_price)
+
+    @mock.patch('std_bounties.client_helpers.requests.get')
+    def test_get_historic_pricing_uses_stored_price(self, mocked_get):
+        HistoricPrice.objects.create(symbol='HST', date=date(2019, 1, 2), price_usd=2)
+
+        # 2019-01-02 12:00 UTC
+        usd_price, token_price = get_historic_pricing('HST', 3, 1000, '1546430400')
+        mocked_get.assert_not_called()
+        self.assertEqual(token_price, 2)
+        self.assertEqual(usd_price, Decimal('2'))
+
+    @mock.patch('std_bounties.client_helpers.requests.get')
+    def test_transient_errors_are_not_stored(self, mocked_get):
+        mocked_get.return_value.json.return_value = {'Response': 'Error', 'Message': 'Internal server error'}
+
+        self.assertIsNone(get_historic_price('ERR', '1546430400'))
+        prefetch_historic_prices([('ERR', '1546430400')])
+        self.assertFalse(HistoricPrice.objects.filter(symbol='ERR').exists())
+
+        mocked_get.return_value.json.return_value = {'Response': 'Success', 'ERR': {'USD': 3}}
+        self.assertEqual(get_historic_price('ERR', '1546430400'), 3)
+
+    @mock.patch('std_bounties.client_helpers.requests.get')
+    def test_unknown_tokens_are_stored(self, mocked_get):
+        mocked_get.return_value.json.return_value = {
+            'Response': 'Error', 'Message': 'There is no data for the symbol UNK .'}
+
+        self.assertIsNone(get_historic_price('UNK', '1546430400'))
+        self.assertIsNone(get_historic_price('UNK', '1546430400'))
+        self.assertEqual(mocked_get.call_count, 1)
+        self.assertEqual(HistoricPrice.objects.get(symbol='UNK').price_usd, None)
+
+    @mock.patch('std_bounties.client_helpers.requests.get')
+    def test_prefetch_historic_prices_one_request_per_symbol(self, mocked_get):
+        mocked_get.return_value.json.return_value = {
+            'Response': 'Success',
+            'Data': [
+                {'time': 1546300800, 'close': 1.5},
+                {'time': 1546387200, 'close': 2.5},
+                {'time': 1546473600, 'close': 3.5},
+            ]
+        }
+
+        prefetch_historic_prices([('PRE', '1546344000'), ('PRE', '1546516800'), ('PRE', 1546520000)])
+
+        self.assertEqual(mocked_get.call_count, 1)
+        self.assertEqual(
+            dict(HistoricPrice.objects.filter(symbol='PRE').values_list('date', 'price_usd')),
+            {date(2019, 1, 1): 1.5, date(2019, 1, 3): 3.5}
+        )
+
+    @mock.patch('std_bounties.client_helpers.requests.get')
+    def test_recorded_prices_answer_historic_pricing(self, mocked_get):
+        TokenPrice.objects.create(symbol='REC', time=datetime(2019, 1, 2, 11), price_usd=4)
+
+        # 2019-01-02 12:00 UTC
+        prefetch_historic_prices([('REC', '1546430400')])
+        usd_price, token_price = get_historic_pricing('REC', 3, 1000, '1546430400')
+
+        mocked_get.assert_not_called()
+        self.assertEqual(token_price, 4)
+        self.assertEqual(HistoricPrice.objects.get(symbol='REC').price_usd, 4)
+
+    @mock.patch('std_bounties.client_helpers.requests.get')
+    def test_first_resolved_price_of_a_day_wins(self, mocked_get):
+        # 2019-01-02 12:00 and 14:00 UTC
+        first, later = '1546430400', '1546437600'
+        TokenPrice.objects.create(symbol='REC', time=datetime(2019, 1, 2, 11), price_usd=4)
+        self.assertEqual(get_historic_price('REC', first), 4)
+
+        # a price recorded after the day was resolved doesn't change how its events are priced
+        TokenPrice.objects.create(symbol='REC', time=datetime(2019, 1, 2, 13), price_usd=5)
+        self.assertEqual(get_historic_price('REC', later), 4)
+        prefetch_historic_prices([('REC', later)])
+        self.assertEqual(get_historic_price('REC', later), 4)
+        mocked_get.assert_not_called()
+
+    @mock.patch('std_bounties.client_helpers.requests.get')
+    def test_prefetch_resolves_a_day_from_its_first_event(self, mocked_get):
+        TokenPrice.objects.create(symbol='REC', time=datetime(2019, 1, 2, 11), price_usd=4)
+        TokenPrice.objects.create(symbol='REC', time=datetime(2019, 1, 2, 13), price_usd=5)
+
+        # 2019-01-02 14:00 and 12:00 UTC, prefetched and then handled in either order
+        prefetch_historic_prices([('REC', '1546437600'), ('REC', '1546430400')])
+
+        self.assertEqual(get_historic_price('REC', '1546437600'), 4)
+        mocked_get.assert_not_called()
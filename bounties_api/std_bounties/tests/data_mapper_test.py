@@ -44,6 +44,10 @@ class TestMapBountyData(unittest.TestCase):
         self.mocked_ipfs = self.patcher.start()
         self.mocked_ipfs.cat.return_value = self.get_ipfs_data_as_json()
         self.addCleanup(self.patcher.stop)
+        self.cache_patcher = unittest.mock.patch('std_bounties.client_helpers.ipfs_cache')
+        self.mocked_cache = self.cache_patcher.start()
+        self.mocked_cache.cat.side_effect = lambda ipfs_hash, fetch: fetch(ipfs_hash)
+        self.addCleanup(self.cache_patcher.stop)
 
     def test_map_bounty_data(self):
         data_hash = 'QmTDMoVqvyBkNMRhzvukTDznntByUNDwyNdSfV8dZ3VKRC'
@@ -103,6 +107,10 @@ class TestMapFullfilmentData(unittest.TestCase):
         self.mocked_ipfs = self.patcher.start()
         self.mocked_ipfs.cat.return_value = self.get_ipfs_data_as_json()
         self.addCleanup(self.patcher.stop)
+        self.cache_patcher = unittest.mock.patch('std_bounties.client_helpers.ipfs_cache')
+        self.mocked_cache = self.cache_patcher.start()
+        self.mocked_cache.cat.side_effect = lambda ipfs_hash, fetch: fetch(ipfs_hash)
+        self.addCleanup(self.cache_patcher.stop)
 
     def test_map_fullfilment_data(self):
         data_hash = 'QmTDMoVqvyBkNMRhzvukTDznntByUNDwyNdSfV8dZ3VKRC'
@@ -0,0 +1,129 @@
+import time
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from bounties.redis_client import redis_client
+from std_bounties.event_deduplication import BLACKLISTED, CLAIM_TTL, CLAIMED, CLAIMED_ELSEWHERE, DEDUP_RETAIN_BLOCKS, \
+    DEDUP_SHARD_BLOCKS, LEGACY_DEDUP_TTL, PENDING_BLACKLIST, PROCESSED, claim_event, claim_events, claim_key, \
+    complete_events, dedup_shard_key
+from std_bounties.message import Message
+
+# far past the chain head, so the shard only ever holds these tests' events
+BLOCK_NUMBER = 10 ** 12
+BOUNTY_ID = 9500
+# kept apart from the real index, which the tests' block numbers would prune
+SHARD_INDEX = 'test:dedup:shards'
+
+
+def message(name, bounty_id=BOUNTY_ID, block_number=BLOCK_NUMBER):
+    return Message(
+        receipt_handle=name, event='BountyIssued', bounty_id=bounty_id, fulfillment_id=-1,
+        message_deduplication_id='0xdeduplication{}'.format(name), transaction_from='0xdeduplication',
+        transaction_hash='0xdeduplication', event_timestamp='1546300800', event_date=datetime(2019, 1, 1),
+        block_number=block_number, contract_method_inputs={}, contract_event_data={}, contract_version=1,
+    )
+
+
+class TestEventDeduplication(unittest.TestCase):
+    def setUp(self):
+        self.messages = []
+        self.index_patcher = mock.patch('std_bounties.event_deduplication.DEDUP_SHARD_INDEX', SHARD_INDEX)
+        self.index_patcher.start()
+
+    def tearDown(self):
+        self.index_patcher.stop()
+        keys = [SHARD_INDEX, 'blacklist:{}'.format(BOUNTY_ID), 'pending_blacklist:{}'.format(BOUNTY_ID)]
+        for claimed in self.messages:
+            keys += [claimed.message_deduplication_id, claim_key(claimed), dedup_shard_key(claimed.block_number)]
+        redis_client.delete(*keys)
+
+    def message(self, name, **kwargs):
+        claimed = message(name, **kwargs)
+        self.messages.append(claimed)
+        return claimed
+
+    def test_claims_a_new_event_once(self):
+        event = self.message('new')
+
+        self.assertEqual(claim_event(event), CLAIMED)
+        self.assertEqual(claim_event(event), CLAIMED_ELSEWHERE)
+        self.assertTrue(0 < redis_client.ttl(claim_key(event)) <= CLAIM_TTL)
+
+    def test_claim_expires(self):
+        event = self.message('expired')
+
+        with mock.patch('std_bounties.event_deduplication.CLAIM_TTL', 1):
+            self.assertEqual(claim_event(event), CLAIMED)
+        time.sleep(1.5)
+
+        # the consumer holding it died, so a redelivery can be handled again
+        self.assertEqual(claim_event(event), CLAIMED)
+
+    def test_completed_events_are_processed(self):
+        sharded = self.message('sharded')
+        legacy = self.message('legacy', block_number=-1)
+        self.assertEqual(claim_events([sharded, legacy]), [CLAIMED, CLAIMED])
+
+        complete_events([sharded, legacy])
+
+        shard = dedup_shard_key(BLOCK_NUMBER)
+        self.assertEqual(redis_client.hget(shard, sharded.message_deduplication_id), b'1')
+        self.assertEqual(redis_client.ttl(shard), None)
+        self.assertEqual(redis_client.zrange(SHARD_INDEX, 0, -1), [str(BLOCK_NUMBER // DEDUP_SHARD_BLOCKS).encode()])
+        self.assertEqual(redis_client.get(legacy.message_deduplication_id), b'True')
+        self.assertTrue(0 < redis_client.ttl(legacy.message_deduplication_id) <= LEGACY_DEDUP_TTL)
+        self.assertFalse(redis_client.exists(claim_key(sharded)) or redis_client.exists(claim_key(legacy)))
+        self.assertEqual(claim_events([sharded, legacy]), [PROCESSED, PROCESSED])
+
+    def test_shards_are_dropped_by_block_height(self):
+        old, kept = self.message('old'), self.message('kept', block_number=BLOCK_NUMBER + DEDUP_SHARD_BLOCKS)
+        complete_events([old, kept])
+        # shards written while they still expired by time
+        redis_client.expire(dedup_shard_key(BLOCK_NUMBER), 60)
+
+        # a shard outlives its TTL, and however long it takes the chain to move on
+        complete_events([old])
+        self.assertEqual(redis_client.ttl(dedup_shard_key(BLOCK_NUMBER)), None)
+        self.assertEqual(claim_events([old, kept]), [PROCESSED, PROCESSED])
+
+        # the head moves DEDUP_RETAIN_BLOCKS past the first shard's range, but not past the second's
+        head = self.message('head', block_number=BLOCK_NUMBER + DEDUP_SHARD_BLOCKS + DEDUP_RETAIN_BLOCKS)
+        complete_events([head])
+
+        self.assertFalse(redis_client.exists(dedup_shard_key(BLOCK_NUMBER)))
+        self.assertEqual(claim_events([old, kept, head]), [CLAIMED, PROCESSED, PROCESSED])
+        self.assertEqual(len(redis_client.zrange(SHARD_INDEX, 0, -1)), 2)
+
+    def test_events_processed_before_sharding(self):
+        # processed under the legacy key, then redelivered with a block number
+        event = self.message('unsharded')
+        redis_client.set(event.message_deduplication_id, 'True')
+
+        self.assertEqual(claim_event(event), PROCESSED)
+
+    def test_blacklists(self):
+        event = self.message('blacklisted')
+
+        redis_client.rpush('pending_blacklist:{}'.format(BOUNTY_ID), 'earlier event')
+        self.assertEqual(claim_event(event), PENDING_BLACKLIST)
+
+        # a permanent blacklist wins over a pending one
+        redis_client.set('blacklist:{}'.format(BOUNTY_ID), 'True')
+        self.assertEqual(claim_event(event), BLACKLISTED)
+
+        # neither claimed the event
+        self.assertFalse(redis_client.exists(claim_key(event)))
+
+    def test_claims_a_batch_in_order(self):
+        processed, claimed_elsewhere, new = self.message('processed'), self.message('elsewhere'), self.message('batch')
+        complete_events([processed])
+        claim_event(claimed_elsewhere)
+        other_bounty = self.message('other', bounty_id=BOUNTY_ID + 1)
+        redis_client.rpush('pending_blacklist:{}'.format(BOUNTY_ID), 'earlier event')
+
+        statuses = claim_events([processed, claimed_elsewhere, new, other_bounty])
+
+        # the event claimed before the bounty was blacklisted stays with its consumer
+        self.assertEqual(statuses, [PROCESSED, CLAIMED_ELSEWHERE, PENDING_BLACKLIST, CLAIMED])
+        self.assertEqual(claim_events([]), [])
@@ -0,0 +1,83 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from std_bounties import event_registry
+from std_bounties.constants import STANDARD_BOUNTIES_V1, STANDARD_BOUNTIES_V2
+from std_bounties.message import Message
+
+
+class TestEventRegistry(unittest.TestCase):
+    def message(self, event, contract_version, **kwargs):
+        return Message(
+            event=event,
+            bounty_id=42,
+            contract_version=contract_version,
+            event_date=datetime(2019, 1, 2),
+            event_timestamp='1546387200',
+            message_deduplication_id='0x1' + event,
+            transaction_from='0x2',
+            **kwargs
+        )
+
+    def test_v1_adapter(self):
+        message = self.message('BountyIssued', STANDARD_BOUNTIES_V1, contract_method_inputs={
+            'issuer': '0x3',
+            'data': 'QmQjchBM6tjAvXzkDEpWgLUv9Ui4jwqtxsEzB6LxB2WqFL',
+            'paysTokens': True,
+        }, contract_event_data={})
+
+        [(handler, keywords)] = event_registry.resolve(message)
+
+        self.assertEqual(handler.__name__, 'bounty_issued')
+        self.assertEqual(keywords['bounty_id'], 42)
+        self.assertEqual(keywords['contract_version'], STANDARD_BOUNTIES_V1)
+        self.assertEqual(keywords['uid'], '0x1BountyIssued')
+        self.assertEqual(keywords['issuers'], ['0x3'])
+        self.assertEqual(keywords['token_version'], '20')
+
+    def test_v1_event_with_several_handlers(self):
+        message = self.message('IssuerTransferred', STANDARD_BOUNTIES_V1, contract_method_inputs={},
+                               contract_event_data={'new_issuer': '0x4'})
+
+        calls = event_registry.resolve(message)
+
+        self.assertEqual([handler.__name__ for handler, _ in calls], ['bounty_issuers_updated', 'bounty_approvers_updated'])
+        self.assertEqual(calls[1][1]['approvers'], ['0x4'])
+
+    def test_v1_ignored_and_unknown_events(self):
+        self.assertEqual(event_registry.resolve(self.message('BountyChanged', STANDARD_BOUNTIES_V1)), [])
+        self.assertEqual(event_registry.resolve(self.message('SomethingElse', STANDARD_BOUNTIES_V1)), [])
+
+    def test_v2_event_data(self):
+        message = self.message('BountyApproversUpdated', STANDARD_BOUNTIES_V2, contract_event_data={
+            '_bounty_id': '42',
+            'bounty_id': '42',
+            'changer': '0x2',
+            'approvers': ['0x5'],
+        })
+
+        [(handler, keywords)] = event_registry.resolve(message)
+
+        self.assertEqual(handler.__name__, 'bounty_approvers_updated')
+        self.assertEqual(keywords['bounty_id'], 42)
+        self.assertEqual(keywords['approvers'], ['0x5'])
+        self.assertNotIn('_bounty_id', keywords)
+
+    def test_v2_unknown_event(self):
+        with self.assertRaises(KeyError):
+            event_registry.resolve(self.message('NotAnEvent', STANDARD_BOUNTIES_V2, contract_event_data={}))
+
+    def test_dispatch_calls_handlers(self):
+        handler = mock.Mock()
+        with mock.patch.dict(event_registry.registry, {(STANDARD_BOUNTIES_V2, 'Tested'): [(handler, event_registry.v2_event_data)]}):
+            event_registry.dispatch(self.message('Tested', STANDARD_BOUNTIES_V2, contract_event_data={'changer': '0x2'}))
+
+        handler.assert_called_once_with(
+            bounty_id=42,
+            contract_version=STANDARD_BOUNTIES_V2,
+            event_date=datetime(2019, 1, 2),
+            event_timestamp='1546387200',
+            uid='0x1Tested',
+            changer='0x2',
+        )
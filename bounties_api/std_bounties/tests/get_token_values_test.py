@@ -0,0 +1,45 @@
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from std_bounties.constants import ACTIVE_STAGE, COMPLETED_STAGE
+from std_bounties.management.commands.get_token_values import Command
+from std_bounties.models import Bounty, Token, TokenPrice
+
+COINS = [
+    {'id': 'repricing-coin', 'name': 'Repricing Coin', 'symbol': 'RPC', 'price_usd': '2.5'},
+    {'id': 'unpriced-coin', 'name': 'Unpriced Coin', 'symbol': 'UPC', 'price_usd': None},
+]
+
+
+class TestGetTokenValues(unittest.TestCase):
+    def setUp(self):
+        Token.objects.create(normalized_name='repricing-coin', name='Repricing Coin', symbol='RPC', price_usd=1)
+        self.active = Bounty.objects.create(
+            bounty_id=9003, bounty_stage=ACTIVE_STAGE, deadline=datetime(2019, 6, 1),
+            token_symbol='RPC', token_decimals=2, fulfillment_amount=300)
+        self.completed = Bounty.objects.create(
+            bounty_id=9004, bounty_stage=COMPLETED_STAGE, deadline=datetime(2019, 6, 1),
+            token_symbol='RPC', token_decimals=2, fulfillment_amount=300, usd_price=1)
+
+    def tearDown(self):
+        Bounty.objects.filter(pk__in=[self.active.pk, self.completed.pk]).delete()
+        Token.objects.filter(symbol__in=['RPC', 'UPC']).delete()
+        TokenPrice.objects.filter(symbol__in=['RPC', 'UPC']).delete()
+
+    def test_reprices_in_bulk(self):
+        response = mock.Mock()
+        response.json.return_value = COINS
+        with mock.patch('std_bounties.management.commands.get_token_values.requests.get', return_value=response):
+            Command().handle()
+
+        token = Token.objects.get(symbol='RPC')
+        self.assertEqual(token.price_usd, 2.5)
+        self.assertTrue(Token.objects.filter(symbol='UPC', price_usd=None).exists())
+        self.assertEqual(Token.objects.filter(symbol='RPC').count(), 1)
+        self.assertEqual(list(TokenPrice.objects.filter(symbol__in=['RPC', 'UPC']).values_list('symbol', 'price_usd')), [('RPC', 2.5)])
+
+        active = Bounty.objects.get(pk=self.active.pk)
+        self.assertEqual(active.usd_price, 7.5)
+        self.assertEqual(active.token_id, token.pk)
+        self.assertEqual(Bounty.objects.get(pk=self.completed.pk).usd_price, 1)
@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+
+from std_bounties.ipfs_cache import IPFSCache, MissingContentError
+
+
+class TestIPFSCache(unittest.TestCase):
+    def setUp(self):
+        self.patcher = mock.patch('std_bounties.ipfs_cache.redis_client')
+        self.mocked_redis = self.patcher.start()
+        self.mocked_redis.pipeline.return_value.get.return_value.exists.return_value.execute.return_value = [None, 0]
+        self.addCleanup(self.patcher.stop)
+
+        self.cache = IPFSCache(max_size=2)
+        self.ipfs_hash = 'QmTDMoVqvyBkNMRhzvukTDznntByUNDwyNdSfV8dZ3VKRC'
+
+    def test_fetches_once(self):
+        fetch = mock.Mock(return_value=b'{}')
+
+        self.assertEqual(self.cache.cat(self.ipfs_hash, fetch), b'{}')
+        self.assertEqual(self.cache.cat(self.ipfs_hash, fetch), b'{}')
+        fetch.assert_called_once_with(self.ipfs_hash)
+        self.mocked_redis.set.assert_called_once_with('ipfs:{}'.format(self.ipfs_hash), b'{}', ex=None)
+        self.assertEqual(self.cache.stats['misses'], 1)
+        self.assertEqual(self.cache.stats['local_hits'], 1)
+
+    def test_redis_hit(self):
+        self.mocked_redis.pipeline.return_value.get.return_value.exists.return_value.execute.return_value = [b'{}', 0]
+        fetch = mock.Mock()
+
+        self.assertEqual(self.cache.cat(self.ipfs_hash, fetch), b'{}')
+        fetch.assert_not_called()
+        self.assertEqual(self.cache.stats['redis_hits'], 1)
+
+    def test_failed_fetch_is_remembered(self):
+        fetch = mock.Mock(side_effect=Exception('gateway timeout'))
+
+        with self.assertRaises(Exception):
+            self.cache.cat(self.ipfs_hash, fetch)
+        with self.assertRaises(MissingContentError):
+            self.cache.cat(self.ipfs_hash, fetch)
+        fetch.assert_called_once_with(self.ipfs_hash)
+
+    def test_evicts_least_recently_used(self):
+        for ipfs_hash in ('a', 'b', 'a', 'c'):
+            self.cache.cat(ipfs_hash, lambda ipfs_hash: ipfs_hash.encode())
+
+        self.assertEqual(list(self.cache.local), ['a', 'c'])
+
+    def test_prefetch_fetches_uncached(self):
+        self.mocked_redis.mget.return_value = [b'cached', None]
+        self.cache.cat('a', lambda ipfs_hash: b'local')
+        fetch = mock.Mock(return_value=b'fetched')
+
+        self.cache.prefetch(['a', 'b', 'c', 'c'], fetch)
+
+        self.mocked_redis.mget.assert_called_once_with(['ipfs:b', 'ipfs:c'])
+        fetch.assert_called_once_with('c')
+        self.assertEqual(self.cache.cat('b', fetch), b'cached')
+        self.assertEqual(self.cache.cat('c', fetch), b'fetched')
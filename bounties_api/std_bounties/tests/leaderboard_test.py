@@ -0,0 +1,178 @@
+import json
+import threading
+import time
+import unittest
+from datetime import datetime
+
+from django.db import connection, transaction
+from rest_framework.test import APIClient
+
+from bounties.utils import dictfetchall
+from std_bounties.constants import ALL_PLATFORMS, COMPLETED_STAGE, FULFILLER_LEADERBOARD, ISSUER_LEADERBOARD
+from std_bounties.leaderboards import leaderboard_rows, refresh_bounty_leaderboards, refresh_leaderboard, \
+    refresh_leaderboards
+from std_bounties.models import Bounty, Fulfillment, LeaderboardEntry
+from std_bounties.queries import LEADERBOARD_FULFILLER_QUERY, LEADERBOARD_ISSUER_QUERY
+from user.models import Settings, User
+
+ISSUER = '0xleaderboardissuer'
+FULFILLER = '0xleaderboardfulfiller'
+OTHER_FULFILLER = '0xleaderboardotherfulfiller'
+ADDRESSES = [ISSUER, FULFILLER, OTHER_FULFILLER]
+
+
+class TestLeaderboards(unittest.TestCase):
+    def setUp(self):
+        issuer = User.objects.create(public_address=ISSUER, name='Issuer')
+        self.first = Bounty.objects.create(
+            bounty_id=9200, bounty_stage=COMPLETED_STAGE, deadline=datetime(2019, 1, 1),
+            user=issuer, issuer=ISSUER, platform='leaderboard-a', fulfillment_amount=100)
+        self.second = Bounty.objects.create(
+            bounty_id=9201, bounty_stage=COMPLETED_STAGE, deadline=datetime(2019, 1, 1),
+            user=issuer, issuer=ISSUER, platform='leaderboard-b', fulfillment_amount=300)
+
+        self.fulfill(self.first, 0, FULFILLER, 'leaderboard-a', 10)
+        # counts towards both platforms
+        self.fulfill(self.second, 0, FULFILLER, 'leaderboard-a', 30)
+        self.fulfill(self.second, 1, OTHER_FULFILLER, 'leaderboard-b', 5)
+        self.pending = self.fulfill(self.first, 1, OTHER_FULFILLER, 'leaderboard-a', None, accepted=False)
+
+    def tearDown(self):
+        LeaderboardEntry.objects.filter(address__in=ADDRESSES).delete()
+        Fulfillment.objects.filter(bounty__in=[self.first, self.second]).delete()
+        self.first.delete()
+        self.second.delete()
+        for user in User.objects.filter(public_address__in=ADDRESSES):
+            settings = user.settings_id
+            user.delete()
+            Settings.objects.filter(pk=settings).delete()
+
+    def fulfill(self, bounty, fulfillment_id, fulfiller, platform, usd_price, accepted=True):
+        return Fulfillment.objects.create(
+            bounty=bounty, fulfillment_id=fulfillment_id, fulfiller=fulfiller, platform=platform,
+            accepted=accepted, usd_price=usd_price, data='')
+
+    def live(self, query, platform):
+        condition, params = '', []
+        if platform != ALL_PLATFORMS:
+            condition, params = 'AND (fulfillment.platform = %s OR bounty.platform = %s)', [platform, platform]
+        with connection.cursor() as cursor:
+            cursor.execute(query.format(condition), params)
+            return [row for row in dictfetchall(cursor) if row['address'] in ADDRESSES]
+
+    def precomputed(self, kind, platform):
+        rows = leaderboard_rows(kind, [] if platform == ALL_PLATFORMS else [platform])
+        next(rows)
+        return [row for row in rows if row['address'] in ADDRESSES]
+
+    def assertMatchesLiveQueries(self):
+        for platform in [ALL_PLATFORMS, 'leaderboard-a', 'leaderboard-b']:
+            self.assertEqual(
+                self.precomputed(ISSUER_LEADERBOARD, platform), self.live(LEADERBOARD_ISSUER_QUERY, platform))
+            self.assertEqual(
+                self.precomputed(FULFILLER_LEADERBOARD, platform), self.live(LEADERBOARD_FULFILLER_QUERY, platform))
+
+    def test_full_refresh_matches_live_queries(self):
+        refresh_leaderboards()
+
+        self.assertMatchesLiveQueries()
+        fulfillers = self.precomputed(FULFILLER_LEADERBOARD, 'leaderboard-b')
+        self.assertEqual([row['address'] for row in fulfillers], [FULFILLER, OTHER_FULFILLER])
+        self.assertEqual((fulfillers[0]['total_usd'], fulfillers[0]['bounties_fulfilled']), (30, 1))
+
+    def test_refreshing_addresses_updates_their_rows(self):
+        refresh_leaderboards()
+
+        self.pending.accepted = True
+        self.pending.usd_price = 50
+        self.pending.save()
+        refresh_leaderboards(issuers=[ISSUER], fulfillers=[OTHER_FULFILLER])
+        self.assertMatchesLiveQueries()
+
+        Fulfillment.objects.filter(fulfiller=OTHER_FULFILLER).update(accepted=False)
+        refresh_leaderboard(FULFILLER_LEADERBOARD, [OTHER_FULFILLER])
+        self.assertFalse(LeaderboardEntry.objects.filter(kind=FULFILLER_LEADERBOARD, address=OTHER_FULFILLER).exists())
+        self.assertEqual(LeaderboardEntry.objects.filter(kind=FULFILLER_LEADERBOARD, address=FULFILLER).count(), 3)
+
+    def test_bounty_changes_update_its_rows(self):
+        refresh_leaderboards()
+
+        # the payout increases, the bounty moves platform and its issuer transfers it
+        Bounty.objects.filter(pk=self.second.pk).update(
+            fulfillment_amount=500, platform='leaderboard-c', issuer=OTHER_FULFILLER)
+        refresh_bounty_leaderboards(Bounty.objects.get(pk=self.second.pk), previous_issuer=ISSUER)
+
+        self.assertMatchesLiveQueries()
+        self.assertEqual(
+            LeaderboardEntry.objects.get(kind=ISSUER_LEADERBOARD, platform=ALL_PLATFORMS, address=ISSUER).total, 100)
+        self.assertEqual(
+            LeaderboardEntry.objects.get(kind=ISSUER_LEADERBOARD, platform='leaderboard-c', address=OTHER_FULFILLER).total,
+            1000)
+        self.assertFalse(LeaderboardEntry.objects.filter(platform='leaderboard-b', address=ISSUER).exists())
+
+    def test_concurrent_refreshes_keep_both_changes(self):
+        refresh_leaderboards()
+        accepting = self.fulfill(self.second, 2, OTHER_FULFILLER, 'leaderboard-b', 7, accepted=False)
+        refreshed, commit = threading.Event(), threading.Event()
+
+        def accept(fulfillment, wait=None):
+            try:
+                with transaction.atomic():
+                    Fulfillment.objects.filter(pk=fulfillment.pk).update(accepted=True)
+                    refresh_leaderboards(issuers=[ISSUER], fulfillers=[OTHER_FULFILLER])
+                    if wait:
+                        refreshed.set()
+                        wait.wait(5)
+            finally:
+                connection.close()
+
+        # two workers accept fulfillments of the same issuer and fulfiller at once
+        first = threading.Thread(target=accept, args=(self.pending, commit))
+        first.start()
+        refreshed.wait(5)
+        second = threading.Thread(target=accept, args=(accepting,))
+        second.start()
+        time.sleep(0.5)
+        commit.set()
+        first.join()
+        second.join()
+
+        self.assertMatchesLiveQueries()
+        fulfiller = LeaderboardEntry.objects.get(kind=FULFILLER_LEADERBOARD, platform=ALL_PLATFORMS, address=OTHER_FULFILLER)
+        self.assertEqual(fulfiller.fulfillments, 3)
+
+    def test_view_pages_in_sql(self):
+        refresh_leaderboards()
+
+        response = APIClient().get('/leaderboard/fulfiller/', {'platform': 'leaderboard-b', 'limit': 1, 'offset': 1})
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual([row['address'] for row in response.json()['results']], [OTHER_FULFILLER])
+
+    def test_cursor_pages_match_offset_pages(self):
+        # without a usd price, it ranks first on leaderboard-a
+        self.pending.accepted = True
+        self.pending.save()
+        refresh_leaderboards()
+
+        for platform in ['leaderboard-a', 'leaderboard-a,leaderboard-b']:
+            whole = APIClient().get('/leaderboard/fulfiller/', {'platform__in': platform, 'limit': 10}).json()
+            self.assertEqual(whole['next'], None)
+
+            pages, params = [], {'platform__in': platform, 'limit': 1}
+            while True:
+                page = APIClient().get('/leaderboard/fulfiller/', params).json()
+                self.assertEqual(page['count'], whole['count'])
+                pages += page['results']
+                if page['next'] is None:
+                    break
+                params['cursor'] = page['next']
+
+            self.assertEqual(pages, whole['results'])
+            self.assertEqual(len(pages), 2)
+
+    def test_several_platforms_use_the_live_query(self):
+        response = APIClient().get('/leaderboard/issuer/', {'platform__in': 'leaderboard-a,leaderboard-b', 'offset': 0})
+        self.assertEqual(response.status_code, 200)
+        results = json.loads(b''.join(response.streaming_content).decode())['results']
+        self.assertEqual([row['address'] for row in results], [ISSUER])
+        self.assertEqual((results[0]['bounties_issued'], results[0]['fulfillments_paid']), (2, 3))
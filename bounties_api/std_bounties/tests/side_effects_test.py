@@ -0,0 +1,112 @@
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+
+from std_bounties.management.commands.dispatch_side_effects import Command as DispatchCommand
+from std_bounties.models import SideEffect, Token
+from std_bounties.side_effects import SideEffectClient, suppress_side_effects, dispatch, encode, decode
+
+
+class TestSideEffectClient(unittest.TestCase):
+    def setUp(self):
+        self.wrapped = mock.Mock()
+        self.client = SideEffectClient('test', self.wrapped)
+
+    def test_queues_call(self):
+        token = Token.objects.create(normalized_name='eth', name='Ether', symbol='ETH')
+        self.client.bounty_issued(token, uid='uid', event_date=datetime(2019, 1, 2, 3, 4, 5))
+        self.wrapped.bounty_issued.assert_not_called()
+
+        side_effect = SideEffect.objects.filter(client='test').latest('id')
+        dispatch(side_effect)
+        self.wrapped.bounty_issued.assert_called_once_with(token, uid='uid', event_date=datetime(2019, 1, 2, 3, 4, 5))
+
+    def test_suppressed(self):
+        with suppress_side_effects():
+            self.client.bounty_issued('bounty')
+        self.assertFalse(SideEffect.objects.filter(client='test', method='bounty_issued', arguments__args=['bounty']).exists())
+
+    def test_encoding_round_trip(self):
+        value = {'amount': Decimal('1.5'), 'issuers': ['0x1'], 'date': datetime(2019, 1, 2, 3, 4, 5, 6)}
+        self.assertEqual(decode(encode(value)), value)
+
+    def test_unsupported_argument(self):
+        with self.assertRaises(TypeError):
+            encode(object())
+
+
+class TestDispatchSideEffects(unittest.TestCase):
+    def setUp(self):
+        self.wrapped = mock.Mock()
+        self.client = SideEffectClient('dispatcher', self.wrapped)
+        # leave the outbox to this test's side effects
+        self.paused = dict(SideEffect.objects.filter(dispatched__isnull=True).exclude(
+            next_attempt=None).values_list('id', 'next_attempt'))
+        SideEffect.objects.filter(pk__in=self.paused).update(next_attempt=None)
+
+    def tearDown(self):
+        SideEffect.objects.filter(client='dispatcher').delete()
+        for pk, next_attempt in self.paused.items():
+            SideEffect.objects.filter(pk=pk).update(next_attempt=next_attempt)
+
+    def test_calls_run_after_the_batch_is_leased(self):
+        self.client.first()
+        self.client.second()
+        leased = []
+
+        def first():
+            # the batch is committed as leased, not held under a lock while the call runs
+            leased.extend(SideEffect.objects.filter(client='dispatcher', next_attempt__gt=datetime.now()))
+
+        self.wrapped.first.side_effect = first
+        self.assertEqual(DispatchCommand().dispatch_batch(10), 2)
+
+        self.assertEqual(len(leased), 2)
+        self.wrapped.second.assert_called_once_with()
+        self.assertFalse(SideEffect.objects.filter(client='dispatcher', dispatched=None).exists())
+
+    def test_each_call_renews_its_lease(self):
+        self.client.first()
+        self.client.second()
+        self.client.third()
+        leases = []
+
+        def first():
+            leases.append(SideEffect.objects.get(client='dispatcher', method='first').next_attempt)
+            # the lease on the second ran out during this call and another dispatcher claimed it
+            SideEffect.objects.filter(client='dispatcher', method='second').update(next_attempt=datetime(2100, 1, 1))
+
+        def third():
+            leases.append(SideEffect.objects.get(client='dispatcher', method='third').next_attempt)
+
+        self.wrapped.first.side_effect = first
+        self.wrapped.third.side_effect = third
+        DispatchCommand().dispatch_batch(10)
+
+        self.wrapped.second.assert_not_called()
+        self.assertEqual(SideEffect.objects.get(client='dispatcher', method='second').dispatched, None)
+        self.assertLess(leases[0], leases[1])
+
+    def test_failed_call_is_retried_later(self):
+        self.client.failing()
+        self.wrapped.failing.side_effect = ValueError('slack is down')
+
+        started = datetime.now()
+        DispatchCommand().dispatch_batch(10)
+
+        side_effect = SideEffect.objects.get(client='dispatcher')
+        self.assertEqual((side_effect.dispatched, side_effect.attempts, side_effect.last_error), (None, 1, 'slack is down'))
+        self.assertGreater(side_effect.next_attempt, started)
+        self.assertEqual(DispatchCommand().dispatch_batch(10), 0)
+
+    def test_deleted_argument_is_not_retried(self):
+        token = Token.objects.create(normalized_name='deleted', name='Deleted', symbol='DEL')
+        self.client.announce(token)
+        token.delete()
+
+        DispatchCommand().dispatch_batch(10)
+
+        side_effect = SideEffect.objects.get(client='dispatcher')
+        self.assertEqual((side_effect.attempts, side_effect.next_attempt, side_effect.dispatched), (1, None, None))
+        self.wrapped.announce.assert_not_called()
@@ -0,0 +1,35 @@
+import unittest
+from datetime import datetime
+
+from std_bounties.constants import ACTIVE_STAGE, COMPLETED_STAGE, EXPIRED_STAGE
+from std_bounties.management.commands.track_bounty_expirations import expire_bounties
+from std_bounties.models import Bounty, BountyState, SideEffect
+
+
+class TestExpireBounties(unittest.TestCase):
+    def setUp(self):
+        self.due = Bounty.objects.create(bounty_id=9005, bounty_stage=ACTIVE_STAGE, deadline=datetime(2019, 1, 1))
+        self.not_due = Bounty.objects.create(bounty_id=9006, bounty_stage=ACTIVE_STAGE, deadline=datetime(2019, 3, 1))
+        self.completed = Bounty.objects.create(bounty_id=9007, bounty_stage=COMPLETED_STAGE, deadline=datetime(2019, 1, 1))
+        self.bounties = [self.due, self.not_due, self.completed]
+
+    def tearDown(self):
+        SideEffect.objects.filter(method='bounty_expired').delete()
+        BountyState.objects.filter(bounty__in=self.bounties).delete()
+        Bounty.objects.filter(pk__in=[bounty.pk for bounty in self.bounties]).delete()
+
+    def test_expires_due_bounties_in_bulk(self):
+        self.assertEqual(expire_bounties(datetime(2019, 2, 1)), [self.due.pk])
+
+        due = Bounty.objects.get(pk=self.due.pk)
+        self.assertEqual(due.bounty_stage, EXPIRED_STAGE)
+        self.assertEqual((due.latest_state_stage, due.latest_state_date), (EXPIRED_STAGE, datetime(2019, 1, 1)))
+        self.assertEqual(Bounty.objects.get(pk=self.not_due.pk).bounty_stage, ACTIVE_STAGE)
+        self.assertEqual(Bounty.objects.get(pk=self.completed.pk).bounty_stage, COMPLETED_STAGE)
+
+        state = BountyState.objects.get(bounty=self.due)
+        side_effect = SideEffect.objects.get(method='bounty_expired')
+        self.assertEqual(side_effect.client, 'notification')
+        self.assertEqual(side_effect.arguments['args'], [self.due.pk, {'__datetime__': '2019-01-01T00:00:00'}, state.pk])
+
+        self.assertEqual(expire_bounties(datetime(2019, 2, 1)), [])
@@ -1,11 +1,21 @@
+from django.db.models import F, Func, IntegerField, OuterRef, Prefetch, Subquery
 from rest_framework.viewsets import ReadOnlyModelViewSet
 from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework_filters.backends import DjangoFilterBackend
 from std_bounties.serializers import BountySerializer
-from std_bounties.models import Bounty
+from std_bounties.models import Bounty, Comment, FulfillerApplication, Fulfillment
 from std_bounties.filters import BountiesFilter
 
 
+def count_of(queryset):
+    """Correlated COUNT(*) subquery, for a queryset filtered on OuterRef('pk')"""
+
+    return Subquery(
+        queryset.order_by().annotate(count=Func(F('pk'), function='COUNT')).values('count'),
+        output_field=IntegerField()
+    )
+
+
 class BountyViewSet(ReadOnlyModelViewSet):
     serializer_class = BountySerializer
     queryset = Bounty.objects.all().prefetch_related('categories').select_related('token').distinct()
@@ -24,3 +34,30 @@ class BountyViewSet(ReadOnlyModelViewSet):
         'issuer',
         'contract_version',
     )
+
+    def get_queryset(self):
+        # Everything BountySerializer reads is fetched here, so a page costs the same number of
+        # queries however many bounties it has
+        queryset = super(BountyViewSet, self).get_queryset().select_related(
+            'user',
+        ).prefetch_related(
+            'issuers',
+            'approvers',
+            'user__categories',
+            'user__languages',
+            'user__skills',
+        ).annotate(
+            fulfillment_count=count_of(Fulfillment.objects.filter(bounty=OuterRef('pk'))),
+            application_count=count_of(FulfillerApplication.objects.filter(bounty=OuterRef('pk'))),
+            comment_count=count_of(Comment.objects.filter(bounty=OuterRef('pk'))),
+        )
+
+        current_user = getattr(self.request, 'current_user', None)
+        if current_user:
+            queryset = queryset.prefetch_related(Prefetch(
+                'fulfillerapplication_set',
+                queryset=FulfillerApplication.objects.filter(applicant=current_user),
+                to_attr='current_user_applications'
+            ))
+
+        return queryset
@@ -0,0 +1,50 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.views import APIView
+from bounties.utils import extractInParams, limitOffsetParams
+from std_bounties.leaderboards import decode_cursor, encode_cursor, leaderboard_rows
+
+
+class LeaderboardView(APIView):
+    kind = None
+    serializer_class = None
+
+    def get(self, request):
+        platform_in = extractInParams(request, 'platform', 'platform__in')
+        startIndex, endIndex = limitOffsetParams(request)
+        limit = None if endIndex == -1 else max(endIndex - startIndex, 0)
+
+        # a cursor from a previous page replaces the offset
+        after = None
+        if request.GET.get('cursor'):
+            try:
+                after = decode_cursor(request.GET['cursor'])
+            except ValueError:
+                raise NotFound('Invalid cursor')
+            startIndex = 0
+
+        if limit is None:
+            return StreamingHttpResponse(
+                self.stream(platform_in, startIndex, after), content_type='application/json')
+
+        rows = leaderboard_rows(self.kind, platform_in, startIndex, limit, after)
+        count = next(rows)
+        results = list(rows)
+        return JsonResponse({
+            'count': count,
+            'next': encode_cursor(results[-1]) if results and len(results) == limit else None,
+            'results': self.serializer_class(results, many=True).data
+        }, safe=False)
+
+    def stream(self, platform_in, offset, after):
+        """
+        The whole leaderboard from the offset on as JSON, serialized a row at a time as it's read
+        """
+        rows = leaderboard_rows(self.kind, platform_in, offset, None, after)
+        yield '{{"count": {}, "next": null, "results": ['.format(next(rows))
+        for index, row in enumerate(rows):
+            yield (', ' if index else '') + json.dumps(self.serializer_class(row).data, cls=DjangoJSONEncoder)
+        yield ']}'
@@ -1,7 +1,7 @@
 import uuid
 from django.db import models
 from django.contrib.postgres.fields import JSONField
-from django.core.exceptions import ObjectDoesNotExist
+from bounties.tagging import TagSet
 from notifications.constants import default_email_options, notifications
 
 
@@ -15,6 +15,10 @@ class Language(models.Model):
         super(Language, self).save(*args, **kwargs)
 
 
+# Languages are a fixed list, unknown ones are ignored
+language_tags = TagSet(Language, lookup_field='normalized_name', create=False)
+
+
 class Skill(models.Model):
     name = models.CharField(max_length=128, unique=True)
     normalized_name = models.CharField(max_length=128)
@@ -24,6 +28,9 @@ class Skill(models.Model):
         super(Skill, self).save(*args, **kwargs)
 
 
+skill_tags = TagSet(Skill)
+
+
 class RankedSkill(models.Model):
     name = models.CharField(max_length=128)
     normalized_name = models.CharField(max_length=128)
@@ -90,28 +97,7 @@ class User(models.Model):
         super(User, self).save(*args, **kwargs)
 
     def save_and_clear_skills(self, skills):
-        # this is really messy, but this is bc of psql django bugs
-        self.skills.clear()
-        if isinstance(skills, list):
-            for skill in skills:
-                if isinstance(skill, str):
-                    try:
-                        if skill != '':
-                            matching_skill = Skill.objects.get(
-                                name=skill.strip())
-                            self.skills.add(matching_skill)
-                    except ObjectDoesNotExist:
-                        self.skills.create(name=skill.strip())
+        skill_tags.sync(self.skills, skills)
 
     def save_and_clear_languages(self, languages):
-        # this is really messy, but this is bc of psql django bugs
-        self.languages.clear()
-        if isinstance(languages, list):
-            for language in languages:
-                if isinstance(language, str):
-                    try:
-                        matching_language = Language.objects.get(
-                            normalized_name=language.strip().lower())
-                        self.languages.add(matching_language)
-                    except ObjectDoesNotExist:
-                        pass
+        language_tags.sync(self.languages, languages)
@@ -0,0 +1,95 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+from bounties.utils import bulk_insert_ignore_conflicts
+from user.models import Settings, User
+
+_state = threading.local()
+
+
+def current_identity_map():
+    return getattr(_state, 'identity_map', None)
+
+
+@contextmanager
+def user_identity_map():
+    """
+    Within this block, each address is resolved to a user once, however many events or saves
+    touch it. Blocks nest: a nested block's users are only kept by the outer one if it exits
+    cleanly, since the users it created are gone if its transaction rolls back.
+    """
+
+    parent = current_identity_map()
+    identity_map = dict(parent) if parent is not None else {}
+    _state.identity_map = identity_map
+    try:
+        yield identity_map
+        if parent is not None:
+            parent.update(identity_map)
+    finally:
+        _state.identity_map = parent
+
+
+def resolve_users(addresses, defaults=None):
+    """
+    Get or create the users for a list of addresses with one SELECT, and for any new
+    addresses one INSERT ... ON CONFLICT DO NOTHING.
+
+    @param addresses Public addresses, used as given
+    @keyword defaults Field values for users that have to be created
+    @return dict of address to (user, created)
+    """
+
+    identity_map = current_identity_map()
+    if identity_map is None:
+        identity_map = {}
+
+    resolved = {address: (identity_map[address], False) for address in addresses if address in identity_map}
+    wanted = [address for address in dict.fromkeys(addresses) if address not in resolved]
+    if not wanted:
+        return resolved
+
+    for user in User.objects.filter(public_address__in=wanted):
+        resolved[user.public_address] = (user, False)
+
+    missing = [address for address in wanted if address not in resolved]
+    if missing:
+        resolved.update(create_users(missing, defaults or {}))
+
+    for address in wanted:
+        identity_map[address] = resolved[address][0]
+
+    return resolved
+
+
+def resolve_user(address, defaults=None):
+    return resolve_users([address], defaults)[address]
+
+
+@transaction.atomic
+def create_users(addresses, defaults):
+    settings = Settings.objects.bulk_create([Settings() for _ in addresses])
+    users = [
+        User(public_address=address, settings_id=user_settings.pk, **defaults)
+        for address, user_settings in zip(addresses, settings)
+    ]
+    inserted = bulk_insert_ignore_conflicts(User, users, ['public_address'], returning=('id', 'settings_id'))
+
+    created = {}
+    inserted_settings = {settings_id: pk for pk, settings_id in inserted}
+    for user in users:
+        if user.settings_id in inserted_settings:
+            user.pk = inserted_settings[user.settings_id]
+            created[user.public_address] = (user, True)
+
+    if len(created) < len(users):
+        # Another consumer created some of these users first
+        Settings.objects.filter(
+            pk__in=[user.settings_id for user in users if user.public_address not in created]
+        ).delete()
+        for user in User.objects.filter(public_address__in=[address for address in addresses if address not in created]):
+            created[user.public_address] = (user, False)
+
+    return created
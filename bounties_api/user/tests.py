@@ -0,0 +1,93 @@
+import unittest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from user.models import Settings, Skill, User, skill_tags
+from user.resolver import resolve_user, resolve_users, user_identity_map
+
+ADDRESSES = ['0xresolver1', '0xresolver2', '0xresolver3']
+
+
+class TestUserResolver(unittest.TestCase):
+    def tearDown(self):
+        users = User.objects.filter(public_address__in=ADDRESSES)
+        settings = list(users.values_list('settings_id', flat=True))
+        users.delete()
+        Settings.objects.filter(pk__in=settings).delete()
+
+    def test_creates_missing_users_in_bulk(self):
+        User.objects.create(public_address=ADDRESSES[0])
+
+        with CaptureQueriesContext(connection) as queries:
+            users = resolve_users(ADDRESSES, defaults={'name': 'resolved'})
+
+        # one select, then the settings and users inserts inside a savepoint
+        self.assertLessEqual(len(queries), 5)
+        self.assertFalse(users[ADDRESSES[0]][1])
+        self.assertTrue(users[ADDRESSES[1]][1])
+        created = User.objects.get(public_address=ADDRESSES[1])
+        self.assertEqual(created.pk, users[ADDRESSES[1]][0].pk)
+        self.assertEqual(created.name, 'resolved')
+        self.assertIsNotNone(created.settings_id)
+
+    def test_identity_map(self):
+        with user_identity_map():
+            user, _ = resolve_user(ADDRESSES[0])
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(resolve_user(ADDRESSES[0]), (user, False))
+            self.assertEqual(len(queries), 0)
+
+    def test_failed_block_is_forgotten(self):
+        with user_identity_map() as identity_map:
+            try:
+                with user_identity_map():
+                    resolve_user(ADDRESSES[0])
+                    raise ValueError()
+            except ValueError:
+                pass
+            self.assertNotIn(ADDRESSES[0], identity_map)
+
+            resolve_user(ADDRESSES[1])
+            self.assertIn(ADDRESSES[1], identity_map)
+
+
+class TestSkillTags(unittest.TestCase):
+    def setUp(self):
+        self.user = User.objects.create(public_address=ADDRESSES[0])
+
+    def tearDown(self):
+        settings = self.user.settings_id
+        self.user.delete()
+        Settings.objects.filter(pk=settings).delete()
+        Skill.objects.filter(name__in=['Tagging A', 'Tagging B', 'Tagging C']).delete()
+        skill_tags.cache.clear()
+
+    def test_sync_only_changes_the_delta(self):
+        self.user.save_and_clear_skills(['Tagging A', ' Tagging B', '', 3])
+        self.assertEqual(set(self.user.skills.values_list('name', flat=True)), {'Tagging A', 'Tagging B'})
+        self.assertEqual(Skill.objects.get(name='Tagging B').normalized_name, 'tagging b')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.user.save_and_clear_skills(['Tagging B', 'Tagging A'])
+        self.assertEqual(len(queries), 1)
+
+        self.user.save_and_clear_skills(['Tagging B', 'Tagging C'])
+        self.assertEqual(set(self.user.skills.values_list('name', flat=True)), {'Tagging B', 'Tagging C'})
+
+        self.user.save_and_clear_skills(None)
+        self.assertFalse(self.user.skills.exists())
+
+    def test_deleted_tags_are_looked_up_again(self):
+        self.user.save_and_clear_skills(['Tagging A'])
+        deleted = Skill.objects.get(name='Tagging A').pk
+
+        # deleted outside of the process, say in the admin, then created again
+        self.user.skills.clear()
+        Skill.objects.filter(pk=deleted).delete()
+        self.user.save_and_clear_skills(['Tagging A'])
+
+        created = Skill.objects.get(name='Tagging A')
+        self.assertNotEqual(created.pk, deleted)
+        self.assertEqual(list(self.user.skills.values_list('id', flat=True)), [created.pk])
+        self.assertEqual(skill_tags.ids(['Tagging A']), [created.pk])
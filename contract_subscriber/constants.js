@@ -40,6 +40,10 @@ exports.SQS_PARAMS = {
     DataType: 'Number',
     StringValue: '',
    },
+   'BlockNumber': {
+    DataType: 'Number',
+    StringValue: '',
+   },
  },
  MessageBody: 'Event Subscription',
  QueueUrl: process.env['queue_url'] || 'https://sqs.us-east-1.amazonaws.com/802922962628/bounties_development.fifo',
@@ -61,3 +65,6 @@ const contractVersion = process.env['contract_version'] || 'v1';
 exports.ETH_NETWORK = ethNetwork;
 exports.ETH_NETWORK_URL = networks[ethNetwork];
 exports.CONTRACT_VERSION = contractVersion;
+
+// processed events are kept in one redis hash per range of blocks, see std_bounties/event_deduplication.py
+exports.DEDUP_SHARD_BLOCKS = 10000;
@@ -1,5 +1,5 @@
 const { cloneDeep, chain } = require('lodash');
-const { getAsync } = require('./redis_config');
+const { syncedEventsAsync } = require('./redis_config');
 const { CONTRACT_VERSION, SQS_PARAMS } = require('./constants');
 const { abiDecoder, getTransaction, getBlock } = require('./web3_config');
 const sqs = require('./sqs_config');
@@ -24,7 +24,12 @@ sanitizeEventData = (obj) => {
 async function sendEvents(events) {
 	try {
 		let highestBlock;
-		for (let event of events) {
+		const synced = await syncedEventsAsync(events.map(({ transactionHash, event: eventName, blockNumber }) => ({
+			messageDeduplicationId: transactionHash + eventName,
+			blockNumber,
+		})));
+
+		for (let [index, event] of events.entries()) {
 			let {
 				event: eventName,
 				transactionHash,
@@ -37,12 +42,12 @@ async function sendEvents(events) {
 			} = event, messageParams;
 
 			const messageDeduplicationId = transactionHash + eventName;
-			const existingHash = await getAsync(messageDeduplicationId);
+			const alreadySynced = synced[index];
 
 			// this means we already synced this hash
 			// I do it this way since we keep subscribing to the same block. SQS provides de-duping, but
 			// only within shorter timeframes while evaluation is ocurring
-			if (existingHash) {
+			if (alreadySynced) {
 				continue;
 			}
 
@@ -105,6 +110,7 @@ async function sendEvents(events) {
 			messageParams.MessageAttributes.ContractEventData.StringValue = JSON.stringify(sanitizeEventData(event.returnValues))
 			messageParams.MessageAttributes.ContractVersion.StringValue = CONTRACT_VERSION;
 			messageParams.MessageAttributes.TimeStamp.StringValue = eventTimestamp;
+			messageParams.MessageAttributes.BlockNumber.StringValue = blockNumber.toString();
 			messageParams.MessageAttributes.TransactionFrom.StringValue = transactionFrom || '0x';
 			messageParams.MessageDeduplicationId = messageDeduplicationId;
 
@@ -1,7 +1,42 @@
 const redis = require('redis'),
 	{ promisify } = require('util');
+const { DEDUP_SHARD_BLOCKS } = require('./constants');
 
 const client = redis.createClient({ url: process.env['redis_location'] });
 
 exports.getAsync = promisify(client.get).bind(client);
 exports.writeAsync = promisify(client.set).bind(client);
+
+// Checks a whole list of { messageDeduplicationId, blockNumber } against the block range shards
+// and the legacy per event keys in one round trip, with one HMGET per shard. Resolves to whether
+// each event was already processed, in order.
+exports.syncedEventsAsync = (events) => new Promise((resolve, reject) => {
+	if (!events.length) {
+		return resolve([]);
+	}
+
+	const shards = {};
+	events.forEach(({ blockNumber }, index) => {
+		const shard = `dedup:${Math.floor(blockNumber / DEDUP_SHARD_BLOCKS)}`;
+		(shards[shard] = shards[shard] || []).push(index);
+	});
+	const shardKeys = Object.keys(shards);
+
+	const batch = client.batch();
+	shardKeys.forEach(shard => batch.hmget(shard, shards[shard].map(index => events[index].messageDeduplicationId)));
+	batch.mget(events.map(({ messageDeduplicationId }) => messageDeduplicationId));
+	batch.exec((err, replies) => {
+		const error = err || (replies || []).find(reply => reply instanceof Error);
+		if (error) {
+			return reject(error);
+		}
+
+		const synced = replies[shardKeys.length].map(legacy => legacy === 'True');
+		shardKeys.forEach((shard, position) => replies[position].forEach((inShard, offset) => {
+			if (inShard !== null) {
+				synced[shards[shard][offset]] = true;
+			}
+		}));
+		resolve(synced);
+	});
+});